@@ -0,0 +1,195 @@
+"""
+Load test for the vibe-matching request path against a local fake LLM server
+
+Starts the stub LLM API (benchmarks/llm_stub_server.py: mostly fast, sometimes
+very slow, optionally failing), serves the Flask app from a fixed-size worker
+pool (like gunicorn's gthread workers) and hammers /api/pubs from many client
+threads. The app talks to the stub through the real LLM client (llm_client.py)
+over HTTP. The same load is run twice:
+
+    unbounded  - every request waits for the LLM as long as it takes, no
+                 retries and no circuit breaker (old behaviour)
+    bounded    - concurrency cap, deadline, jittered retries and circuit
+                 breaker, falling back to the local match
+
+Usage:
+    python benchmarks/llm_load_test.py --workers 8 --clients 32 --duration 15
+    python benchmarks/llm_load_test.py --error-rate 0.8    # upstream outage: the breaker opens
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configure the app before importing it: fake key, no cache, always ask the LLM
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key-for-load-test")
+os.environ["PUB_CATALOGUE_PRELOAD"] = "0"
+os.environ["VIBE_CACHE_BACKEND"] = "none"
+os.environ["VIBE_LLM_MODE"] = "always"
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler  # noqa: E402
+
+import vibe_beer_finder  # noqa: E402
+from benchmarks.llm_stub_server import StubLLMHandler, start_stub_server  # noqa: E402
+from benchmarks.synthetic import ANTWERP_LAT, ANTWERP_LON, make_pub_df  # noqa: E402
+from llm_client import CircuitBreaker, GeminiProvider, LLMClient  # noqa: E402
+from llm_executor import BoundedLLMExecutor  # noqa: E402
+from pub_catalogue import ShardedCatalogue  # noqa: E402
+
+VIBES = ["cozy", "lively", "historic", "hipster", "romantic", "local"]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server that handles requests on a fixed number of worker threads"""
+
+    def __init__(self, host, port, app, workers):
+        super().__init__(host, port, app, handler=QuietHandler)
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run_clients(url, clients, duration):
+    latencies = []
+    fallbacks = 0
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client():
+        nonlocal fallbacks, errors
+        rng = random.Random()
+        while time.time() < deadline:
+            payload = {
+                "latitude": rng.uniform(*ANTWERP_LAT),
+                "longitude": rng.uniform(*ANTWERP_LON),
+                "vibe": rng.choice(VIBES),
+            }
+            request = urllib.request.Request(
+                url, data=json.dumps(payload).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+            )
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=120) as response:
+                    result = json.loads(response.read())
+            except Exception:
+                with lock:
+                    errors += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if "error" in result:
+                    errors += 1
+                elif result["vibe_match"].get("note", "").startswith("Error matching vibe"):
+                    fallbacks += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "fallbacks": fallbacks,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8, help="Flask worker threads")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent client threads")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per scenario")
+    parser.add_argument("--pubs", type=int, default=2000, help="Synthetic pubs in the catalogue")
+    parser.add_argument("--fast-delay", type=float, default=0.2)
+    parser.add_argument("--slow-delay", type=float, default=10.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of LLM calls that fail with HTTP 503")
+    parser.add_argument("--llm-timeout", type=float, default=1.0)
+    parser.add_argument("--llm-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    StubLLMHandler.fast_delay = args.fast_delay
+    StubLLMHandler.slow_delay = args.slow_delay
+    StubLLMHandler.slow_fraction = args.slow_fraction
+    StubLLMHandler.error_rate = args.error_rate
+    llm_server, gemini_url, _ = start_stub_server()
+
+    vibe_beer_finder.catalogue = ShardedCatalogue(loader=lambda *_: make_pub_df(args.pubs))
+    vibe_beer_finder.catalogue.load()
+
+    app_server = PooledWSGIServer("127.0.0.1", 0, vibe_beer_finder.app, args.workers)
+    threading.Thread(target=app_server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{app_server.server_port}/api/pubs"
+
+    scenarios = {
+        # Effectively the old behaviour: no cap, no deadline, no retries, a breaker that never opens
+        "unbounded": LLMClient(
+            GeminiProvider("stub", base_url=gemini_url),
+            executor=BoundedLLMExecutor(max_concurrency=1024, max_pending=0, timeout=None),
+            breaker=CircuitBreaker(error_rate=2.0), retries=0,
+        ),
+        "bounded": LLMClient(
+            GeminiProvider("stub", base_url=gemini_url),
+            executor=BoundedLLMExecutor(max_concurrency=args.llm_concurrency,
+                                        max_pending=args.llm_concurrency, timeout=args.llm_timeout),
+            breaker=CircuitBreaker(cooldown=min(5.0, args.duration / 3)),
+        ),
+    }
+
+    print(f"workers={args.workers} clients={args.clients} duration={args.duration}s "
+          f"llm: {args.fast_delay}s fast / {args.slow_delay}s slow ({args.slow_fraction:.0%})")
+    for name, client in scenarios.items():
+        vibe_beer_finder.llm_client = client
+        result = run_clients(url, args.clients, args.duration)
+        stats = client.stats()
+        print(f"{name:>10}: {result['requests']:6d} req  {result['throughput_rps']:7.1f} req/s  "
+              f"p50 {result['p50_ms']:7.0f} ms  p95 {result['p95_ms']:7.0f} ms  p99 {result['p99_ms']:7.0f} ms  "
+              f"fallbacks {result['fallbacks']}  errors {result['errors']}")
+        print(f"{'':>10}  llm calls {stats['calls']}  retries {stats['retries']}  "
+              f"breaker opened {stats['circuit_opened']}x, short-circuited {stats['short_circuited']}  "
+              f"connections {client.provider.transport.connections_opened}")
+
+    app_server.shutdown()
+    llm_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Local stand-in for the Gemini and OpenRouter APIs
+
+Answers POST .../models/<model>:generateContent (Gemini) and
+POST .../chat/completions (OpenAI-compatible, as used by OpenRouter) the way
+the real APIs do, picking the first place named in the prompt. Latency and
+failures can be injected, so the LLM client's deadlines, retries, connection
+reuse and circuit breaker can be exercised without a network or an API key:
+
+    python benchmarks/llm_stub_server.py --port 8089 --error-rate 0.3
+    GOOGLE_API_KEY=stub GEMINI_BASE_URL=http://127.0.0.1:8089/v1beta python vibe_beer_finder.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Gemini/OpenAI-style answers after a fast or (sometimes) slow delay, or an injected error"""
+
+    # HTTP/1.1 keeps connections open, like the real APIs
+    protocol_version = "HTTP/1.1"
+
+    fast_delay = 0.05
+    slow_delay = 10.0
+    slow_fraction = 0.0
+    error_rate = 0.0
+    error_status = 503
+
+    # Totals across all handlers, to check connection reuse
+    lock = threading.Lock()
+    connections = 0
+    requests = 0
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            StubLLMHandler.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            StubLLMHandler.requests += 1
+
+        if self.path.endswith(":generateContent"):
+            prompt = body["contents"][0]["parts"][0]["text"]
+            style = "gemini"
+        elif self.path.endswith("/chat/completions"):
+            prompt = body["messages"][-1]["content"]
+            style = "openai"
+        else:
+            self._send(404, {"error": {"code": 404, "message": f"Unknown endpoint {self.path}"}})
+            return
+
+        slow = random.random() < self.slow_fraction
+        time.sleep(self.slow_delay if slow else self.fast_delay)
+        if random.random() < self.error_rate:
+            self._send(self.error_status, {"error": {"code": self.error_status, "message": "Injected stub failure"}})
+            return
+
+        names = re.findall(r"'([^']+)'", prompt.split("located in", 1)[-1])
+        answer = f"PUB NAME: {names[0] if names else 'Unknown'}\nEXPLANATION: Stub LLM answer."
+        if style == "gemini":
+            payload = {"candidates": [{"content": {"role": "model", "parts": [{"text": answer}]}}]}
+        else:
+            payload = {"choices": [{"message": {"role": "assistant", "content": answer}}]}
+        self._send(200, payload)
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (its deadline passed) before the answer came
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(host="127.0.0.1", port=0):
+    """
+    Serve the stub API on a background thread
+
+    Returns:
+        tuple: (server, base URL of the Gemini API, base URL of the OpenAI-compatible API)
+    """
+    server = ThreadingHTTPServer((host, port), StubLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    root = f"http://{host}:{server.server_port}"
+    return server, f"{root}/v1beta", f"{root}/api/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fast-delay", type=float, default=StubLLMHandler.fast_delay)
+    parser.add_argument("--slow-delay", type=float, default=StubLLMHandler.slow_delay)
+    parser.add_argument("--slow-fraction", type=float, default=StubLLMHandler.slow_fraction)
+    parser.add_argument("--error-rate", type=float, default=StubLLMHandler.error_rate)
+    parser.add_argument("--error-status", type=int, default=StubLLMHandler.error_status)
+    args = parser.parse_args()
+
+    StubLLMHandler.fast_delay = args.fast_delay
+    StubLLMHandler.slow_delay = args.slow_delay
+    StubLLMHandler.slow_fraction = args.slow_fraction
+    StubLLMHandler.error_rate = args.error_rate
+    StubLLMHandler.error_status = args.error_status
+
+    server, gemini_url, openai_url = start_stub_server(args.host, args.port)
+    print(f"Stub LLM API listening: GEMINI_BASE_URL={gemini_url} OPENROUTER_BASE_URL={openai_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
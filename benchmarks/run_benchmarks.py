@@ -0,0 +1,257 @@
+"""
+Per-stage benchmarks for the pub request pipeline on synthetic OSM data
+
+Generates OSM-like datasets (same id/type/lat/lon/tags schema as
+ns2agi/antwerp-osm-navigator) at several sizes, stubs the LLM, and times each
+stage of the request path:
+
+    find_pubs        dataset filter + tag parsing (once per catalogue build)
+    stream_pubs      batched, prefiltered ingest (PUB_INGEST_MODE=streaming)
+    catalogue_build  spatial index, vibe profiles and map markers
+    nearest_search   find_nearest_pubs
+    nearest_hotspot  find_nearest_pubs a few metres from earlier searches (cell cache hits)
+    nearest_walking  get_top_pubs re-ranked by walking distance on a synthetic street grid
+    nearest_open     get_top_pubs keeping only pubs open at a fixed arrival time
+    pub_dicts        build_pub_list
+    vibe_match       generate_vibe_match with an instant stub LLM
+    create_pub_map   create_pub_map
+    render_results   rendering results.html
+    api_pubs         a full POST /api/pubs through the Flask test client
+    api_pubs_compact the same with format=compact (selected fields, vibe match by reference)
+    api_crawl        a 5-stop POST /api/crawl (vibe-picked pubs, exact visiting order)
+    api_search       GET /api/pubs/search with partly typed pub names, half of them with a typo
+
+For every stage the median and best wall time and the peak traced memory
+(tracemalloc, measured in a separate run so it does not skew timings) are
+reported.
+
+Usage:
+    python benchmarks/run_benchmarks.py                          # 1k, 100k, 1M nodes
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --save-baseline
+    python benchmarks/run_benchmarks.py --compare                # exit 1 on regressions
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configure the app before importing it: no preload, no cache, always call the (stub) LLM
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key-for-benchmarks")
+os.environ["PUB_CATALOGUE_PRELOAD"] = "0"
+os.environ["VIBE_CACHE_BACKEND"] = "none"
+os.environ["VIBE_LLM_MODE"] = "always"
+
+from datasets import Dataset, disable_progress_bars  # noqa: E402
+from flask import render_template  # noqa: E402
+
+import vibe_beer_finder  # noqa: E402
+from benchmarks.synthetic import ANTWERP_LAT, ANTWERP_LON, make_osm_rows, make_street_rows  # noqa: E402
+from llm_client import LLMClient, ModelProvider  # noqa: E402
+from pub_catalogue import ShardedCatalogue, build_view, extract_pubs  # noqa: E402
+from pub_ingest import stream_pubs  # noqa: E402
+from walking_graph import WalkingRanker, graph_from_dataset  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+VIBES = ["cozy", "lively", "historic", "hipster", "romantic", "local"]
+
+_street_graph = None
+
+
+def street_graph():
+    """Walking graph of the synthetic street grid, built once per run"""
+    global _street_graph
+    if _street_graph is None:
+        _street_graph = graph_from_dataset(Dataset.from_dict(make_street_rows()))
+    return _street_graph
+
+
+class StubModel:
+    """Answers instantly with the first candidate, like a perfectly fast LLM"""
+
+    def generate_content(self, prompt):
+        names = prompt.split("pubs located in Antwerp: ['", 1)[-1].split("'", 1)[0]
+        return type("Response", (), {"text": f"PUB NAME: {names}\nEXPLANATION: Stub answer."})()
+
+
+def measure(fn, repeats):
+    """Median and best wall time in ms over repeats calls, plus peak traced KiB of one call"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_size(n_nodes, queries, seed=0):
+    """Run every stage against a synthetic dataset of n_nodes rows"""
+    rng = random.Random(seed)
+    dataset = Dataset.from_dict(make_osm_rows(n_nodes, seed=seed))
+    results = {}
+
+    # Catalogue build stages are expensive; time them once on the big sizes
+    build_repeats = 3 if n_nodes <= 100_000 else 1
+    results["find_pubs"] = measure(lambda: extract_pubs(dataset), build_repeats)
+    results["stream_pubs"] = measure(lambda: stream_pubs(dataset), build_repeats)
+    pub_df = extract_pubs(dataset)
+    results["catalogue_build"] = measure(lambda: build_view(pub_df), build_repeats)
+
+    vibe_beer_finder.catalogue = ShardedCatalogue(loader=lambda *_: pub_df)
+    vibe_beer_finder.catalogue.load()
+    vibe_beer_finder.llm_client = LLMClient(ModelProvider(StubModel()))
+
+    locations = [[rng.uniform(*ANTWERP_LAT), rng.uniform(*ANTWERP_LON)] for _ in range(queries)]
+    vibes = [rng.choice(VIBES) for _ in range(queries)]
+
+    def per_query(stage):
+        # Cycle through the query locations so one measurement = one request's worth of work
+        state = {"i": 0}
+
+        def call():
+            i = state["i"] % queries
+            state["i"] += 1
+            stage(locations[i], vibes[i])
+        return call
+
+    nearest = vibe_beer_finder.find_nearest_pubs(locations[0], 5)
+    pub_list = vibe_beer_finder.build_pub_list(nearest)
+    vibe_match = vibe_beer_finder.generate_vibe_match(vibes[0], pub_list)
+
+    results["nearest_search"] = measure(per_query(
+        lambda loc, vibe: vibe_beer_finder.find_nearest_pubs(loc, 5)), queries)
+    # Repeated searches a few metres around the same spots (geohash cell cache hits)
+    nearby = [[lat + rng.uniform(-2e-5, 2e-5), lon + rng.uniform(-2e-5, 2e-5)] for lat, lon in locations]
+    results["nearest_hotspot"] = measure(per_query(
+        lambda loc, vibe, spots=iter(nearby * (queries + 1)): vibe_beer_finder.find_nearest_pubs(next(spots), 5)),
+        queries)
+    vibe_beer_finder.walking_ranker = WalkingRanker(street_graph())
+    results["nearest_walking"] = measure(per_query(
+        lambda loc, vibe: vibe_beer_finder.get_top_pubs(loc, 5)), queries)
+    vibe_beer_finder.walking_ranker = None
+    evening = vibe_beer_finder.next_arrival("21:00")
+    results["nearest_open"] = measure(per_query(
+        lambda loc, vibe: vibe_beer_finder.get_top_pubs(loc, 5, open_at=evening)), queries)
+    results["pub_dicts"] = measure(lambda: vibe_beer_finder.build_pub_list(nearest), queries)
+    results["vibe_match"] = measure(per_query(
+        lambda loc, vibe: vibe_beer_finder.generate_vibe_match(vibe, [copy.copy(p) for p in pub_list])), queries)
+
+    app = vibe_beer_finder.app
+    with app.test_request_context("/", method="POST"):
+        results["create_pub_map"] = measure(
+            lambda: vibe_beer_finder.create_pub_map(pub_list, locations[0], vibe_match), queries)
+        map_data = vibe_beer_finder.create_pub_map(pub_list, locations[0], vibe_match)
+        results["render_results"] = measure(lambda: render_template(
+            "results.html", latitude=locations[0][0], longitude=locations[0][1], vibe=vibes[0],
+            pub_list=pub_list, vibe_match=vibe_match, map_data=map_data), queries)
+
+    client = app.test_client()
+    results["api_pubs"] = measure(per_query(lambda loc, vibe: client.post(
+        "/api/pubs", json={"latitude": loc[0], "longitude": loc[1], "vibe": vibe})), queries)
+    results["api_pubs_compact"] = measure(per_query(lambda loc, vibe: client.post(
+        "/api/pubs", json={"latitude": loc[0], "longitude": loc[1], "vibe": vibe, "format": "compact"})), queries)
+
+    results["api_crawl"] = measure(per_query(lambda loc, vibe: client.post(
+        "/api/crawl", json={"latitude": loc[0], "longitude": loc[1], "vibe": vibe, "stops": 5})), queries)
+
+    # Autocomplete as typed: the first letters of real names, every other one with a typo
+    names = [tags["name"] for tags in pub_df["tags"][:queries] if tags.get("name")] or ["De Kat"]
+    typed = [name[:6] if i % 2 else name[:3] + "x" + name[4:7] for i, name in enumerate(names)]
+    results["api_search"] = measure(lambda prefixes=iter(typed * (queries + 1)): client.get(
+        "/api/pubs/search", query_string={"q": next(prefixes)}), queries)
+
+    results["_pubs"] = len(pub_df)
+    return results
+
+
+def compare(current, baseline, tolerance, noise_floor_ms):
+    """
+    List stages whose median got slower than the baseline allows
+
+    A stage without a baseline entry is listed too: it cannot be checked
+    until the baseline is re-recorded with --save-baseline.
+    """
+    regressions = []
+    for size, stages in current.items():
+        for stage, result in stages.items():
+            if stage.startswith("_"):
+                continue
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None:
+                regressions.append(f"{size} nodes / {stage}: no baseline (re-record with --save-baseline)")
+                continue
+            limit = reference["median_ms"] * (1 + tolerance)
+            if result["median_ms"] > limit and result["median_ms"] - reference["median_ms"] > noise_floor_ms:
+                regressions.append(
+                    f"{size} nodes / {stage}: {result['median_ms']:.3f} ms "
+                    f"vs baseline {reference['median_ms']:.3f} ms (limit {limit:.3f} ms)"
+                )
+    return regressions
+
+
+def print_results(size, stages):
+    print(f"\n{int(size):,} nodes ({stages['_pubs']:,} pubs)")
+    print(f"  {'stage':<16} {'median ms':>12} {'best ms':>12} {'peak KiB':>12}")
+    for stage, result in stages.items():
+        if stage.startswith("_"):
+            continue
+        print(f"  {stage:<16} {result['median_ms']:12.3f} {result['min_ms']:12.3f} {result['peak_kib']:12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Dataset sizes (nodes)")
+    parser.add_argument("--queries", type=int, default=50, help="Requests timed per per-query stage")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write results to {BASELINE_FILE}")
+    parser.add_argument("--compare", action="store_true", help="Fail if a stage regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown, as a fraction")
+    parser.add_argument("--noise-floor-ms", type=float, default=0.05, help="Ignore differences below this")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    disable_progress_bars()
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = run_size(size, args.queries)
+        print_results(size, results[str(size)])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {BASELINE_FILE}")
+
+    if args.compare:
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.noise_floor_ms)
+        if regressions:
+            print("\nRegressions or stages missing from the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
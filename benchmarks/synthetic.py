@@ -0,0 +1,151 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# Rough bounding box of Antwerp
+ANTWERP_LAT = (51.17, 51.28)
+ANTWERP_LON = (4.33, 4.47)
+
+PUB_NAMES = ["De Kroon", "Het Anker", "Den Engel", "De Pelikaan", "Café Kulminator", "Paters Vaetje",
+             "De Groote Witte Arend", "Oud Arsenaal", "Bar Paniek", "De Duifkens"]
+
+
+def make_pub_tags(rng, i):
+    """Plausible OSM tags for a synthetic pub"""
+    tags = {"amenity": "pub", "name": f"{PUB_NAMES[i % len(PUB_NAMES)]} {i}"}
+    if rng.random() < 0.4:
+        tags["outdoor_seating"] = "yes" if rng.random() < 0.7 else "no"
+    if rng.random() < 0.5:
+        tags["opening_hours"] = str(rng.choice(["Mo-Su 11:00-02:00", "Tu-Sa 16:00-01:00; Su 12:00-22:00",
+                                                "Mo-Fr 10:00-23:00", "24/7"]))
+    if rng.random() < 0.2:
+        tags["cuisine"] = str(rng.choice(["belgian", "burger", "regional"]))
+    if rng.random() < 0.15:
+        tags["brewery"] = "De Koninck;Westmalle;Duvel"
+    if rng.random() < 0.1:
+        tags["live_music"] = "yes"
+    if rng.random() < 0.3:
+        tags["wheelchair"] = str(rng.choice(["yes", "no", "limited"]))
+    return tags
+
+
+def make_osm_rows(n_nodes, pub_fraction=0.01, seed=0):
+    """
+    Synthetic OSM-like rows with the schema of ns2agi/antwerp-osm-navigator
+
+    Args:
+        n_nodes (int): Number of rows to generate
+        pub_fraction (float): Share of rows tagged amenity=pub
+        seed (int): Random seed, so runs are comparable
+
+    Returns:
+        dict: Column name -> list, with id, type, lat, lon and tags (JSON string)
+    """
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(*ANTWERP_LAT, n_nodes)
+    lons = rng.uniform(*ANTWERP_LON, n_nodes)
+    kind = rng.random(n_nodes)
+
+    tags = []
+    for i in range(n_nodes):
+        if kind[i] < pub_fraction:
+            tags.append(json.dumps(make_pub_tags(rng, i)))
+        elif kind[i] < pub_fraction + 0.05:
+            tags.append(json.dumps({"amenity": str(rng.choice(["bench", "cafe", "bar", "waste_basket"]))}))
+        elif kind[i] < 0.3:
+            tags.append(json.dumps({"highway": "crossing"}))
+        else:
+            tags.append("{}")
+
+    return {
+        "id": np.arange(1, n_nodes + 1, dtype=np.int64).tolist(),
+        "type": ["node"] * n_nodes,
+        "lat": lats.tolist(),
+        "lon": lons.tolist(),
+        "tags": tags,
+    }
+
+
+def make_pub_df(n_pubs, seed=0):
+    """
+    Synthetic pub table in the shape find_pubs returns (tags already parsed)
+
+    Args:
+        n_pubs (int): Number of pubs
+        seed (int): Random seed
+
+    Returns:
+        DataFrame: Columns id, type, lat, lon, tags
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(1, n_pubs + 1, dtype=np.int64),
+        "type": ["node"] * n_pubs,
+        "lat": rng.uniform(*ANTWERP_LAT, n_pubs),
+        "lon": rng.uniform(*ANTWERP_LON, n_pubs),
+        "tags": [make_pub_tags(rng, i) for i in range(n_pubs)],
+    })
+
+
+def make_street_rows(spacing_m=120, shape_m=30, river_lon=4.395, bridges=(51.205, 51.23, 51.255), seed=0):
+    """
+    Synthetic walkable street grid over Antwerp, in the dataset schema plus a `nodes` column
+
+    Streets run north-south and east-west every spacing_m metres, with a
+    shape node every shape_m metres. East-west streets are cut at a river
+    at river_lon except at the given bridge latitudes, so straight-line and
+    walking distances differ a lot near it.
+
+    Returns:
+        dict: Column name -> list (id, type, lat, lon, tags, nodes); ways have
+            no coordinates and node rows have no node list
+    """
+    rng = np.random.default_rng(seed)
+    lat_step = spacing_m / 111_320
+    lon_step = spacing_m / (111_320 * np.cos(np.radians(np.mean(ANTWERP_LAT))))
+    lats = np.arange(ANTWERP_LAT[0], ANTWERP_LAT[1], lat_step)
+    lons = np.arange(ANTWERP_LON[0], ANTWERP_LON[1], lon_step)
+    per_cell = max(1, int(round(spacing_m / shape_m)))
+
+    rows = {"id": [], "type": [], "lat": [], "lon": [], "tags": [], "nodes": []}
+    ids = {}
+
+    def node(lat, lon):
+        key = (round(lat, 7), round(lon, 7))
+        if key not in ids:
+            ids[key] = len(ids) + 1
+            rows["id"].append(ids[key])
+            rows["type"].append("node")
+            rows["lat"].append(float(lat))
+            rows["lon"].append(float(lon))
+            rows["tags"].append("{}")
+            rows["nodes"].append([])
+        return ids[key]
+
+    ways = []
+    for lon in lons:
+        refs = [node(lat + lat_step * k / per_cell, lon) for lat in lats[:-1] for k in range(per_cell)]
+        ways.append((refs + [node(lats[-1], lon)], str(rng.choice(["residential", "footway", "living_street"]))))
+    for lat in lats:
+        bridge = any(abs(lat - b) < lat_step / 2 for b in bridges)
+        refs = []
+        for lon in lons[:-1]:
+            for k in range(per_cell):
+                point = lon + lon_step * k / per_cell
+                if not bridge and point < river_lon <= point + lon_step / per_cell:
+                    # The river: end this street and start a new one on the other bank
+                    ways.append((refs + [node(lat, point)], "residential"))
+                    refs = []
+                    break
+                refs.append(node(lat, point))
+        ways.append((refs + [node(lat, lons[-1])], "residential"))
+
+    for i, (refs, highway) in enumerate(ways):
+        rows["id"].append(10_000_000 + i)
+        rows["type"].append("way")
+        rows["lat"].append(float("nan"))
+        rows["lon"].append(float("nan"))
+        rows["tags"].append(json.dumps({"highway": highway}))
+        rows["nodes"].append(refs)
+    return rows
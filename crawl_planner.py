@@ -0,0 +1,142 @@
+import os
+import time
+
+import numpy as np
+
+# Crawls up to this many stops are solved exactly; longer ones heuristically
+DEFAULT_EXACT_MAX = int(os.environ.get("CRAWL_EXACT_MAX", 8))
+# Time one route may take to optimise
+DEFAULT_BUDGET_MS = float(os.environ.get("CRAWL_BUDGET_MS", 50))
+
+
+def route_length(matrix, order, round_trip=False):
+    """
+    Length of a route that starts at row 0 and visits the stops in order
+
+    Args:
+        matrix (ndarray): (k + 1) x (k + 1) distances; row/column 0 is the start
+        order (list): Stop numbers (1..k) in visiting order
+        round_trip (bool): Also walk back to the start
+
+    Returns:
+        float: Total distance
+    """
+    path = [0] + list(order) + ([0] if round_trip else [])
+    return float(sum(matrix[a, b] for a, b in zip(path, path[1:])))
+
+
+def solve_exact(matrix, round_trip=False):
+    """
+    Shortest visiting order by dynamic programming over subsets (Held-Karp)
+
+    O(2^k * k^2) time, so only for short crawls.
+
+    Returns:
+        list: Stop numbers (1..k) in visiting order
+    """
+    k = len(matrix) - 1
+    if k <= 1:
+        return list(range(1, k + 1))
+    full = (1 << k) - 1
+    # best[mask][j]: shortest path from the start through the stops in mask, ending at stop j
+    best = np.full((1 << k, k), np.inf)
+    parent = np.full((1 << k, k), -1, dtype=np.int64)
+    for j in range(k):
+        best[1 << j, j] = matrix[0, j + 1]
+    legs = matrix[1:, 1:]
+    for mask in range(1, full + 1):
+        row = best[mask]
+        if not np.isfinite(row).any():
+            continue
+        for j in range(k):
+            if mask & (1 << j):
+                continue
+            # Extend every path ending in mask by stop j, keep the shortest
+            through = row + legs[:, j]
+            i = int(np.argmin(through))
+            next_mask = mask | (1 << j)
+            if through[i] < best[next_mask, j]:
+                best[next_mask, j] = through[i]
+                parent[next_mask, j] = i
+
+    ends = best[full] + (matrix[1:, 0] if round_trip else 0.0)
+    j = int(np.argmin(ends))
+    order = []
+    mask = full
+    while j >= 0:
+        order.append(j + 1)
+        j, mask = int(parent[mask, j]), mask & ~(1 << j)
+    return order[::-1]
+
+
+def nearest_neighbour(matrix):
+    """Visiting order that always walks to the closest stop not visited yet"""
+    k = len(matrix) - 1
+    left = set(range(1, k + 1))
+    order = []
+    current = 0
+    while left:
+        # Ties go to the lower stop number, which is the closer pub from the start
+        current = min(left, key=lambda stop: (matrix[current, stop], stop))
+        left.discard(current)
+        order.append(current)
+    return order
+
+
+def two_opt(matrix, order, round_trip=False, deadline=None):
+    """
+    Improve a visiting order by reversing segments while that shortens it
+
+    Stops at a local optimum or at the deadline (time.monotonic() value),
+    whichever comes first.
+
+    Returns:
+        tuple: (improved order, True if it reached a local optimum)
+    """
+    path = [0] + list(order) + ([0] if round_trip else [])
+    last = len(path) - (1 if round_trip else 0)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, last - 1):
+            if deadline is not None and time.monotonic() > deadline:
+                return path[1:last], False
+            a, b = path[i - 1], path[i]
+            for j in range(i + 1, last):
+                c = path[j]
+                d = path[j + 1] if j + 1 < len(path) else None
+                # Replace edges a-b and c-d by a-c and b-d (no c-d at the end of an open crawl)
+                delta = matrix[a, c] - matrix[a, b]
+                if d is not None:
+                    delta += matrix[b, d] - matrix[c, d]
+                if delta < -1e-12:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    a, b = path[i - 1], path[i]
+                    improved = True
+    return path[1:last], True
+
+
+def plan_crawl(matrix, round_trip=False, budget_ms=DEFAULT_BUDGET_MS, exact_max=DEFAULT_EXACT_MAX):
+    """
+    Near-optimal order to visit every stop, starting from row 0
+
+    Up to exact_max stops the shortest order is computed exactly. Longer
+    crawls start from the nearest-neighbour order and are improved with 2-opt
+    until no reversal helps or the time budget is used up.
+
+    Args:
+        matrix (ndarray): (k + 1) x (k + 1) distances, row/column 0 the start
+        round_trip (bool): The crawl ends back at the start
+        budget_ms (float): Time the heuristic may spend improving the route
+        exact_max (int): Largest number of stops solved exactly
+
+    Returns:
+        tuple: (stop numbers 1..k in visiting order, method: "exact",
+            "2-opt" or "2-opt (time budget)")
+    """
+    k = len(matrix) - 1
+    if k <= exact_max:
+        return solve_exact(matrix, round_trip), "exact"
+    deadline = time.monotonic() + budget_ms / 1000
+    order, converged = two_opt(matrix, nearest_neighbour(matrix), round_trip, deadline)
+    return order, "2-opt" if converged else "2-opt (time budget)"
@@ -1,8 +1,11 @@
 import os
+import sys
 
-from openai import OpenAI
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_client import LLMClient, OpenRouterProvider  # noqa: E402
+
 load_dotenv()
 
 # Configure the API key (replace with your actual key or use environment variables)
@@ -11,26 +14,15 @@ if not api_key:
     print("Error: OPENROUTER_API_KEY environment variable not set.")
     exit()
 
-# Create the client
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=api_key,
-)
-
 prompt = "What food should I buy for a hackathon? I need to make sure that everyone's brains are in top form. Last time everyone seemed to like bananas, pizzas and waffles"
 model_name = "tngtech/deepseek-r1t-chimera:free"
 
-# Make the API call
-completion = client.chat.completions.create(
-    model=model_name,
-    messages=[
-        {
-            "role": "user",
-            "content": prompt,
-        },
-    ],
-)
+# Same client layer the app uses: keep-alive connection, deadline, retries and circuit breaker
+client = LLMClient(OpenRouterProvider(api_key, model=model_name))
+
+# Make the API call (free models can be slow, so allow a generous deadline)
+response = client.generate(prompt, timeout=120)
 
 # Print the response
 print(f"Prompt: {prompt}\n")
-print(f"Response: {completion.choices[0].message.content}")
+print(f"Response: {response}")
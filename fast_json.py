@@ -0,0 +1,49 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional: pip install orjson for faster responses
+    orjson = None
+
+
+def dumps(obj, default=None, sort_keys=False):
+    """
+    Serialise to a compact JSON string, with orjson when it is installed
+
+    orjson writes NaN as null (valid JSON); the standard library fallback
+    does the same so both paths give the same output.
+
+    Args:
+        obj: Value to serialise
+        default (callable, optional): Converts objects JSON does not know
+        sort_keys (bool): Sort object keys
+
+    Returns:
+        str: The JSON document
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+    kwargs = dict(default=default, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False, allow_nan=False)
+    try:
+        return json.dumps(obj, **kwargs)
+    except ValueError:
+        # Only documents with NaN/inf (pubs without coordinates) pay for the extra pass
+        return json.dumps(_nan_to_none(obj, default), **kwargs)
+
+
+def _nan_to_none(obj, default):
+    if isinstance(obj, float):
+        return None if obj != obj or obj in (float("inf"), float("-inf")) else obj
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v, default) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_nan_to_none(v, default) for v in obj]
+    if default is not None and not isinstance(obj, (str, int, bool, type(None))):
+        try:
+            return _nan_to_none(default(obj), default)
+        except TypeError:
+            return obj
+    return obj
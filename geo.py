@@ -0,0 +1,109 @@
+from math import radians, cos, sin, asin, sqrt
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # Radius of earth in kilometers
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """
+    Calculate the great circle distance between two points
+    on the earth (specified in decimal degrees)
+    """
+    # Convert decimal degrees to radians
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+
+    # Haversine formula
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    r = EARTH_RADIUS_KM
+    return c * r
+
+
+def haversine_np(lon1, lat1, lons, lats):
+    """
+    Vectorized haversine from one point to many points
+
+    Same formula as haversine, evaluated over whole arrays at once. Points with
+    a missing (NaN) latitude or longitude get an infinite distance so they
+    always sort last.
+
+    Args:
+        lon1, lat1 (float): Origin in decimal degrees
+        lons, lats (array-like): Destinations in decimal degrees
+
+    Returns:
+        ndarray: Distances in kilometers
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    lon1, lat1 = radians(lon1), radians(lat1)
+    lon2 = np.radians(lons)
+    lat2 = np.radians(lats)
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat / 2) ** 2 + cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    # Clip guards against a creeping just above 1 from rounding
+    distance = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) * EARTH_RADIUS_KM
+
+    distance[np.isnan(distance)] = np.inf
+    return distance
+
+
+def smallest_k(values, k):
+    """
+    Indices of the k smallest values, in ascending order
+
+    Uses argpartition to select the k candidates in O(N) and only sorts those
+    k, instead of sorting the whole array. Ties are broken by position so the
+    result is deterministic.
+
+    Args:
+        values (ndarray): 1-D array of distances
+        k (int): Number of indices to return
+
+    Returns:
+        ndarray: Integer indices into values
+    """
+    n = len(values)
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        # argpartition picks arbitrarily among values tied with the k-th one,
+        # so keep every candidate up to that value and cut after sorting
+        kth = values[np.argpartition(values, k - 1)[k - 1]]
+        candidates = np.flatnonzero(values <= kth)
+    else:
+        candidates = np.arange(n)
+    # lexsort sorts by the last key first: distance, then original position
+    order = np.lexsort((candidates, values[candidates]))
+    return candidates[order][:k]
+
+
+def haversine_matrix(lons1, lats1, lons2, lats2):
+    """
+    Pairwise haversine distances between two sets of points
+
+    Args:
+        lons1, lats1 (array-like): M origins in decimal degrees
+        lons2, lats2 (array-like): N destinations in decimal degrees
+
+    Returns:
+        ndarray: M x N distances in kilometers (inf where a coordinate is NaN)
+    """
+    lon1 = np.radians(np.asarray(lons1, dtype=np.float64))[:, None]
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    lon2 = np.radians(np.asarray(lons2, dtype=np.float64))[None, :]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    distance = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) * EARTH_RADIUS_KM
+
+    distance[np.isnan(distance)] = np.inf
+    return distance
@@ -0,0 +1,436 @@
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from llm_executor import LLMBusy, LLMTimeout, executor_from_env
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+GEMINI_MODEL = "gemini-2.0-flash"
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_MODEL = "tngtech/deepseek-r1t-chimera:free"
+
+# Rate limits, upstream hiccups and gateway timeouts are worth another try
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+
+
+class LLMError(Exception):
+    """Raised when the LLM API fails or answers with something unusable"""
+
+    def __init__(self, message, status=None, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the LLM while the circuit breaker is open"""
+
+
+class HTTPTransport:
+    """
+    JSON POSTs to one API host over keep-alive connections
+
+    Each thread keeps its own connection (http.client connections are not
+    thread-safe), so the LLM pool's few worker threads reuse a handful of
+    TCP/TLS connections instead of paying a handshake on every call.
+    """
+
+    def __init__(self, base_url, headers=None):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connection(self, timeout):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            conn = self._local.conn = connection_class(self.host, self.port, timeout=timeout)
+            with self._lock:
+                self.connections_opened += 1
+        else:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+        return conn
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def post_json(self, path, payload, timeout=None):
+        """
+        POST a JSON body and return the decoded JSON answer
+
+        Args:
+            path (str): Path below the base URL
+            payload: JSON-serialisable request body
+            timeout (float, optional): Socket timeout in seconds
+
+        Returns:
+            The decoded response body
+
+        Raises:
+            LLMError: On connection errors, HTTP errors and invalid JSON
+        """
+        body = json.dumps(payload).encode("utf-8")
+        for fresh in (False, True):
+            conn = self._connection(timeout)
+            reused = conn.sock is not None
+            try:
+                conn.request("POST", self.base_path + path, body=body, headers=self.headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                # A broken or timed-out connection cannot be used again
+                self.close()
+                # The server may have dropped an idle keep-alive connection: reconnect once
+                if reused and not fresh and not isinstance(e, TimeoutError):
+                    continue
+                raise LLMError(f"LLM request failed: {e!r}", retryable=True) from e
+
+        if response.will_close:
+            self.close()
+        if response.status >= 400:
+            raise LLMError(
+                f"LLM API returned HTTP {response.status}: {data[:200].decode('utf-8', 'replace')}",
+                status=response.status, retryable=response.status in RETRYABLE_STATUS,
+            )
+        try:
+            return json.loads(data)
+        except ValueError:
+            raise LLMError("LLM API returned invalid JSON", status=response.status) from None
+
+
+class GeminiProvider:
+    """Google Gemini through the generateContent REST endpoint"""
+
+    name = "gemini"
+
+    def __init__(self, api_key, model=GEMINI_MODEL, base_url=GEMINI_BASE_URL):
+        self.model = model
+        self.transport = HTTPTransport(base_url, {"x-goog-api-key": api_key})
+
+    def complete(self, prompt, timeout=None):
+        data = self.transport.post_json(
+            f"/models/{self.model}:generateContent",
+            {"contents": [{"parts": [{"text": prompt}]}]},
+            timeout,
+        )
+        try:
+            return "".join(part.get("text", "") for part in data["candidates"][0]["content"]["parts"])
+        except (KeyError, IndexError, TypeError):
+            raise LLMError("Gemini returned no text (empty or blocked response)") from None
+
+
+class OpenRouterProvider:
+    """OpenRouter, or any other OpenAI-compatible chat completions API"""
+
+    name = "openrouter"
+
+    def __init__(self, api_key, model=OPENROUTER_MODEL, base_url=OPENROUTER_BASE_URL):
+        self.model = model
+        self.transport = HTTPTransport(base_url, {"Authorization": f"Bearer {api_key}"})
+
+    def complete(self, prompt, timeout=None):
+        data = self.transport.post_json(
+            "/chat/completions",
+            {"model": self.model, "messages": [{"role": "user", "content": prompt}]},
+            timeout,
+        )
+        try:
+            return data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise LLMError("OpenRouter returned no message") from None
+
+
+class ModelProvider:
+    """Adapter for any object with generate_content(prompt) -> response.text (SDK models, stubs)"""
+
+    name = "model"
+
+    def __init__(self, model):
+        self.model = model
+
+    def complete(self, prompt, timeout=None):
+        return self.model.generate_content(prompt).text
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing
+
+    Outcomes of the last window_seconds are kept. Once at least min_calls
+    finished in the window and the share of failures reaches error_rate, the
+    breaker opens and calls are refused straight away for cooldown seconds.
+    After that one trial call is let through (half-open): if it succeeds the
+    breaker closes, otherwise it stays open for another cooldown.
+
+    allow() hands out a ticket that goes back into record() or cancel(), so
+    the trial can be told apart from calls that were let through before the
+    breaker opened and only finish now; those late outcomes are ignored.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    # Tickets returned by allow()
+    CALL = "call"
+    TRIAL = "trial"
+
+    def __init__(self, error_rate=0.5, min_calls=10, window_seconds=30.0, cooldown=15.0, clock=time.monotonic):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self._outcomes = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.short_circuited = 0
+
+    def allow(self):
+        """
+        Whether a call may go ahead now
+
+        Returns:
+            str or None: CALL or TRIAL as the ticket for record()/cancel(),
+            None when the call is refused
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self._opened_at < self.cooldown:
+                    self.short_circuited += 1
+                    return None
+                self.state = self.HALF_OPEN
+                self._trial = False
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    self.short_circuited += 1
+                    return None
+                self._trial = True
+                return self.TRIAL
+            return self.CALL
+
+    def record(self, success, ticket=CALL):
+        """
+        Record the outcome of a call that allow() let through
+
+        Args:
+            success (bool): Whether the call succeeded
+            ticket (str): What allow() returned for the call
+        """
+        with self._lock:
+            now = self.clock()
+            if ticket == self.TRIAL:
+                self._trial = False
+                if success:
+                    self.state = self.CLOSED
+                else:
+                    self._open(now)
+                return
+            if self.state != self.CLOSED:
+                # Let through before the breaker opened; the trial decides now
+                return
+
+            self._outcomes.append((now, success))
+            if not success:
+                self._failures += 1
+            while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+                _, ok = self._outcomes.popleft()
+                if not ok:
+                    self._failures -= 1
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.error_rate:
+                self._open(now)
+
+    def cancel(self, ticket=CALL):
+        """Give back a call that allow() let through but that never reached the upstream"""
+        if ticket == self.TRIAL:
+            with self._lock:
+                self._trial = False
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self._failures = 0
+        self.opened += 1
+
+
+class LLMClient:
+    """
+    One LLM provider behind a concurrency cap, a deadline, retries and a circuit breaker
+
+    Calls run on a BoundedLLMExecutor, so at most its max_concurrency are in
+    flight and a caller waits at most its timeout. Inside that deadline,
+    connection errors and retryable HTTP statuses are retried with full
+    jitter backoff, so callers that failed together do not retry together.
+    Every finished call is reported to the circuit breaker; while it is open
+    generate() raises CircuitOpen without touching the network, and callers
+    fall back to their local answer.
+    """
+
+    def __init__(self, provider, executor=None, breaker=None, retries=2, backoff=0.25, max_backoff=2.0):
+        self.provider = provider
+        self.executor = executor if executor is not None else executor_from_env()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retried = 0
+
+    @property
+    def available(self):
+        return self.provider is not None
+
+    def generate(self, prompt, timeout=None):
+        """
+        Ask the LLM and return its text answer
+
+        Args:
+            prompt (str): The prompt
+            timeout (float, optional): Deadline in seconds, defaults to the executor's
+
+        Returns:
+            str: The answer text
+
+        Raises:
+            CircuitOpen: While the circuit breaker is open
+            LLMBusy: When the pool and its queue are full
+            LLMTimeout: When the deadline passes
+            LLMError: When the provider failed and retrying did not help
+        """
+        if self.provider is None:
+            raise LLMError("No LLM provider configured")
+        ticket = self.breaker.allow()
+        if not ticket:
+            raise CircuitOpen("LLM circuit breaker is open after repeated failures")
+
+        timeout = self.executor.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            text = self.executor.call(self._attempts, prompt, deadline, timeout=timeout)
+        except LLMBusy:
+            # Our own pool is full; that says nothing about the upstream
+            self.breaker.cancel(ticket)
+            raise
+        except Exception:
+            self.breaker.record(False, ticket)
+            raise
+        self.breaker.record(True, ticket)
+        return text
+
+    def _attempts(self, prompt, deadline):
+        attempt = 0
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise LLMTimeout("LLM deadline passed before the call could be made")
+            try:
+                return self.provider.complete(prompt, remaining)
+            except LLMError as e:
+                if not e.retryable or attempt >= self.retries:
+                    raise
+                # Full jitter: a random wait up to the exponential backoff
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+            self.retried += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self):
+        stats = self.executor.stats()
+        stats.update({
+            "provider": self.provider.name if self.provider is not None else None,
+            "retries": self.retried,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "short_circuited": self.breaker.short_circuited,
+        })
+        return stats
+
+
+def provider_from_env():
+    """
+    Build the LLM provider from environment variables
+
+    LLM_PROVIDER: "gemini" (default) or "openrouter"
+    GOOGLE_API_KEY, GEMINI_MODEL, GEMINI_BASE_URL: Gemini settings
+    OPENROUTER_API_KEY, OPENROUTER_MODEL, OPENROUTER_BASE_URL: OpenRouter settings
+
+    Returns:
+        The provider, or None when its API key is not set
+    """
+    name = os.environ.get("LLM_PROVIDER", "gemini").lower()
+    if name == "gemini":
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            return None
+        return GeminiProvider(
+            api_key,
+            model=os.environ.get("GEMINI_MODEL", GEMINI_MODEL),
+            base_url=os.environ.get("GEMINI_BASE_URL", GEMINI_BASE_URL),
+        )
+    if name == "openrouter":
+        api_key = os.environ.get("OPENROUTER_API_KEY")
+        if not api_key:
+            return None
+        return OpenRouterProvider(
+            api_key,
+            model=os.environ.get("OPENROUTER_MODEL", OPENROUTER_MODEL),
+            base_url=os.environ.get("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL),
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER '{name}'")
+
+
+def client_from_env():
+    """
+    Build the shared LLM client from environment variables
+
+    Provider settings are read by provider_from_env and pool settings by
+    executor_from_env. Also:
+
+    LLM_RETRIES: Retries per call after the first attempt
+    LLM_RETRY_BACKOFF: Base backoff in seconds (doubles per retry, jittered)
+    LLM_BREAKER_ERROR_RATE: Failure share that opens the circuit breaker
+    LLM_BREAKER_MIN_CALLS: Calls in the window before the breaker may open
+    LLM_BREAKER_WINDOW: Window of recent calls in seconds
+    LLM_BREAKER_COOLDOWN: Seconds the breaker stays open before a trial call
+
+    Returns:
+        LLMClient: The client; its provider is None when no API key is set
+    """
+    breaker = CircuitBreaker(
+        error_rate=float(os.environ.get("LLM_BREAKER_ERROR_RATE", 0.5)),
+        min_calls=int(os.environ.get("LLM_BREAKER_MIN_CALLS", 10)),
+        window_seconds=float(os.environ.get("LLM_BREAKER_WINDOW", 30)),
+        cooldown=float(os.environ.get("LLM_BREAKER_COOLDOWN", 15)),
+    )
+    return LLMClient(
+        provider_from_env(),
+        executor=executor_from_env(),
+        breaker=breaker,
+        retries=int(os.environ.get("LLM_RETRIES", 2)),
+        backoff=float(os.environ.get("LLM_RETRY_BACKOFF", 0.25)),
+    )
@@ -0,0 +1,111 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+
+class LLMBusy(Exception):
+    """Raised when every LLM slot and queue position is taken"""
+
+
+class LLMTimeout(Exception):
+    """Raised when an LLM call does not finish within its deadline"""
+
+
+class BoundedLLMExecutor:
+    """
+    Runs blocking LLM calls on a small dedicated thread pool
+
+    At most max_concurrency calls are in flight and at most max_pending more
+    wait behind them; anything beyond that is rejected straight away with
+    LLMBusy. Callers wait at most `timeout` seconds for a result and then get
+    LLMTimeout, so a slow upstream holds a request for a bounded time instead
+    of for as long as the upstream takes. A call that timed out keeps its slot
+    until it really finishes, so a degraded upstream cannot pile up threads.
+    """
+
+    def __init__(self, max_concurrency=8, max_pending=32, timeout=8.0):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._slots = threading.BoundedSemaphore(max_concurrency + max_pending)
+        self._counter_lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn on the LLM pool, or raise LLMBusy if the pool is saturated"""
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise LLMBusy("Too many LLM calls in flight")
+        self._count("calls")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            self._count("errors")
+
+    def call(self, fn, *args, timeout=None, **kwargs):
+        """
+        Run fn on the LLM pool and wait for its result
+
+        Args:
+            fn (callable): Blocking function, e.g. model.generate_content
+            timeout (float, optional): Deadline in seconds, defaults to self.timeout
+
+        Returns:
+            The return value of fn
+        """
+        future = self.submit(fn, *args, **kwargs)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            self._count("timeouts")
+            raise LLMTimeout(f"LLM call did not finish within {timeout}s")
+
+    def in_flight(self):
+        """Number of calls currently running or queued"""
+        return self.max_concurrency + self.max_pending - self._slots._value
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight(),
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+def executor_from_env():
+    """
+    Build the LLM executor from environment variables
+
+    LLM_MAX_CONCURRENCY: Calls allowed in flight at once
+    LLM_MAX_PENDING: Calls allowed to wait for a slot
+    LLM_TIMEOUT_SECONDS: Per-call deadline
+    """
+    return BoundedLLMExecutor(
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 8)),
+        max_pending=int(os.environ.get("LLM_MAX_PENDING", 32)),
+        timeout=float(os.environ.get("LLM_TIMEOUT_SECONDS", 8)),
+    )
@@ -0,0 +1,68 @@
+import hashlib
+import json
+
+from markupsafe import escape
+
+from pub_names import UNNAMED_FORMAT
+
+# Tag keys that are shown elsewhere in the popup (name) or not useful there
+POPUP_SKIP_TAGS = {"name"}
+
+
+def tags_popup_html(tags):
+    """Popup lines for a pub's OSM tags, escaped for safe use as HTML"""
+    return "".join(
+        f"<b>{escape(k)}:</b> {escape(v)}<br>"
+        for k, v in (tags or {}).items()
+        if k not in POPUP_SKIP_TAGS
+    )
+
+
+class MarkerLayer:
+    """
+    Map markers for every pub in the catalogue, rendered once per catalogue load
+
+    The popup HTML built from each pub's tags never changes between requests,
+    so it is rendered here once. The full layer is serialised to JSON once as
+    well and served with an ETag, so browsers download it only when the
+    catalogue changes; each results page then only adds the user marker and
+    the nearby/selected pubs on top.
+    """
+
+    def __init__(self, pub_ids, names, lats, lons, tag_dicts):
+        # Popups by table position (CatalogueView.position_of finds a pub's)
+        self.popups = []
+        markers = []
+
+        for pub_id, name, lat, lon, tags in zip(pub_ids, names, lats, lons, tag_dicts):
+            tag_html = tags_popup_html(tags)
+            self.popups.append(tag_html)
+            if lat != lat or lon != lon:  # NaN check: pubs without a location are not drawn
+                continue
+            markers.append([str(pub_id), round(float(lat), 7), round(float(lon), 7),
+                            f"<b>Name:</b> {escape(name)}<br>{tag_html}"])
+
+        self.json = json.dumps({"markers": markers}, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.sha1(self.json).hexdigest()
+
+    def __len__(self):
+        return len(self.popups)
+
+    def tags_popup(self, row):
+        """Pre-rendered tag lines of the pub at a table position, or None if it is not in the layer"""
+        return None if row is None else self.popups[row]
+
+
+def build_marker_layer(pub_df):
+    """Build the marker layer for a pub table as returned by find_pubs"""
+    names = [
+        (tags or {}).get("name", UNNAMED_FORMAT.format(pub_id))
+        for pub_id, tags in zip(pub_df["id"], pub_df["tags"])
+    ]
+    return MarkerLayer(
+        pub_df["id"],
+        names,
+        pub_df["lat"].to_numpy(dtype=float, na_value=float("nan")),
+        pub_df["lon"].to_numpy(dtype=float, na_value=float("nan")),
+        pub_df["tags"],
+    )
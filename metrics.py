@@ -0,0 +1,178 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Latency buckets in seconds: sub-millisecond index lookups up to multi-second LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format"""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One counter per bucket plus +Inf, then the sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in sorted(self._series.items())]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(key + (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter in the Prometheus text format"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(key)} {value}" for key, value in items)
+        return lines
+
+
+class Collected:
+    """Metric whose values are read from a callback at scrape time"""
+
+    def __init__(self, name, help_text, metric_type, collect):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        try:
+            values = self.collect()
+        except Exception:
+            return []
+        lines.extend(
+            f"{self.name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}"
+            for labels, value in values
+        )
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Small Prometheus-style registry for stage timings and counters
+
+    When disabled, timer() hands back one shared no-op context manager and
+    inc() returns immediately, so instrumentation costs next to nothing.
+    Metrics are per process; with several workers, scrape each worker or run a
+    single-process server.
+    """
+
+    def __init__(self, enabled=True, prefix="pubfinder"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._metrics = []
+        self._null_timer = nullcontext()
+        self.stage_seconds = self.histogram("stage_seconds", "Time spent in each stage of a request")
+        self.request_seconds = self.histogram("request_seconds", "Total request time per route")
+        self.events = self.counter("events_total", "Notable events, e.g. where a vibe match came from")
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(f"{self.prefix}_{name}", help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        metric = Counter(f"{self.prefix}_{name}", help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def collected(self, name, help_text, metric_type, collect):
+        """Register a metric read at scrape time; collect returns [(labels dict, value), ...]"""
+        metric = Collected(f"{self.prefix}_{name}", help_text, metric_type, collect)
+        self._metrics.append(metric)
+        return metric
+
+    def timer(self, stage):
+        """Context manager recording the time spent in a stage"""
+        if not self.enabled:
+            return self._null_timer
+        return _Timer(self.stage_seconds, {"stage": stage})
+
+    def request_timer(self, route):
+        """Context manager recording the total time of a request"""
+        if not self.enabled:
+            return self._null_timer
+        return _Timer(self.request_seconds, {"route": route})
+
+    def inc(self, event, **labels):
+        """Count an event"""
+        if self.enabled:
+            self.events.inc(event=event, **labels)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(enabled=os.environ.get("METRICS_ENABLED", "1") == "1")
@@ -0,0 +1,247 @@
+import os
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+# 672 slots fit in 11 64-bit words per pub
+WORDS = (WEEK_SLOTS + 63) // 64
+
+DAYS = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+# Holiday selectors: rules for them are skipped, since we do not know the holidays
+HOLIDAYS = ("PH", "SH")
+
+# Local time of the catalogue's pubs; opening hours are given in it
+DEFAULT_TIMEZONE = os.environ.get("OPENING_HOURS_TZ", "Europe/Brussels")
+
+_DAY = r"(?:Mo|Tu|We|Th|Fr|Sa|Su|PH|SH)"
+_DAY_SPEC = re.compile(rf"^{_DAY}(?:-{_DAY})?(?:,{_DAY}(?:-{_DAY})?)*$")
+_TIME = r"(\d{1,2}):(\d\d)"
+_SPAN = re.compile(rf"^{_TIME}(?:-{_TIME}|(\+))$")
+# A comma right after a time that starts a new day selector begins an additional rule
+_ADDITIONAL_RULE = re.compile(rf"(?<=\d),(?={_DAY}\b)")
+
+
+class UnparseableHours(ValueError):
+    """An opening_hours value outside the supported subset of the OSM syntax"""
+
+
+def _parse_days(spec):
+    # "Mo-Fr,Su" -> [0, 1, 2, 3, 4, 6]; holidays are dropped
+    if not _DAY_SPEC.match(spec):
+        raise UnparseableHours(spec)
+    days = []
+    for part in spec.split(","):
+        if part in HOLIDAYS:
+            continue
+        first, _, last = part.partition("-")
+        if first in HOLIDAYS or last in HOLIDAYS:
+            raise UnparseableHours(spec)
+        start = DAY_INDEX[first]
+        end = DAY_INDEX[last] if last else start
+        # Ranges may wrap around the week: Fr-Mo
+        days.extend((start + i) % 7 for i in range((end - start) % 7 + 1))
+    return days
+
+
+def _parse_spans(spec):
+    # "10:00-14:00,17:00-01:00" -> [(600, 840), (1020, 1500)] in minutes from midnight
+    spans = []
+    for part in spec.split(","):
+        match = _SPAN.match(part)
+        if not match:
+            raise UnparseableHours(spec)
+        start = int(match.group(1)) * 60 + int(match.group(2))
+        if match.group(5):
+            # Open end ("18:00+"): taken as open until midnight
+            end = 24 * 60
+        else:
+            end = int(match.group(3)) * 60 + int(match.group(4))
+            if end <= start:
+                # Past midnight: 16:00-01:00 closes on the next day
+                end += 24 * 60
+        if start > 24 * 60 or end > 48 * 60 or int(match.group(2)) > 59 or int(match.group(4) or 0) > 59:
+            raise UnparseableHours(spec)
+        spans.append((start, end))
+    return spans
+
+
+def parse_opening_hours(value):
+    """
+    Turn an OSM opening_hours value into a weekly bitmap of 15-minute slots
+
+    Supports the forms pubs use in practice: "24/7", rules separated by ";"
+    (a later rule replaces the hours of the days it names), day selectors
+    with ranges and lists (Mo-Fr, Sa,Su, Fr-Mo), several time spans per rule,
+    spans past midnight (16:00-02:00 or 26:00), open ends (18:00+, taken as
+    open until midnight), "off"/"closed" and additional rules after a comma
+    ("Mo-Fr 10:00-18:00, Sa 12:00-16:00"). Rules for public or school
+    holidays are skipped. Month, week and date selectors, sunrise/sunset and
+    comments are not supported.
+
+    Args:
+        value (str): The opening_hours tag
+
+    Returns:
+        ndarray: WEEK_SLOTS booleans, slot 0 being Monday 00:00-00:15
+
+    Raises:
+        UnparseableHours: If the value is outside the supported syntax
+    """
+    text = " ".join(str(value).split())
+    if text == "24/7":
+        return np.ones(WEEK_SLOTS, dtype=bool)
+    # Normalise "10:00 - 18:00" and "Mo, We" to their compact forms
+    text = re.sub(r"\s*([-,])\s*", r"\1", text)
+
+    day_spans = {}
+    for rule in (part.strip() for part in text.split(";")):
+        if not rule:
+            continue
+        for additional, part in enumerate(_ADDITIONAL_RULE.split(rule)):
+            selector, _, times = part.rpartition(" ")
+            if not selector and _DAY_SPEC.match(times):
+                raise UnparseableHours(part)
+            days = _parse_days(selector) if selector else list(range(7))
+            if selector and not days:
+                # Only public/school holidays: we cannot tell when those are
+                continue
+            spans = [] if times in ("off", "closed") else _parse_spans(times)
+            for day in days:
+                if additional:
+                    day_spans.setdefault(day, []).extend(spans)
+                else:
+                    day_spans[day] = list(spans)
+
+    if not day_spans:
+        raise UnparseableHours(value)
+    week = np.zeros(WEEK_SLOTS, dtype=bool)
+    for day, spans in day_spans.items():
+        for start, end in spans:
+            first = day * SLOTS_PER_DAY + start // SLOT_MINUTES
+            last = day * SLOTS_PER_DAY + -(-end // SLOT_MINUTES)
+            # Sunday night spills over into Monday morning
+            slots = np.arange(first, last) % WEEK_SLOTS
+            week[slots] = True
+    return week
+
+
+def pack_week(week):
+    """Pack WEEK_SLOTS booleans into WORDS little-endian 64-bit words"""
+    packed = np.zeros(WORDS * 8, dtype=np.uint8)
+    bits = np.packbits(week, bitorder="little")
+    packed[:len(bits)] = bits
+    return packed.view("<u8")
+
+
+def week_slot(moment):
+    """Slot of a local datetime in the week (0 is Monday 00:00-00:15)"""
+    return moment.weekday() * SLOTS_PER_DAY + (moment.hour * 60 + moment.minute) // SLOT_MINUTES
+
+
+def local_now(timezone=DEFAULT_TIMEZONE):
+    """The current time where the pubs are"""
+    return datetime.now(ZoneInfo(timezone))
+
+
+def next_arrival(arrival, now=None):
+    """
+    Next time the clock shows an arrival time
+
+    Args:
+        arrival (str): HH:MM, e.g. from the meetup timetable
+        now (datetime, optional): Current local time
+
+    Returns:
+        datetime: Today at that time, or tomorrow if it has passed
+
+    Raises:
+        ValueError: If arrival is not HH:MM
+    """
+    match = re.match(r"^([01]?\d|2[0-3]):([0-5]\d)$", str(arrival or "").strip())
+    if not match:
+        raise ValueError("Arrival time must be given as HH:MM")
+    now = now or local_now()
+    moment = now.replace(hour=int(match.group(1)), minute=int(match.group(2)), second=0, microsecond=0)
+    return moment if moment >= now.replace(second=0, microsecond=0) else moment + timedelta(days=1)
+
+
+class OpeningHours:
+    """
+    Weekly opening bitmaps of every pub in the catalogue
+
+    Built once alongside the pub table: every opening_hours tag is parsed a
+    single time into WORDS 64-bit words, so asking whether candidates are
+    open at some moment is a shift and a mask per pub, not string parsing
+    per request. Pubs without the tag, or with a value that could not be
+    parsed, are "unknown"; the values that failed are kept for the build
+    summary.
+    """
+
+    def __init__(self, tag_dicts):
+        tag_dicts = list(tag_dicts)
+        self.bits = np.zeros((len(tag_dicts), WORDS), dtype="<u8")
+        self.known = np.zeros(len(tag_dicts), dtype=bool)
+        self.unparseable = Counter()
+        # The same few values repeat across a city; parse each once
+        parsed = {}
+        for row, tags in enumerate(tag_dicts):
+            value = (tags or {}).get("opening_hours")
+            if not value:
+                continue
+            words = parsed.get(value)
+            if words is None and value not in parsed:
+                try:
+                    words = pack_week(parse_opening_hours(value))
+                except UnparseableHours:
+                    words = None
+                parsed[value] = words
+            if words is None:
+                self.unparseable[value] += 1
+                continue
+            self.bits[row] = words
+            self.known[row] = True
+        self.tagged = sum(self.unparseable.values()) + int(self.known.sum())
+
+    def __len__(self):
+        return len(self.known)
+
+    def open_at(self, positions, moment, include_unknown=True):
+        """
+        Which of the pubs are open at a moment
+
+        Args:
+            positions (array): Rows of the pubs (iloc positions in the table)
+            moment (datetime or int): Local time, or a week slot
+            include_unknown (bool): Count pubs with unknown hours as open
+
+        Returns:
+            ndarray: One boolean per position
+        """
+        slot = moment if isinstance(moment, (int, np.integer)) else week_slot(moment)
+        positions = np.asarray(positions, dtype=np.intp)
+        is_open = ((self.bits[positions, slot >> 6] >> np.uint64(slot & 63)) & np.uint64(1)).astype(bool)
+        known = self.known[positions]
+        return np.where(known, is_open, include_unknown)
+
+    def status(self, position, moment):
+        """"open", "closed" or "unknown" for one pub"""
+        if not self.known[position]:
+            return "unknown"
+        return "open" if self.open_at([position], moment)[0] else "closed"
+
+    def summary(self, examples=5):
+        """Counts of pubs with parsed, unparseable and missing hours, plus the commonest failures"""
+        return {
+            "pubs": len(self),
+            "parsed": int(self.known.sum()),
+            "unparseable": sum(self.unparseable.values()),
+            "missing": len(self) - self.tagged,
+            "unparseable_examples": [value for value, _ in self.unparseable.most_common(examples)],
+        }
@@ -0,0 +1,97 @@
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+from pub_ingest import CATEGORIES, categorise
+from pub_record import intern_tags
+
+# One element of an OSM diff. lat/lon are None when the diff does not carry
+# coordinates (ways and relations without a <center>).
+Change = namedtuple("Change", ["action", "type", "id", "lat", "lon", "tags"])
+
+ACTIONS = ("create", "modify", "delete")
+
+
+def _float_or_none(value):
+    return float(value) if value not in (None, "") else None
+
+
+def parse_osm_change(source):
+    """
+    Parse an osmChange document (the format of OSM minutely/hourly diffs)
+
+    Args:
+        source (bytes, str or file): The XML document, or an open file
+
+    Returns:
+        list: Change tuples in document order
+
+    Raises:
+        ValueError: If the document is not valid osmChange XML
+    """
+    try:
+        if hasattr(source, "read"):
+            root = ET.parse(source).getroot()
+        else:
+            root = ET.fromstring(source)
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid osmChange document: {e}") from None
+    if root.tag != "osmChange":
+        raise ValueError(f"Expected an <osmChange> document, got <{root.tag}>")
+
+    changes = []
+    for block in root:
+        if block.tag not in ACTIONS:
+            continue
+        for element in block:
+            if element.tag not in ("node", "way", "relation"):
+                continue
+            lat, lon = element.get("lat"), element.get("lon")
+            center = element.find("center")
+            if lat is None and center is not None:
+                lat, lon = center.get("lat"), center.get("lon")
+            tags = {tag.get("k"): tag.get("v") for tag in element.findall("tag")}
+            changes.append(Change(
+                block.tag, element.tag, int(element.get("id")),
+                _float_or_none(lat), _float_or_none(lon), tags,
+            ))
+    return changes
+
+
+def route_changes(changes, regions_for):
+    """
+    Work out what a diff means for each catalogue shard
+
+    Every changed element is removed wherever it currently is, and created or
+    modified elements that belong to a category are added back to the shard
+    of their region and category. Applying the result is idempotent, so a
+    diff that was already applied (or is already in the dataset) is harmless.
+
+    Args:
+        changes (list): Change tuples from parse_osm_change
+        regions_for (callable): (lat, lon) -> list of Region covering the point;
+            called with (None, None) for elements without coordinates
+
+    Returns:
+        tuple: (set of (type, id) keys to remove from every shard,
+                dict (region name, category) -> list of row dicts to add)
+    """
+    removed = set()
+    additions = {}
+    for change in changes:
+        removed.add((change.type, change.id))
+        if change.action == "delete":
+            continue
+        category = categorise(change.tags, tuple(CATEGORIES))
+        if category is None:
+            continue
+        row = {
+            "id": change.id,
+            "type": change.type,
+            "lat": change.lat if change.lat is not None else float("nan"),
+            "lon": change.lon if change.lon is not None else float("nan"),
+            "tags": intern_tags(change.tags),
+            "category": category,
+        }
+        for region in regions_for(change.lat, change.lon):
+            additions.setdefault((region.name, category), []).append(row)
+    return removed, additions
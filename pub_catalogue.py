@@ -0,0 +1,788 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from datasets import load_dataset
+
+from map_layer import build_marker_layer
+from opening_hours import OpeningHours
+from osm_changes import route_changes
+from pub_ingest import CATEGORIES, categorise, load_streaming_source, stream_pubs
+from pub_names import NameIndex
+from pub_record import intern_tags
+from pub_snapshot import (
+    dataset_fingerprint, invalidate_snapshot, is_snapshot_fresh, open_snapshot, read_snapshot_meta, write_snapshot,
+)
+from regions import DEFAULT_REGIONS, load_regions, regions_covering
+from spatial_index import SpatialIndex
+from vibe_profiles import VibeProfiles
+
+DEFAULT_DATASET = "ns2agi/antwerp-osm-navigator"
+DEFAULT_SNAPSHOT_DIR = os.environ.get("PUB_SNAPSHOT_DIR", "data/pub_snapshot")
+
+# "full" materialises the train split and filters it, "streaming" iterates it in
+# batches with bounded memory (needed for regions much larger than Antwerp)
+DEFAULT_INGEST_MODE = os.environ.get("PUB_INGEST_MODE", "full")
+DEFAULT_INGEST_NUM_PROC = int(os.environ.get("PUB_INGEST_NUM_PROC", 1))
+
+# Use an existing snapshot without opening its dataset to check the fingerprint
+# (saves the hub round-trip on every cold start; rebuild with --force or a refresh)
+DEFAULT_TRUST_SNAPSHOT = os.environ.get("PUB_SNAPSHOT_TRUST", "0") == "1"
+
+# Largest step between consecutive diff revisions that is taken at face value
+# (a week of minutely diffs); a bigger jump would make every real diff stale
+DEFAULT_MAX_REVISION_JUMP = int(os.environ.get("CATALOGUE_MAX_REVISION_JUMP", 7 * 24 * 60))
+
+
+def load_source(dataset_name=DEFAULT_DATASET):
+    """Load the train split of the OSM dataset"""
+    return load_dataset(dataset_name)["train"]
+
+
+def extract_pubs(dataset, categories=("pub",)):
+    """Filter a dataset split down to the given categories and parse their tags"""
+    def parse_tags(raw_tags):
+        return json.loads(raw_tags) if raw_tags != '{}' else {}
+
+    # Function to parse tags and check the category
+    def is_wanted(example):
+        try:
+            return categorise(parse_tags(example["tags"]), categories) is not None
+        except:
+            return False
+
+    # Filter for the wanted places
+    pub_data = dataset.filter(is_wanted)
+    print(f"Found {len(pub_data)} places ({', '.join(categories)})")
+
+    # Convert to pandas DataFrame
+    pub_df = pub_data.to_pandas()
+
+    # Parse tags properly
+    pub_df["tags"] = pub_df["tags"].apply(parse_tags)
+    pub_df["category"] = [categorise(tags, categories) for tags in pub_df["tags"]]
+
+    return pub_df
+
+
+def find_pubs(dataset_name=DEFAULT_DATASET):
+    """Load and filter pub data from the dataset"""
+    return extract_pubs(load_source(dataset_name))
+
+
+def open_source(dataset_name=DEFAULT_DATASET, ingest_mode=DEFAULT_INGEST_MODE, num_proc=DEFAULT_INGEST_NUM_PROC):
+    """
+    Open the dataset for the given ingest mode
+
+    Returns:
+        tuple: (dataset split, function(dataset, categories) that extracts the place DataFrame)
+    """
+    if ingest_mode == "streaming":
+        return load_streaming_source(dataset_name), partial(stream_pubs, num_proc=num_proc)
+    if ingest_mode == "full":
+        return load_source(dataset_name), extract_pubs
+    raise ValueError(f"Unknown ingest mode '{ingest_mode}', expected 'full' or 'streaming'")
+
+
+def shard_path(snapshot_dir, region, category):
+    """Snapshot directory of one region/category shard"""
+    return os.path.join(snapshot_dir, region.name, category)
+
+
+def read_shard(snapshot_dir, region, category, fingerprint):
+    """
+    Return the shard's table from its snapshot, or None if there is no fresh one
+
+    The id and coordinate columns are backed by the shared memory-mapped
+    arrays; tags are decoded into per-worker dictionaries. A fingerprint of
+    None takes any complete snapshot of the current format.
+    """
+    path = shard_path(snapshot_dir, region, category)
+    if not is_snapshot_fresh(path, fingerprint):
+        return None
+    try:
+        snapshot = open_snapshot(path)
+        pub_df = snapshot.to_dataframe()
+    except Exception as e:
+        print(f"Warning: could not read snapshot {path}, rebuilding: {e}")
+        return None
+    pub_df["category"] = category
+    # Diffs that were applied to the shard before it was snapshotted
+    pub_df.attrs["revision"] = snapshot.meta.get("revision", 0)
+    return pub_df
+
+
+def stored_revision(snapshot_dir, region, category):
+    """Last diff applied to a shard's snapshot on disk (0 without a snapshot)"""
+    meta = read_snapshot_meta(shard_path(snapshot_dir, region, category))
+    return meta.get("revision", 0) if meta else 0
+
+
+def persist_shard(snapshot_dir, region, category, pub_df, revision):
+    """
+    Rewrite a shard's snapshot after a diff, keeping its source fingerprint
+
+    Does nothing when the shard has no snapshot yet; it is written the next
+    time the region is built from its dataset.
+    """
+    path = shard_path(snapshot_dir, region, category)
+    meta = read_snapshot_meta(path)
+    if meta is None:
+        return
+    try:
+        write_snapshot(pub_df, path, meta["source_fingerprint"], region.dataset, revision)
+    except OSError as e:
+        print(f"Warning: could not update snapshot {path}: {e}")
+
+
+def write_region_shards(dataset, extract, region, snapshot_dir, fingerprint):
+    """
+    Extract every category of a region in one pass and snapshot each shard
+
+    Args:
+        dataset: The region's dataset split
+        extract (callable): Extraction function returned by open_source
+        region (Region): Region the dataset covers
+        snapshot_dir (str): Root snapshot directory
+        fingerprint (str): Fingerprint of the dataset split
+
+    Returns:
+        dict: category -> DataFrame of that shard
+    """
+    region_df = extract(dataset, categories=tuple(CATEGORIES))
+    shards = {}
+    for category in CATEGORIES:
+        shard_df = region_df[region_df["category"] == category].reset_index(drop=True)
+        try:
+            write_snapshot(shard_df, shard_path(snapshot_dir, region, category), fingerprint, region.dataset)
+        except OSError as e:
+            print(f"Warning: could not write snapshot for {region.name}/{category}: {e}")
+        shards[category] = shard_df
+    return shards
+
+
+def load_shard(region, category="pub", snapshot_dir=None, ingest_mode=DEFAULT_INGEST_MODE,
+               trust_snapshot=DEFAULT_TRUST_SNAPSHOT):
+    """
+    Load one region/category table, going through the on-disk snapshot when configured
+
+    If the shard's snapshot was built from the current version of the region's
+    dataset it is memory-mapped and used directly. Otherwise the dataset is
+    scanned once for every category and all of the region's shard snapshots
+    are (re)written, so the other categories load from disk later.
+
+    Knowing the current version means opening the dataset for its fingerprint,
+    which checks the hub (or at least the local datasets cache) on every cold
+    start even when the snapshot is fresh. With trust_snapshot an existing
+    snapshot is used as is and the dataset is only opened when there is none.
+
+    Args:
+        region (Region): Region to load
+        category (str): Category to load (a key of CATEGORIES)
+        snapshot_dir (str, optional): Root snapshot directory, or None to skip it
+        ingest_mode (str): "full" or "streaming"
+        trust_snapshot (bool): Skip the fingerprint check for an existing snapshot
+
+    Returns:
+        DataFrame: One row per place with parsed tags and its category
+    """
+    if snapshot_dir and trust_snapshot:
+        pub_df = read_shard(snapshot_dir, region, category, None)
+        if pub_df is not None:
+            return pub_df
+
+    dataset, extract = open_source(region.dataset, ingest_mode)
+    if not snapshot_dir:
+        return extract(dataset, categories=(category,))
+
+    fingerprint = dataset_fingerprint(dataset)
+    pub_df = read_shard(snapshot_dir, region, category, fingerprint)
+    if pub_df is None:
+        pub_df = write_region_shards(dataset, extract, region, snapshot_dir, fingerprint)[category]
+    return pub_df
+
+
+def apply_table_changes(pub_df, removed, rows):
+    """
+    Return a copy of a shard table with a diff applied
+
+    Places whose (type, id) is in removed are dropped, then rows are added.
+    Rows without coordinates (ways in a diff) only update places that are
+    already in the table and keep their previous coordinates.
+
+    Args:
+        pub_df (DataFrame): The current shard table
+        removed (set): (type, id) keys of every changed element
+        rows (list): Row dicts to add to this shard
+
+    Returns:
+        DataFrame: The new table, or pub_df itself if the diff does not touch it
+    """
+    keys = list(zip(pub_df["type"], pub_df["id"]))
+    keep = np.array([key not in removed for key in keys], dtype=bool)
+    previous = {key: i for i, key in enumerate(keys) if not keep[i]}
+
+    # A diff can touch the same element twice (create, then modify): last one wins
+    new_rows = {}
+    for row in rows:
+        key = (row["type"], row["id"])
+        if row["lat"] != row["lat"] or row["lon"] != row["lon"]:  # NaN check
+            i = previous.get(key)
+            if i is None:
+                continue
+            row = dict(row, lat=pub_df["lat"].iat[i], lon=pub_df["lon"].iat[i])
+        new_rows[key] = row
+
+    if keep.all() and not new_rows:
+        return pub_df
+
+    table = pub_df[keep]
+    if new_rows:
+        table = pd.concat([table, pd.DataFrame(list(new_rows.values()))], ignore_index=True)
+    table = table.reset_index(drop=True)
+    table.attrs = dict(pub_df.attrs)
+    return table
+
+
+# OSM element types a bare place id may belong to
+OSM_TYPES = ("node", "way", "relation")
+
+
+def pub_key(pub_type, pub_id):
+    """Key of a place in a view: OSM ids are only unique per element type"""
+    return (str(pub_type), str(pub_id))
+
+
+class CatalogueView(namedtuple("CatalogueView",
+                                ["pub_df", "index", "profiles", "markers", "regions", "categories", "hours",
+                                 "names", "positions"],
+                                defaults=((), (), None, None, None))):
+    """
+    A consistent bundle of the pub table and the structures built from it
+
+    Positions returned by the index are iloc positions into pub_df; profiles
+    holds the precomputed vibe vectors, markers the pre-rendered map markers,
+    hours the weekly opening bitmaps and names the fuzzy name index for the
+    same pubs, all by position. positions maps each place's (type, id) key to
+    its position. regions and categories name the shards the table was built
+    from.
+    """
+
+    def position_of(self, pub_type, pub_id):
+        """Position of a place in pub_df, or None if it is not in the view"""
+        return self.positions.get(pub_key(pub_type, pub_id))
+
+    def positions_of(self, pubs):
+        """Positions of pub records in pub_df (None for records not in the view)"""
+        return [self.position_of(pub.osm_type, pub.id) for pub in pubs]
+
+    def positions_of_id(self, pub_id):
+        """Positions of every place with this id, whatever its element type"""
+        found = (self.position_of(pub_type, pub_id) for pub_type in OSM_TYPES)
+        return [position for position in found if position is not None]
+
+
+def build_view(pub_df, regions=(), categories=()):
+    """Build the spatial index, vibe profiles, map markers, opening hours and name index for a pub table"""
+    index = SpatialIndex(
+        pub_df["lat"].to_numpy(dtype=float, na_value=float("nan")),
+        pub_df["lon"].to_numpy(dtype=float, na_value=float("nan")),
+    )
+    profiles = VibeProfiles(pub_df["tags"])
+    markers = build_marker_layer(pub_df)
+    hours = OpeningHours(pub_df["tags"])
+    names = NameIndex([(tags or {}).get("name") for tags in pub_df["tags"]])
+    # The one id lookup for the view: merged views can hold a node and a way with the same id
+    types = pub_df["type"] if "type" in pub_df else ["node"] * len(pub_df)
+    positions = {pub_key(pub_type, pub_id): position
+                 for position, (pub_type, pub_id) in enumerate(zip(types, pub_df["id"]))}
+    return CatalogueView(pub_df, index, profiles, markers, tuple(regions), tuple(categories), hours, names,
+                         positions)
+
+
+def view_rows(view, positions):
+    """
+    The (id, lat, lon, tags, category, type) of the pubs at the given positions
+
+    Args:
+        view (CatalogueView): View the positions refer to
+        positions (array): iloc positions in view.pub_df
+
+    Returns:
+        list: One tuple per position, in the same order
+    """
+    pub_df = view.pub_df
+
+    def take(column):
+        # Index the column's array directly; a DataFrame slice costs far more for a few rows
+        return pub_df[column].array[positions].to_numpy().tolist()
+
+    categories = take("category") if "category" in pub_df else ["pub"] * len(positions)
+    types = take("type") if "type" in pub_df else ["node"] * len(positions)
+    return list(zip(
+        take("id"),
+        view.index.lats[positions].tolist(),
+        view.index.lons[positions].tolist(),
+        take("tags"),
+        categories,
+        types,
+    ))
+
+
+class PubCatalogue:
+    """
+    One region/category shard of the catalogue, built once and shared by every request
+
+    The filtered, tag-parsed table is expensive to build (full dataset scan
+    plus a json.loads per row), so it is built once, together with its
+    spatial index, and then served from memory. A refresh builds a new table
+    and index off to the side and swaps them in as one view, so requests that
+    are already running keep the view they started with.
+    """
+
+    def __init__(self, region=None, category="pub", snapshot_dir=DEFAULT_SNAPSHOT_DIR, loader=load_shard,
+                 changes=None):
+        self.region = region or DEFAULT_REGIONS[0]
+        self.category = category
+        self.dataset_name = self.region.dataset
+        self.snapshot_dir = snapshot_dir
+        self._loader = loader
+        # Callable returning the diffs newer than a revision, replayed on load
+        self._changes = changes
+        self._view = None
+        self._lock = threading.Lock()
+        self.revision = 0
+        self.loaded_at = None
+        self.load_seconds = None
+        self.last_error = None
+
+    @property
+    def key(self):
+        return (self.region.name, self.category)
+
+    def is_ready(self):
+        """Return True once the shard has been built and can serve queries"""
+        return self._view is not None
+
+    def load(self):
+        """Build the shard if it has not been built yet"""
+        if self._view is None:
+            with self._lock:
+                # Another thread may have finished the build while we waited
+                if self._view is None:
+                    self._build()
+        return self._view
+
+    def refresh(self, invalidate=True):
+        """
+        Rebuild the shard from the dataset and swap it in
+
+        Args:
+            invalidate (bool): Mark the shard's snapshot stale first. A
+                snapshot that diffs were written back to still carries the
+                dataset's fingerprint, so without this the diffed table would
+                be loaded again.
+        """
+        with self._lock:
+            if invalidate and self.snapshot_dir:
+                invalidate_snapshot(shard_path(self.snapshot_dir, self.region, self.category))
+            self._build()
+        return self._view
+
+    def reload(self):
+        """Drop the current table; the next query rebuilds it"""
+        with self._lock:
+            self._view = None
+            self.loaded_at = None
+            self.revision = 0
+
+    def apply_changes(self, revision, removed, rows):
+        """
+        Apply a diff to the loaded shard without rebuilding it from the dataset
+
+        The new table and its index are built off to the side and swapped in,
+        so requests that already hold the old view are not affected. A shard
+        that is not loaded yet is skipped; it replays the diff when it loads.
+
+        Args:
+            revision (int): Revision of the diff
+            removed (set): (type, id) keys of every changed element
+            rows (list): Row dicts to add to this shard
+
+        Returns:
+            bool: True if the shard's table changed
+        """
+        with self._lock:
+            view = self._view
+            if view is None or revision <= self.revision:
+                return False
+            pub_df = apply_table_changes(view.pub_df, removed, rows)
+            self.revision = revision
+            if pub_df is view.pub_df:
+                return False
+            pub_df.attrs["revision"] = revision
+            self._view = build_view(pub_df, view.regions, view.categories)
+            self.loaded_at = time.time()
+
+        if self.snapshot_dir:
+            persist_shard(self.snapshot_dir, self.region, self.category, pub_df, revision)
+        return True
+
+    def view(self):
+        """
+        Return the current table and index, building them on first use
+
+        Returns:
+            CatalogueView: The shard's table and its spatial index
+        """
+        view = self._view
+        if view is None:
+            view = self.load()
+        return view
+
+    def get(self):
+        """
+        Return the current table, building it on first use
+
+        Returns:
+            DataFrame: One row per place with parsed tags
+        """
+        return self.view().pub_df
+
+    def status(self):
+        """Summary of the shard state for health checks"""
+        view = self._view
+        return {
+            "ready": view is not None,
+            "region": self.region.name,
+            "category": self.category,
+            "dataset": self.dataset_name,
+            "revision": self.revision,
+            "pubs": 0 if view is None else len(view.pub_df),
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "error": self.last_error,
+            "opening_hours": None if view is None else view.hours.summary(),
+        }
+
+    def _safe_load(self):
+        try:
+            self.load()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Warning: catalogue shard {self.region.name}/{self.category} failed to load: {e}")
+
+    def _build(self):
+        start = time.perf_counter()
+        pub_df = self._loader(self.region, self.category, self.snapshot_dir)
+        # Share one copy of every tag key and value between the places
+        pub_df["tags"] = [intern_tags(tags) for tags in pub_df["tags"]]
+        loaded_revision = revision = pub_df.attrs.get("revision", 0)
+        # Replay the diffs that arrived after this table was built
+        for change_revision, removed, additions in (self._changes(revision) if self._changes else []):
+            pub_df = apply_table_changes(pub_df, removed, additions.get(self.key, []))
+            revision = change_revision
+        if revision != loaded_revision and self.snapshot_dir:
+            pub_df.attrs["revision"] = revision
+            persist_shard(self.snapshot_dir, self.region, self.category, pub_df, revision)
+        self._view = build_view(pub_df, (self.region,), (self.category,))
+        self.revision = revision
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - start
+        self.last_error = None
+        hours = self._view.hours.summary()
+        if hours["unparseable"]:
+            print(f"Opening hours of {self.region.name}/{self.category}: {hours['parsed']} parsed, "
+                  f"{hours['unparseable']} unparseable (e.g. {hours['unparseable_examples'][:3]}), "
+                  f"{hours['missing']} without")
+
+
+class ShardedCatalogue:
+    """
+    Places of several categories across several regions, sharded by region and category
+
+    Every (region, category) shard is a PubCatalogue that is only built the
+    first time a query needs it, so memory follows the regions that are
+    actually being asked about. A query only touches the shards whose region
+    covers its coordinates; when it spans several shards (a border, several
+    categories) their tables are merged into one view, and the last few
+    merged views are kept so repeated queries do not rebuild them.
+    """
+
+    def __init__(self, regions=None, snapshot_dir=DEFAULT_SNAPSHOT_DIR, loader=load_shard,
+                 default_categories=("pub",), max_merged_views=16, max_revision_jump=DEFAULT_MAX_REVISION_JUMP):
+        self.regions = list(regions or load_regions())
+        self.snapshot_dir = snapshot_dir
+        self.default_categories = tuple(default_categories)
+        self._region_by_name = {region.name: region for region in self.regions}
+        self._shards = {
+            (region.name, category): PubCatalogue(region, category, snapshot_dir, loader, self._changes_since)
+            for region in self.regions
+            for category in CATEGORIES
+        }
+        self._merged = OrderedDict()
+        self._merged_lock = threading.Lock()
+        self.max_merged_views = max_merged_views
+        # Diffs applied since the datasets were loaded, replayed by shards that load later.
+        # Snapshots that diffs were written back to start the count where they left off.
+        self.revision = self._stored_revision()
+        self.max_revision_jump = max_revision_jump
+        self._change_log = []
+        self._changes_lock = threading.Lock()
+
+    @property
+    def default_region(self):
+        return self.regions[0]
+
+    def shard(self, region_name, category):
+        """Return the shard of a region and category"""
+        try:
+            return self._shards[(region_name, category)]
+        except KeyError:
+            raise ValueError(f"Unknown shard '{region_name}/{category}'") from None
+
+    def shards_for(self, locations, categories=None):
+        """
+        Shards covering any of the given locations, for the given categories
+
+        Args:
+            locations (list): [latitude, longitude] pairs
+            categories (tuple, optional): Categories; defaults to default_categories
+
+        Returns:
+            list: PubCatalogue shards, without duplicates
+        """
+        categories = categories or self.default_categories
+        keys = []
+        for lat, lon in locations:
+            for region in regions_covering(self.regions, lat, lon):
+                for category in categories:
+                    if (region.name, category) not in keys:
+                        keys.append((region.name, category))
+        return [self.shard(*key) for key in keys]
+
+    def view_for(self, locations, categories=None):
+        """
+        One view over every shard that covers the given locations
+
+        Args:
+            locations (list): [latitude, longitude] pairs
+            categories (tuple, optional): Categories; defaults to default_categories
+
+        Returns:
+            CatalogueView: The combined table and its spatial index
+        """
+        return self._combine(self.shards_for(locations, categories))
+
+    def view_of(self, region_names, categories=None):
+        """View over the named regions' shards (used by the map marker endpoint)"""
+        categories = categories or self.default_categories
+        return self._combine([self.shard(name, category) for name in region_names for category in categories])
+
+    def view(self):
+        """
+        Return the view of the default region and categories, building it on first use
+
+        Returns:
+            CatalogueView: The pub table and its spatial index
+        """
+        return self.view_of([self.default_region.name])
+
+    def get(self):
+        """
+        Return the default region's table, building it on first use
+
+        Returns:
+            DataFrame: One row per place with parsed tags
+        """
+        return self.view().pub_df
+
+    def is_ready(self):
+        """Return True once the default shards have been built"""
+        return all(self.shard(self.default_region.name, c).is_ready() for c in self.default_categories)
+
+    def load(self):
+        """Build the default region's shards if they have not been built yet"""
+        return self.view()
+
+    def apply_changes(self, changes, revision):
+        """
+        Apply an OSM diff to the live catalogue
+
+        Loaded shards get a new table and index swapped in (copy-on-write);
+        shards that are not loaded replay the diff when they first load. A
+        diff at or below the current revision is ignored, so re-sending one
+        is harmless. Once a revision is known, a diff more than
+        max_revision_jump ahead of it is refused: accepting it would make
+        every real diff after it look stale.
+
+        Args:
+            changes (list): Change tuples from osm_changes.parse_osm_change
+            revision (int): Sequence number of the diff
+
+        Returns:
+            dict: "applied", "revision", "changes" and the "updated_shards"
+
+        Raises:
+            ValueError: If the revision jumps implausibly far ahead
+        """
+        with self._changes_lock:
+            self.revision = self._current_revision()
+            if revision <= self.revision:
+                return {"applied": False, "revision": self.revision, "changes": 0, "updated_shards": []}
+            if self.revision and revision - self.revision > self.max_revision_jump:
+                raise ValueError(f"Revision {revision} is more than {self.max_revision_jump} ahead of the "
+                                 f"catalogue's {self.revision}; refresh the catalogue instead")
+            removed, additions = route_changes(changes, self._regions_containing)
+            self._change_log.append((revision, removed, additions))
+            self.revision = revision
+
+            updated = [
+                f"{name}/{category}"
+                for (name, category), shard in self._shards.items()
+                if shard.apply_changes(revision, removed, additions.get((name, category), []))
+            ]
+        return {"applied": True, "revision": revision, "changes": len(changes), "updated_shards": updated}
+
+    def refresh(self):
+        """Rebuild every shard that is loaded (or the default ones) and swap them in"""
+        loaded = [shard for shard in self._shards.values() if shard.is_ready()]
+        # The datasets are the new base: diffs from before do not apply to them.
+        # Snapshots holding diffs are rebuilt too, or they would be loaded as
+        # fresh (same dataset fingerprint) with the diffs still in them.
+        # Invalidate all of them first: rebuilding one shard writes the
+        # snapshots of its whole region.
+        with self._changes_lock:
+            self._change_log = []
+            self.revision = 0
+            if self.snapshot_dir:
+                for shard in self._shards.values():
+                    if shard in loaded or stored_revision(self.snapshot_dir, shard.region, shard.category):
+                        invalidate_snapshot(shard_path(self.snapshot_dir, shard.region, shard.category))
+        if not loaded:
+            return self.load()
+        for shard in loaded:
+            shard.refresh(invalidate=False)
+        with self._merged_lock:
+            self._merged.clear()
+        return self.view()
+
+    def reload(self):
+        """Drop every shard; the next query for an area rebuilds it"""
+        for shard in self._shards.values():
+            shard.reload()
+        with self._merged_lock:
+            self._merged.clear()
+        with self._changes_lock:
+            self._change_log = []
+            self.revision = self._stored_revision()
+
+    def load_in_background(self):
+        """Start building the default shards on a daemon thread so startup is not blocked"""
+        thread = threading.Thread(target=self._safe_load, name="pub-catalogue-load", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        """Summary of the catalogue state for health checks"""
+        shards = [shard.status() for shard in self._shards.values()]
+        default = [self.shard(self.default_region.name, c).status() for c in self.default_categories]
+        return {
+            "ready": all(s["ready"] for s in default),
+            "regions": [region.name for region in self.regions],
+            "snapshot_dir": self.snapshot_dir,
+            "pubs": sum(s["pubs"] for s in shards),
+            "revision": self._current_revision(),
+            "loaded_at": max((s["loaded_at"] for s in default if s["loaded_at"]), default=None),
+            "load_seconds": sum(s["load_seconds"] or 0 for s in default) if any(s["ready"] for s in default) else None,
+            "error": next((s["error"] for s in default if s["error"]), None),
+            "shards": {
+                f"{s['region']}/{s['category']}": {
+                    k: s[k] for k in ("pubs", "revision", "loaded_at", "load_seconds", "error", "opening_hours")
+                }
+                for s in shards if s["ready"] or s["error"]
+            },
+        }
+
+    def _stored_revision(self):
+        # Highest diff revision written back to any shard snapshot on disk
+        if not self.snapshot_dir:
+            return 0
+        return max((stored_revision(self.snapshot_dir, region, category)
+                    for region in self.regions for category in CATEGORIES), default=0)
+
+    def _current_revision(self):
+        # A shard loaded from its snapshot may hold later diffs than this process has seen
+        return max([self.revision] + [shard.revision for shard in self._shards.values()])
+
+    def _changes_since(self, revision):
+        # Copy so a diff arriving meanwhile does not change the list under the caller
+        return [entry for entry in list(self._change_log) if entry[0] > revision]
+
+    def _regions_containing(self, lat, lon):
+        # Elements without coordinates can only update places that already exist
+        if lat is None or lon is None:
+            return self.regions
+        return [region for region in self.regions if region.contains(lat, lon)]
+
+    def _safe_load(self):
+        for category in self.default_categories:
+            self.shard(self.default_region.name, category)._safe_load()
+
+    def _combine(self, shards):
+        views = tuple(shard.view() for shard in shards)
+        if len(views) == 1:
+            return views[0]
+
+        key = tuple((shard.region.name, shard.category) for shard in shards)
+        with self._merged_lock:
+            cached = self._merged.get(key)
+            # Reuse the merged view only while it was built from the current shard views
+            if cached is not None and all(a is b for a, b in zip(cached[0], views)):
+                self._merged.move_to_end(key)
+                return cached[1]
+
+        merged_df = pd.concat([view.pub_df for view in views], ignore_index=True)
+        # Overlapping regions can both contain the same OSM element
+        merged_df = merged_df.drop_duplicates(subset=["type", "id"]).reset_index(drop=True)
+        regions = tuple(dict.fromkeys(region for view in views for region in view.regions))
+        categories = tuple(dict.fromkeys(category for view in views for category in view.categories))
+        merged = build_view(merged_df, regions, categories)
+
+        with self._merged_lock:
+            self._merged[key] = (views, merged)
+            self._merged.move_to_end(key)
+            while len(self._merged) > self.max_merged_views:
+                self._merged.popitem(last=False)
+        return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the on-disk snapshots of every region/category shard")
+    parser.add_argument("--region", action="append", help="Region to build (repeatable); default: all")
+    parser.add_argument("--regions-file", help="JSON file with the regions (default: PUB_REGIONS_FILE)")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the snapshots are fresh")
+    parser.add_argument("--ingest-mode", choices=["full", "streaming"], default=DEFAULT_INGEST_MODE)
+    parser.add_argument("--num-proc", type=int, default=DEFAULT_INGEST_NUM_PROC,
+                        help="Worker processes for streaming ingest")
+    args = parser.parse_args()
+
+    for region in load_regions(args.regions_file):
+        if args.region and region.name not in args.region:
+            continue
+        dataset, extract = open_source(region.dataset, args.ingest_mode, args.num_proc)
+        fingerprint = dataset_fingerprint(dataset)
+        if not args.force and all(
+                is_snapshot_fresh(shard_path(args.snapshot_dir, region, c), fingerprint) for c in CATEGORIES):
+            print(f"Snapshots of {region.name} are up to date")
+            continue
+        shards = write_region_shards(dataset, extract, region, args.snapshot_dir, fingerprint)
+        counts = ", ".join(f"{len(df)} {category}" for category, df in shards.items())
+        print(f"Wrote {region.name} to {args.snapshot_dir}: {counts}")
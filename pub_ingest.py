@@ -0,0 +1,149 @@
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+from datasets import load_dataset
+
+DEFAULT_BATCH_SIZE = 10000
+COLUMNS = ["id", "type", "lat", "lon", "tags", "category"]
+
+# Place categories the catalogue can serve, as the OSM tags that identify them.
+# A place belongs to the first category (in this order) whose tags it has.
+CATEGORIES = {
+    "pub": (("amenity", "pub"),),
+    "bar": (("amenity", "bar"),),
+    "cafe": (("amenity", "cafe"),),
+    "biergarten": (("amenity", "biergarten"),),
+    "brewery": (("craft", "brewery"),),
+}
+
+# Plural nouns for prompts and messages
+CATEGORY_NOUNS = {
+    "pub": "pubs",
+    "bar": "bars",
+    "cafe": "cafés",
+    "biergarten": "beer gardens",
+    "brewery": "breweries",
+}
+
+
+def parse_categories(value, default=("pub",)):
+    """
+    Turn a request value (list or comma-separated string) into known categories
+
+    Raises:
+        ValueError: If a category is not in CATEGORIES
+    """
+    if not value:
+        return tuple(default)
+    if isinstance(value, str):
+        value = value.split(",")
+    categories = []
+    for category in value:
+        category = str(category).strip().lower()
+        if category not in CATEGORIES:
+            raise ValueError(f"Unknown category '{category}', expected one of {', '.join(CATEGORIES)}")
+        if category not in categories:
+            categories.append(category)
+    return tuple(categories) or tuple(default)
+
+
+def categorise(tags, categories=("pub",)):
+    """Return the first of the given categories the tags belong to, or None"""
+    for category in categories:
+        for key, value in CATEGORIES[category]:
+            if tags.get(key) == value:
+                return category
+    return None
+
+
+def _might_match(raw_tags, needles):
+    # Cheap substring test before paying for json.loads: the tag string must
+    # contain both the key and the value of at least one wanted tag
+    return any(key in raw_tags and value in raw_tags for key, value in needles)
+
+
+def filter_batch(batch, categories=("pub",)):
+    """
+    Keep the rows of one column-oriented batch that belong to a wanted category
+
+    Args:
+        batch (dict): Column name -> list, as yielded by Dataset.iter
+        categories (tuple): Categories to keep (keys of CATEGORIES)
+
+    Returns:
+        list: (id, type, lat, lon, tags dict, category) tuples for the matching rows
+    """
+    needles = [(f'"{key}"', f'"{value}"') for category in categories for key, value in CATEGORIES[category]]
+    rows = []
+    for i, raw_tags in enumerate(batch["tags"]):
+        if not raw_tags or not _might_match(raw_tags, needles):
+            continue
+        try:
+            tags = json.loads(raw_tags)
+        except ValueError:
+            continue
+        category = categorise(tags, categories)
+        if category is not None:
+            rows.append((batch["id"][i], batch["type"][i], batch["lat"][i], batch["lon"][i], tags, category))
+    return rows
+
+
+def iter_category_rows(batches, categories=("pub",), num_proc=None):
+    """
+    Filter an iterable of batches, optionally on several processes
+
+    At most 2 * num_proc batches are in flight at any time, so peak memory
+    stays bounded no matter how long the input is.
+
+    Args:
+        batches (iterable): Column-oriented batches (dicts of lists)
+        categories (tuple): Categories to keep (keys of CATEGORIES)
+        num_proc (int, optional): Worker processes; None or 1 filters inline
+
+    Yields:
+        tuple: (id, type, lat, lon, tags dict, category) for every matching row
+    """
+    work = partial(filter_batch, categories=tuple(categories))
+    if not num_proc or num_proc <= 1:
+        for batch in batches:
+            yield from work(batch)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_proc) as pool:
+        window = deque()
+        for batch in batches:
+            window.append(pool.submit(work, batch))
+            if len(window) >= 2 * num_proc:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+
+def load_streaming_source(dataset_name):
+    """Open the train split of the OSM dataset as a stream (nothing is materialised)"""
+    return load_dataset(dataset_name, split="train", streaming=True)
+
+
+def stream_pubs(dataset, categories=("pub",), batch_size=DEFAULT_BATCH_SIZE, num_proc=None):
+    """
+    Extract places by iterating the dataset in batches instead of materialising it
+
+    Only the matching rows are kept, so memory is proportional to the number
+    of places rather than to the size of the region.
+
+    Args:
+        dataset: Streaming (IterableDataset) or regular Dataset split
+        categories (tuple): Categories to keep (keys of CATEGORIES)
+        batch_size (int): Rows per batch
+        num_proc (int, optional): Worker processes used for filtering
+
+    Returns:
+        DataFrame: Same shape as find_pubs (id, type, lat, lon, parsed tags, category)
+    """
+    batches = dataset.iter(batch_size=batch_size)
+    rows = list(iter_category_rows(batches, categories, num_proc))
+    print(f"Found {len(rows)} places ({', '.join(categories)})")
+    return pd.DataFrame(rows, columns=COLUMNS)
@@ -0,0 +1,238 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+# Trigram candidates re-scored with edit distance per search
+RESCORE_CANDIDATES = 40
+# An LLM answer must score at least this well to count as naming a candidate
+MATCH_THRESHOLD = 0.6
+
+# How a pub without a name is listed, e.g. in the LLM prompt
+UNNAMED_FORMAT = "Unnamed Pub (ID: {})"
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_UNNAMED = re.compile(r"unnamed pub\s*\(\s*id\s*:?\s*(\d+)\s*\)", re.IGNORECASE)
+
+
+def fold_name(text):
+    """
+    Normalise a name for matching: no accents, case folded, punctuation as spaces
+
+    "Café 't Kulminator!" -> "cafe t kulminator"
+    """
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def unnamed_pub_id(text):
+    """The id in an "Unnamed Pub (ID: 123)" name, as a string, or None"""
+    match = _UNNAMED.search(str(text or ""))
+    return match.group(1) if match else None
+
+
+def trigrams(folded, prefix=False):
+    """
+    Character trigrams of a folded name, padded with spaces at word starts
+
+    With prefix, the end of the text is not padded, so a partly typed word
+    shares all its trigrams with the full word.
+    """
+    padded = "  " + folded + ("" if prefix else " ")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit=None):
+    """
+    Levenshtein distance between two strings
+
+    Args:
+        a, b (str): Strings to compare
+        limit (int, optional): Stop early and return limit + 1 once the
+            distance is known to exceed it
+
+    Returns:
+        int: Number of single-character insertions, deletions and substitutions
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _word_starts(folded):
+    return [0] + [m.end() for m in re.finditer(" ", folded)]
+
+
+def name_similarity(query, folded, floor=0.0):
+    """
+    How well a folded query names a folded pub name, from 0 to 1
+
+    1 for the same name, 0.9 when one contains the other as whole words
+    ("kulminator" in "cafe kulminator"), otherwise one minus the edit
+    distance relative to the longer name. Scores that cannot beat floor are
+    returned as 0 without finishing the edit distance.
+    """
+    if not query or not folded:
+        return 0.0
+    if query == folded:
+        return 1.0
+    if f" {query} " in f" {folded} " or f" {folded} " in f" {query} ":
+        return 0.9
+    longest = max(len(query), len(folded))
+    limit = int((1.0 - floor) * longest)
+    distance = edit_distance(query, folded, limit=limit)
+    if distance > limit:
+        return 0.0
+    return max(0.0, 1.0 - distance / longest)
+
+
+def prefix_similarity(query, folded):
+    """
+    How well a partly typed query matches the start of any word of a name
+
+    The query is compared with the same number of characters at each word
+    start, so "kulmi" matches "cafe kulminator" fully and "kulmu" nearly.
+    """
+    if not query or not folded:
+        return 0.0
+    best = 0.0
+    for start in _word_starts(folded):
+        window = folded[start:start + len(query)]
+        if window == query:
+            return 1.0
+        distance = edit_distance(query, window, limit=len(query) // 2)
+        best = max(best, 1.0 - distance / len(query))
+    return best
+
+
+class NameIndex:
+    """
+    Folded pub names with a trigram index and a sorted word list
+
+    Built once with the catalogue view. A search looks up the query's
+    trigrams (one NumPy bincount over their posting lists gives the shared
+    trigram count of every pub), adds the pubs that have a word starting
+    with the query (binary search in the sorted words), and re-scores only
+    those few candidates with edit distance, so typos, missing accents and
+    partly typed words all find the pub without scanning every name.
+
+    Row i is the pub at position i of the table. Pubs without a name have an
+    empty folded name and are never returned by a search.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.folded = [fold_name(name) for name in self.names]
+
+        postings = {}
+        counts = np.zeros(len(self.folded), dtype=np.int32)
+        words = []
+        for row, folded in enumerate(self.folded):
+            if not folded:
+                continue
+            grams = trigrams(folded)
+            counts[row] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+            words.extend((word, row) for word in set(folded.split()))
+        self.gram_counts = counts
+        self.postings = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+        words.sort()
+        self.words = words
+        self._word_keys = [word for word, _ in words]
+
+    def __len__(self):
+        return len(self.names)
+
+    def _word_prefix_rows(self, word, limit):
+        rows = []
+        i = bisect_left(self._word_keys, word)
+        while i < len(self.words) and self._word_keys[i].startswith(word) and len(rows) < limit:
+            rows.append(self.words[i][1])
+            i += 1
+        return rows
+
+    def search(self, query, limit=10):
+        """
+        Pubs whose name best matches a (possibly partial or misspelled) query
+
+        Args:
+            query (str): Text typed so far
+            limit (int): Number of results
+
+        Returns:
+            list: (row, score) pairs, best first; the row is the pub's table
+                position
+        """
+        folded = fold_name(query)
+        if not folded or not len(self):
+            return []
+
+        grams = trigrams(folded, prefix=True)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        candidates = set()
+        if lists:
+            shared = np.bincount(np.concatenate(lists), minlength=len(self))
+            dice = 2 * shared / (len(grams) + self.gram_counts)
+            top = min(RESCORE_CANDIDATES, int((shared > 0).sum()))
+            if top:
+                candidates.update(np.argpartition(-dice, top - 1)[:top].tolist())
+        last_word = folded.split()[-1]
+        candidates.update(self._word_prefix_rows(last_word, RESCORE_CANDIDATES))
+
+        scored = []
+        for row in candidates:
+            name = self.folded[row]
+            # A partly typed word ranks just below a name typed in full
+            prefix = 0.95 * prefix_similarity(folded, name)
+            score = max(name_similarity(folded, name, floor=prefix), prefix)
+            if score > 0:
+                scored.append((-score, len(name), row))
+        scored.sort()
+        return [(row, -score) for score, _, row in scored[:limit]]
+
+    def best_match(self, text, rows, ids=None, threshold=MATCH_THRESHOLD):
+        """
+        Which of the given pubs a free-text name (e.g. an LLM answer) refers to
+
+        Args:
+            text (str): The name as written
+            rows (list): Table positions of the pubs it may refer to (None
+                for a pub that is not in the table)
+            ids (list, optional): Ids of the same pubs. Pubs without a name
+                are listed as "Unnamed Pub (ID: ...)"; such an answer is
+                resolved by its id
+            threshold (float): Lowest similarity that counts as a match
+
+        Returns:
+            tuple: (index into rows, score), or (None, best score) when no
+                pub is similar enough
+        """
+        unnamed = unnamed_pub_id(text) if ids is not None else None
+        if unnamed is not None:
+            for i, pub_id in enumerate(ids):
+                if str(pub_id) == unnamed:
+                    return i, 1.0
+        folded = fold_name(text)
+        best, best_score = None, 0.0
+        for i, row in enumerate(rows):
+            if row is None:
+                continue
+            score = name_similarity(folded, self.folded[row])
+            if score > best_score:
+                best, best_score = i, score
+        if best_score < threshold:
+            return None, best_score
+        return best, best_score
@@ -0,0 +1,239 @@
+import sys
+
+# Keys of a pub record that are not OSM tags, in the order they are listed
+HOT_FIELDS = ("name", "distance", "distance_value", "coordinates", "id", "category")
+EXTRA_FIELDS = ("explanation", "note", "vibe_confidence")
+
+# Response formats of pubs_payload
+RESPONSE_FORMATS = ("objects", "compact")
+DEFAULT_COMPACT_FIELDS = ("id", "name", "coordinates", "distance_value", "category")
+
+_MISSING = object()
+
+
+def intern_tags(tags):
+    """
+    Return the tag dictionary with its keys and values interned
+
+    OSM tags repeat the same few strings ("amenity", "pub", "yes", ...) on
+    every place, so interning makes all places share one copy of each.
+    """
+    if not tags:
+        return {}
+    return {sys.intern(str(k)): sys.intern(str(v)) for k, v in tags.items()}
+
+
+class PubRecord:
+    """
+    One pub in a result list: typed hot fields plus a reference to its tags
+
+    Replaces the per-request dict that copied every OSM tag to a top-level
+    key. The tag dictionary is shared with the catalogue and never copied;
+    tags are only looked at when a caller asks for them. Records still behave
+    like the old dictionaries (pub["name"], pub.get(...), pub.items(),
+    pub["explanation"] = ...), and to_dict() gives the JSON shape the API
+    has always returned.
+    """
+
+    __slots__ = ("id", "name", "lat", "lon", "distance_value", "category", "tags", "osm_type",
+                 "explanation", "note", "vibe_confidence", "_extra")
+
+    def __init__(self, pub_id, name, lat, lon, distance, category, tags, osm_type="node"):
+        self.id = pub_id
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.distance_value = distance
+        self.category = category
+        self.tags = tags
+        # OSM element type: ids are only unique per type. Not part of the JSON shape
+        self.osm_type = osm_type
+        self.explanation = None
+        self.note = None
+        self.vibe_confidence = None
+        self._extra = None
+
+    @property
+    def distance(self):
+        return f"{self.distance_value:.2f} km"
+
+    @property
+    def coordinates(self):
+        return [self.lat, self.lon]
+
+    def __getitem__(self, key):
+        if key in HOT_FIELDS:
+            return getattr(self, key)
+        if key in EXTRA_FIELDS:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        if key in self.tags:
+            return self.tags[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in EXTRA_FIELDS:
+            setattr(self, key, value)
+        elif key in HOT_FIELDS:
+            raise KeyError(f"'{key}' is read-only on a pub record")
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def items(self):
+        """(key, value) pairs in the order of the old pub dictionaries"""
+        yield "name", self.name
+        yield "distance", self.distance
+        yield "distance_value", self.distance_value
+        yield "coordinates", self.coordinates
+        yield "id", self.id
+        yield "category", self.category
+        for key, value in self.tags.items():
+            if key != "name":
+                yield key, value
+        for key in EXTRA_FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                yield key, value
+        if self._extra:
+            yield from self._extra.items()
+
+    def to_dict(self):
+        """The record as a plain dictionary, for JSON responses"""
+        data = {
+            "name": self.name,
+            "distance": self.distance,
+            "distance_value": self.distance_value,
+            "coordinates": [self.lat, self.lon],
+            "id": self.id,
+            "category": self.category,
+        }
+        tags = self.tags
+        if tags:
+            data.update(tags)
+            # The record's name wins over the tag (they only differ for unnamed pubs)
+            data["name"] = self.name
+        if self.explanation is not None:
+            data["explanation"] = self.explanation
+        if self.note is not None:
+            data["note"] = self.note
+        if self.vibe_confidence is not None:
+            data["vibe_confidence"] = self.vibe_confidence
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def select(self, fields):
+        """Dictionary with only the given keys (keys the pub does not have are left out)"""
+        data = {}
+        for key in fields:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                data[key] = value
+        return data
+
+    def row(self, fields):
+        """Values of the given keys as a list, None where the pub has no such key"""
+        return [self.get(key) for key in fields]
+
+    def __repr__(self):
+        return f"PubRecord(id={self.id!r}, name={self.name!r}, distance={self.distance!r})"
+
+
+def parse_fields(value):
+    """Turn a fields parameter (list or comma-separated string) into a tuple, or None for all fields"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    fields = tuple(dict.fromkeys(str(field).strip() for field in value if str(field).strip()))
+    return fields or None
+
+
+def pubs_payload(pub_list, vibe_match=None, fields=None, response_format="objects", dedupe=False):
+    """
+    Shape a pub list and its vibe match for a JSON response
+
+    "objects" (the default) gives one dictionary per pub; with fields only
+    those keys are included. "compact" gives a "fields" header and one array
+    of values per pub, which is much smaller for long lists. With dedupe (and
+    always in the compact format) the vibe match is not repeated: it refers
+    to its pub by id and position and only carries the match explanation.
+
+    Args:
+        pub_list (list): PubRecord list
+        vibe_match (PubRecord, optional): The selected pub, one of pub_list
+        fields (tuple, optional): Keys to include; None for everything
+            (compact defaults to DEFAULT_COMPACT_FIELDS)
+        response_format (str): "objects" or "compact"
+        dedupe (bool): Refer to the vibe match instead of repeating it
+
+    Returns:
+        dict: JSON-serialisable payload with "pubs" and, if given, "vibe_match"
+
+    Raises:
+        ValueError: On an unknown response format
+    """
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown format '{response_format}', expected one of {', '.join(RESPONSE_FORMATS)}")
+    dedupe = dedupe or response_format == "compact"
+
+    if response_format == "compact":
+        fields = tuple(f for f in (fields or DEFAULT_COMPACT_FIELDS) if not (dedupe and f in EXTRA_FIELDS))
+        payload = {"fields": list(fields), "pubs": [pub.row(fields) for pub in pub_list]}
+    elif fields:
+        fields = tuple(f for f in fields if not (dedupe and f in EXTRA_FIELDS))
+        payload = {"pubs": [pub.select(fields) for pub in pub_list]}
+    elif dedupe:
+        payload = {"pubs": [_without_match_fields(pub.to_dict()) for pub in pub_list]}
+    else:
+        payload = {"pubs": pub_list}
+
+    if vibe_match is not None:
+        if dedupe:
+            payload["vibe_match"] = _match_reference(pub_list, vibe_match)
+        elif fields:
+            payload["vibe_match"] = vibe_match.select(fields + tuple(f for f in EXTRA_FIELDS if f not in fields))
+        else:
+            payload["vibe_match"] = vibe_match
+    return payload
+
+
+def _without_match_fields(data):
+    for key in EXTRA_FIELDS:
+        data.pop(key, None)
+    return data
+
+
+def _match_reference(pub_list, vibe_match):
+    # Same object when possible; a cached answer may be a different record for the same pub
+    index = next((i for i, pub in enumerate(pub_list) if pub is vibe_match), None)
+    if index is None:
+        index = next((i for i, pub in enumerate(pub_list) if str(pub["id"]) == str(vibe_match["id"])), None)
+    reference = {"id": vibe_match["id"], "index": index}
+    for key in EXTRA_FIELDS:
+        value = vibe_match.get(key)
+        if value is not None:
+            reference[key] = value
+    return reference
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Bump whenever the on-disk layout changes so old snapshots get rebuilt
+SNAPSHOT_FORMAT_VERSION = 2
+
+META_FILE = "meta.json"
+STRINGS_FILE = "strings.json"
+ARRAY_FILES = ["id", "lat", "lon", "type", "tag_offsets", "tag_keys", "tag_values"]
+
+
+def dataset_fingerprint(dataset):
+    """
+    Return a stable fingerprint for a Hugging Face dataset split
+
+    The datasets library already tracks a fingerprint per split that changes
+    whenever the underlying data does; fall back to hashing the dataset info
+    for objects that do not expose one (e.g. streaming datasets).
+    """
+    fingerprint = getattr(dataset, "_fingerprint", None)
+    if fingerprint:
+        return str(fingerprint)
+
+    info = getattr(dataset, "info", None)
+    parts = [
+        str(getattr(info, "dataset_name", "")),
+        str(getattr(info, "config_name", "")),
+        str(getattr(info, "version", "")),
+        json.dumps(getattr(info, "download_checksums", None), sort_keys=True, default=str),
+        str(getattr(info, "splits", "")),
+        str(getattr(info, "dataset_size", "")),
+        # Streaming datasets have no length
+        str(getattr(dataset, "num_rows", "")),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class PubSnapshot:
+    """
+    Read-only columnar view of the pub table backed by memory-mapped .npy files
+
+    Numeric columns are memory-mapped, so every worker that opens the same
+    snapshot shares the same physical pages. Strings (tag keys, tag values,
+    types) are stored once in an interned string table and referenced by
+    index; names are read from the name tag like every other tag.
+
+    Only the id and coordinate arrays stay shared: to_dataframe() decodes
+    every pub's tags into dictionaries (whose strings are interned per
+    process) in each worker, because the catalogue view reads all tags anyway
+    to build its vibe profiles, opening hours, names and markers.
+    """
+
+    def __init__(self, path, meta, arrays, strings):
+        self.path = path
+        self.meta = meta
+        self.strings = strings
+        self.id = arrays["id"]
+        self.lat = arrays["lat"]
+        self.lon = arrays["lon"]
+        self.type = arrays["type"]
+        self.tag_offsets = arrays["tag_offsets"]
+        self.tag_keys = arrays["tag_keys"]
+        self.tag_values = arrays["tag_values"]
+
+    def __len__(self):
+        return len(self.id)
+
+    def tags(self, i):
+        """Decode the tag dictionary of the i-th pub"""
+        start, end = self.tag_offsets[i], self.tag_offsets[i + 1]
+        strings = self.strings
+        return {
+            strings[k]: strings[v]
+            for k, v in zip(self.tag_keys[start:end], self.tag_values[start:end])
+        }
+
+    def to_dataframe(self):
+        """
+        Rebuild the pub DataFrame in the same shape find_pubs returns
+
+        The id, lat and lon columns are read-only views of the mapped arrays
+        rather than copies, so they keep sharing pages across workers.
+
+        Returns:
+            DataFrame: Columns id, type, lat, lon and tags (parsed dicts)
+        """
+        strings = self.strings
+        return pd.DataFrame({
+            "id": np.asarray(self.id),
+            "type": [strings[t] for t in self.type],
+            "lat": np.asarray(self.lat),
+            "lon": np.asarray(self.lon),
+            "tags": [self.tags(i) for i in range(len(self))],
+        }, copy=False)
+
+
+def write_snapshot(pub_df, path, source_fingerprint, dataset_name=None, revision=0):
+    """
+    Write a pub DataFrame to a columnar snapshot directory
+
+    The snapshot is written to a temporary directory first and then moved into
+    place, so readers never see a half-written snapshot.
+
+    Args:
+        pub_df (DataFrame): Pub table as returned by find_pubs
+        path (str): Snapshot directory
+        source_fingerprint (str): Fingerprint of the source dataset split
+        dataset_name (str, optional): Name of the source dataset, for reference
+        revision (int): Last OSM diff applied on top of the source dataset
+
+    Returns:
+        str: The snapshot directory
+    """
+    strings = []
+    string_ids = {}
+
+    def intern(value):
+        value = str(value)
+        idx = string_ids.get(value)
+        if idx is None:
+            idx = len(strings)
+            string_ids[value] = idx
+            strings.append(value)
+        return idx
+
+    n = len(pub_df)
+    types = np.empty(n, dtype=np.int32)
+    tag_offsets = np.zeros(n + 1, dtype=np.int64)
+    tag_keys = []
+    tag_values = []
+
+    for i, (pub_type, tags) in enumerate(zip(pub_df["type"], pub_df["tags"])):
+        types[i] = intern(pub_type)
+        for k, v in (tags or {}).items():
+            tag_keys.append(intern(k))
+            tag_values.append(intern(v))
+        tag_offsets[i + 1] = len(tag_keys)
+
+    arrays = {
+        "id": pub_df["id"].to_numpy(dtype=np.int64),
+        "lat": pub_df["lat"].to_numpy(dtype=np.float64, na_value=np.nan),
+        "lon": pub_df["lon"].to_numpy(dtype=np.float64, na_value=np.nan),
+        "type": types,
+        "tag_offsets": tag_offsets,
+        "tag_keys": np.asarray(tag_keys, dtype=np.int32),
+        "tag_values": np.asarray(tag_values, dtype=np.int32),
+    }
+    meta = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "source_fingerprint": source_fingerprint,
+        "dataset": dataset_name,
+        "count": n,
+        "revision": revision,
+        "created_at": time.time(),
+    }
+
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    with open(os.path.join(tmp_path, STRINGS_FILE), "w", encoding="utf-8") as f:
+        json.dump(strings, f, ensure_ascii=False)
+    # meta.json goes last: a snapshot without it is treated as missing
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    # Swap the new snapshot in. Workers that already mapped the old files keep
+    # their open file handles, so removing the old directory is safe.
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    return path
+
+
+def read_snapshot_meta(path):
+    """Return the snapshot metadata, or None if there is no complete snapshot"""
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_snapshot_fresh(path, source_fingerprint):
+    """
+    Check whether the snapshot at path was built from the given source
+
+    A source_fingerprint of None accepts a complete snapshot of the current
+    format from any source, without knowing the dataset's fingerprint.
+    """
+    meta = read_snapshot_meta(path)
+    return (
+        meta is not None
+        and meta.get("format_version") == SNAPSHOT_FORMAT_VERSION
+        and (source_fingerprint is None or meta.get("source_fingerprint") == source_fingerprint)
+    )
+
+
+def invalidate_snapshot(path):
+    """
+    Mark a snapshot as stale so the next load rebuilds it from its dataset
+
+    Removes meta.json only; a snapshot without it is treated as missing, and
+    workers that already mapped the files keep using them.
+    """
+    try:
+        os.remove(os.path.join(path, META_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def open_snapshot(path):
+    """
+    Memory-map a snapshot directory read-only
+
+    Args:
+        path (str): Snapshot directory written by write_snapshot
+
+    Returns:
+        PubSnapshot: Columnar view over the snapshot files
+    """
+    meta = read_snapshot_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"No pub snapshot at {path}")
+
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in ARRAY_FILES
+    }
+    with open(os.path.join(path, STRINGS_FILE), encoding="utf-8") as f:
+        strings = [sys.intern(s) for s in json.load(f)]
+
+    return PubSnapshot(path, meta, arrays, strings)
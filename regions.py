@@ -0,0 +1,76 @@
+import json
+import os
+from collections import namedtuple
+
+from geo import haversine
+
+
+class Region(namedtuple("Region", ["name", "label", "dataset", "bbox"])):
+    """
+    A city or area served from its own OSM dataset
+
+    bbox is (min_lat, min_lon, max_lat, max_lon); a request is routed to the
+    regions whose box contains its coordinates.
+    """
+
+    def contains(self, lat, lon):
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+
+    def distance_km(self, lat, lon):
+        """Distance from a point to the nearest edge of the box (0 inside it)"""
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        nearest_lat = min(max(lat, min_lat), max_lat)
+        nearest_lon = min(max(lon, min_lon), max_lon)
+        return haversine(lon, lat, nearest_lon, nearest_lat)
+
+
+DEFAULT_REGIONS = [
+    Region("antwerp", "Antwerp", "ns2agi/antwerp-osm-navigator", (51.10, 4.20, 51.40, 4.60)),
+]
+
+
+def load_regions(path=None):
+    """
+    Load the served regions from a JSON file, or the built-in list
+
+    The file holds a list of objects with name, label, dataset and bbox
+    ([min_lat, min_lon, max_lat, max_lon]).
+
+    Args:
+        path (str, optional): JSON file; defaults to PUB_REGIONS_FILE
+
+    Returns:
+        list: Region tuples, the first one being the default region
+    """
+    path = path or os.environ.get("PUB_REGIONS_FILE")
+    if not path:
+        return list(DEFAULT_REGIONS)
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    regions = [
+        Region(e["name"], e.get("label", e["name"].title()), e["dataset"], tuple(float(v) for v in e["bbox"]))
+        for e in entries
+    ]
+    if not regions:
+        raise ValueError(f"No regions defined in {path}")
+    return regions
+
+
+def regions_covering(regions, lat, lon):
+    """
+    Regions whose box contains the point, or the nearest region if none does
+
+    Args:
+        regions (list): Region tuples
+        lat (float): Latitude
+        lon (float): Longitude
+
+    Returns:
+        list: At least one Region
+    """
+    covering = [region for region in regions if region.contains(lat, lon)]
+    if covering:
+        return covering
+    # Outside every region: serve the closest one rather than nothing
+    return [min(regions, key=lambda region: region.distance_km(lat, lon))]
@@ -0,0 +1,183 @@
+import heapq
+from math import sin
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM, haversine_np
+
+
+def to_unit_xyz(lats, lons):
+    """Convert decimal degree coordinates to points on the 3D unit sphere"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def km_to_chord(km):
+    """Straight-line distance through the unit sphere for a great-circle distance"""
+    angle = min(km / EARTH_RADIUS_KM, np.pi)
+    return 2 * sin(angle / 2)
+
+
+class SpatialIndex:
+    """
+    KD-tree over pub coordinates mapped onto the 3D unit sphere
+
+    On the unit sphere the straight-line (chord) distance grows monotonically
+    with the great-circle distance, so nearest neighbours by chord are nearest
+    neighbours by haversine, without the distortions of splitting on raw
+    latitude/longitude. Leaves hold a small bucket of points that are scanned
+    with NumPy, so a query visits O(log N) nodes instead of every pub.
+
+    Positions returned by the queries are row positions in the arrays the
+    index was built from (i.e. iloc positions in the catalogue table).
+    Points with missing coordinates are not indexed; their positions are kept
+    in `missing` so callers can treat them as infinitely far away.
+    """
+
+    def __init__(self, lats, lons, leaf_size=32):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.leaf_size = leaf_size
+
+        valid = ~(np.isnan(self.lats) | np.isnan(self.lons))
+        self.missing = np.flatnonzero(~valid)
+        positions = np.flatnonzero(valid)
+        xyz = to_unit_xyz(self.lats[positions], self.lons[positions])
+
+        # Node arrays: bounding box plus either children or a leaf slice
+        self._lo = []
+        self._hi = []
+        self._children = []
+        self._slices = []
+
+        order = np.arange(len(positions))
+        if len(order):
+            self._build(xyz, order, 0, len(order))
+        # Points are stored in tree order so every leaf is a contiguous slice
+        self.xyz = xyz[order]
+        self.positions = positions[order]
+        self._lo = np.asarray(self._lo)
+        self._hi = np.asarray(self._hi)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _build(self, xyz, order, start, end):
+        node = len(self._lo)
+        points = xyz[order[start:end]]
+        self._lo.append(points.min(axis=0))
+        self._hi.append(points.max(axis=0))
+        self._children.append(None)
+        self._slices.append((start, end))
+
+        if end - start > self.leaf_size:
+            # Split on the widest axis at the median
+            dim = int(np.argmax(self._hi[node] - self._lo[node]))
+            mid = (end - start) // 2
+            part = np.argpartition(points[:, dim], mid)
+            order[start:end] = order[start:end][part]
+            left = self._build(xyz, order, start, start + mid)
+            right = self._build(xyz, order, start + mid, end)
+            self._children[node] = (left, right)
+        return node
+
+    def _min_dist2(self, node, point):
+        # Squared distance from the query point to the node's bounding box
+        gap = np.maximum(self._lo[node] - point, 0.0) + np.maximum(point - self._hi[node], 0.0)
+        return float(gap @ gap)
+
+    def k_nearest(self, lat, lon, k):
+        """
+        Find the k pubs closest to a point
+
+        Args:
+            lat, lon (float): Query point in decimal degrees
+            k (int): Number of neighbours
+
+        Returns:
+            tuple: (positions, distances_km) as arrays sorted by distance
+        """
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+        point = to_unit_xyz([lat], [lon])[0]
+        best_d2 = np.empty(0)
+        best_idx = np.empty(0, dtype=np.intp)
+        worst = np.inf
+
+        heap = [(self._min_dist2(0, point), 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if bound > worst:
+                break
+            children = self._children[node]
+            if children is not None:
+                for child in children:
+                    d2 = self._min_dist2(child, point)
+                    if d2 <= worst:
+                        heapq.heappush(heap, (d2, child))
+                continue
+
+            start, end = self._slices[node]
+            diff = self.xyz[start:end] - point
+            d2 = np.einsum("ij,ij->i", diff, diff)
+            best_d2 = np.concatenate((best_d2, d2))
+            best_idx = np.concatenate((best_idx, np.arange(start, end)))
+            if len(best_d2) > k:
+                keep = np.argpartition(best_d2, k - 1)[:k]
+                best_d2, best_idx = best_d2[keep], best_idx[keep]
+            if len(best_d2) == k:
+                worst = best_d2.max()
+
+        return self._finish(lat, lon, best_idx)
+
+    def within_radius(self, lat, lon, km):
+        """
+        Find every pub within a great-circle radius of a point
+
+        Args:
+            lat, lon (float): Query point in decimal degrees
+            km (float): Search radius in kilometers
+
+        Returns:
+            tuple: (positions, distances_km) as arrays sorted by distance
+        """
+        if len(self) == 0 or km < 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+        point = to_unit_xyz([lat], [lon])[0]
+        # Slightly widened so rounding never drops a point on the boundary;
+        # the exact cut is made on the haversine distance below
+        radius2 = km_to_chord(km) ** 2 * (1 + 1e-9)
+        found = []
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._min_dist2(node, point) > radius2:
+                continue
+            children = self._children[node]
+            if children is not None:
+                stack.extend(children)
+                continue
+            start, end = self._slices[node]
+            diff = self.xyz[start:end] - point
+            d2 = np.einsum("ij,ij->i", diff, diff)
+            found.append(start + np.flatnonzero(d2 <= radius2))
+
+        idx = np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+        positions, distances = self._finish(lat, lon, idx)
+        # The chord test is exact up to rounding; trim on the haversine value
+        inside = distances <= km
+        return positions[inside], distances[inside]
+
+    def _finish(self, lat, lon, idx):
+        # Report distances with the same haversine formula the brute-force path
+        # uses, then order by distance (ties by catalogue position)
+        positions = self.positions[idx]
+        distances = haversine_np(lon, lat, self.lons[positions], self.lats[positions])
+        order = np.lexsort((positions, distances))
+        return positions[order], distances[order]
@@ -0,0 +1,45 @@
+// Draws the results map from the JSON map data embedded in the page.
+// The base layer (every pub in the catalogue) is fetched from a cached
+// endpoint; only the user marker and the nearby pubs come with the page.
+function drawPubMap(elementId, mapData) {
+  const map = L.map(elementId).setView(mapData.center, mapData.zoom);
+  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    maxZoom: 19,
+    attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+  }).addTo(map);
+
+  const icon = (color, name) => L.AwesomeMarkers.icon({ icon: name, prefix: 'fa', markerColor: color, iconColor: 'white' });
+
+  L.marker(mapData.user.coordinates, { icon: icon('red', 'user') })
+    .bindPopup(mapData.user.popup)
+    .addTo(map);
+
+  // Nearby pubs, with their distance, highlighted on top of the base layer
+  const nearbyIds = new Set();
+  mapData.pubs.forEach(pub => {
+    nearbyIds.add(pub.id);
+    L.marker(pub.coordinates, {
+      icon: icon(pub.selected ? 'blue' : 'green', 'beer'),
+      zIndexOffset: pub.selected ? 1000 : 500
+    })
+      .bindPopup(pub.popup)
+      .addTo(map);
+  });
+
+  // Every other pub, clustered; the browser caches this layer between searches
+  fetch(mapData.markers_url)
+    .then(response => response.json())
+    .then(layer => {
+      const cluster = L.markerClusterGroup();
+      layer.markers.forEach(([id, lat, lon, popup]) => {
+        if (nearbyIds.has(id)) return;
+        L.marker([lat, lon], { icon: icon('lightgray', 'beer') })
+          .bindPopup(popup)
+          .addTo(cluster);
+      });
+      map.addLayer(cluster);
+    })
+    .catch(() => { /* the nearby pubs are already on the map */ });
+
+  return map;
+}
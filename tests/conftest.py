@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live at the repository root, next to vibe_beer_finder.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from crawl_planner import nearest_neighbour, plan_crawl, route_length, solve_exact, two_opt
+
+
+def distance_matrix(k, seed):
+    """Straight-line distances between a start and k random stops"""
+    points = np.random.default_rng(seed).random((k + 1, 2))
+    return np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=2))
+
+
+def brute_force(matrix, round_trip):
+    k = len(matrix) - 1
+    return min(route_length(matrix, order, round_trip) for order in permutations(range(1, k + 1)))
+
+
+def test_route_length_starts_at_row_zero():
+    matrix = np.array([[0, 1, 5], [1, 0, 2], [5, 2, 0]], dtype=float)
+    assert route_length(matrix, [1, 2]) == 3
+    assert route_length(matrix, [1, 2], round_trip=True) == 8
+    assert route_length(matrix, [2, 1]) == 7
+
+
+@pytest.mark.parametrize("round_trip", [False, True])
+@pytest.mark.parametrize("k", range(0, 8))
+def test_exact_solver_matches_brute_force(k, round_trip):
+    for seed in range(3):
+        matrix = distance_matrix(k, seed)
+        order = solve_exact(matrix, round_trip)
+        assert sorted(order) == list(range(1, k + 1))
+        assert route_length(matrix, order, round_trip) == pytest.approx(brute_force(matrix, round_trip))
+
+
+@pytest.mark.parametrize("round_trip", [False, True])
+def test_two_opt_reaches_a_local_optimum_no_longer_than_its_start(round_trip):
+    for seed in range(5):
+        matrix = distance_matrix(30, seed)
+        start = nearest_neighbour(matrix)
+        order, converged = two_opt(matrix, start, round_trip)
+        assert converged
+        assert sorted(order) == list(range(1, 31))
+        assert route_length(matrix, order, round_trip) <= route_length(matrix, start, round_trip) + 1e-12
+        # No single reversal shortens it any more
+        length = route_length(matrix, order, round_trip)
+        for i in range(len(order)):
+            for j in range(i + 1, len(order)):
+                reversed_order = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                assert route_length(matrix, reversed_order, round_trip) >= length - 1e-9
+
+
+@pytest.mark.parametrize("round_trip", [False, True])
+def test_heuristic_stays_close_to_optimal_on_short_crawls(round_trip):
+    for seed in range(5):
+        matrix = distance_matrix(7, seed)
+        order, method = plan_crawl(matrix, round_trip, exact_max=0, budget_ms=1000)
+        assert method == "2-opt"
+        assert route_length(matrix, order, round_trip) <= 1.25 * brute_force(matrix, round_trip)
+
+
+def test_plan_crawl_picks_the_method_by_size():
+    assert plan_crawl(distance_matrix(5, 0), exact_max=8)[1] == "exact"
+    assert plan_crawl(distance_matrix(12, 0), exact_max=8, budget_ms=1000)[1] == "2-opt"
+    assert plan_crawl(distance_matrix(300, 0), exact_max=8, budget_ms=0)[1] == "2-opt (time budget)"
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from geo import haversine, haversine_matrix, haversine_np, smallest_k
+
+LONS = np.array([4.40, 4.41, 4.40, -0.12, 179.9, -179.9, 0.0, 4.40])
+LATS = np.array([51.22, 51.21, 51.22, 51.50, -16.0, -16.0, 90.0, np.nan])
+
+
+def scalar(lon, lat, lons, lats):
+    return np.array([
+        np.inf if np.isnan(b) or np.isnan(a) else haversine(lon, lat, a, b)
+        for a, b in zip(lons, lats)
+    ])
+
+
+@pytest.mark.parametrize("lon, lat", [(4.40, 51.22), (-0.12, 51.50), (180.0, -16.0), (0.0, -90.0)])
+def test_haversine_np_matches_scalar(lon, lat):
+    np.testing.assert_allclose(haversine_np(lon, lat, LONS, LATS), scalar(lon, lat, LONS, LATS), rtol=1e-12, atol=1e-9)
+
+
+def test_haversine_np_puts_missing_coordinates_last():
+    distances = haversine_np(4.40, 51.22, LONS, LATS)
+    assert distances[-1] == np.inf
+    assert smallest_k(distances, len(distances))[-1] == len(distances) - 1
+
+
+def test_haversine_matrix_matches_scalar():
+    matrix = haversine_matrix(LONS, LATS, LONS[:5], LATS[:5])
+    assert matrix.shape == (len(LONS), 5)
+    for row, (lon, lat) in enumerate(zip(LONS, LATS)):
+        if np.isnan(lat):
+            assert np.all(matrix[row] == np.inf)
+        else:
+            np.testing.assert_allclose(matrix[row], scalar(lon, lat, LONS[:5], LATS[:5]), rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 5, 8])
+def test_smallest_k_matches_a_full_sort(k):
+    rng = np.random.default_rng(k)
+    values = rng.integers(0, 4, 8).astype(np.float64)
+    expected = sorted(range(len(values)), key=lambda i: (values[i], i))[:k]
+    assert smallest_k(values, k).tolist() == expected
+
+
+def test_smallest_k_breaks_ties_by_position():
+    values = np.array([2.0, 1.0, 1.0, 0.5, 1.0, 2.0])
+    assert smallest_k(values, 3).tolist() == [3, 1, 2]
+    assert smallest_k(values, 6).tolist() == [3, 1, 2, 4, 0, 5]
+
+
+def test_smallest_k_with_more_requested_than_available():
+    values = np.array([3.0, 1.0, 2.0])
+    assert smallest_k(values, 10).tolist() == [1, 2, 0]
+    assert smallest_k(np.empty(0), 5).tolist() == []
+    assert smallest_k(values, -1).tolist() == []
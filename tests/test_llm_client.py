@@ -0,0 +1,153 @@
+import pytest
+
+from llm_client import CircuitBreaker, CircuitOpen, LLMClient, LLMError
+from llm_executor import BoundedLLMExecutor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeProvider:
+    """Answers from a script of results; exceptions in it are raised"""
+
+    name = "fake"
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    def complete(self, prompt, timeout):
+        self.calls += 1
+        result = self.script.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def tripped_breaker(clock):
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window_seconds=30, cooldown=10, clock=clock)
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_breaker_stays_closed_below_min_calls_or_error_rate():
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, clock=FakeClock())
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, clock=FakeClock())
+    for success in (True, True, False, True, True, False):
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_forgets_outcomes_outside_its_window():
+    clock = FakeClock()
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window_seconds=30, clock=clock)
+    for _ in range(3):
+        breaker.record(False)
+    clock.now = 31
+    for _ in range(3):
+        breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_breaker_refuses_calls_until_the_cooldown_ends():
+    clock = FakeClock()
+    breaker = tripped_breaker(clock)
+    clock.now = 9.9
+    assert not breaker.allow()
+    assert breaker.short_circuited == 1
+    clock.now = 10
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_half_open_breaker_lets_one_trial_through_and_closes_on_success():
+    clock = FakeClock()
+    breaker = tripped_breaker(clock)
+    clock.now = 10
+    ticket = breaker.allow()
+    assert ticket == CircuitBreaker.TRIAL
+    assert not breaker.allow()
+    breaker.record(True, ticket)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() == CircuitBreaker.CALL
+
+
+def test_failed_trial_reopens_for_another_cooldown():
+    clock = FakeClock()
+    breaker = tripped_breaker(clock)
+    clock.now = 10
+    breaker.record(False, breaker.allow())
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened == 2
+    clock.now = 19
+    assert not breaker.allow()
+    clock.now = 20
+    assert breaker.allow()
+
+
+def test_cancelled_trial_lets_the_next_call_try():
+    clock = FakeClock()
+    breaker = tripped_breaker(clock)
+    clock.now = 10
+    breaker.cancel(breaker.allow())
+    assert breaker.allow() == CircuitBreaker.TRIAL
+
+
+def test_late_outcomes_of_calls_from_before_the_trip_do_not_decide_the_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window_seconds=30, cooldown=10, clock=clock)
+    slow = breaker.allow()
+    for success in (True, False, True, False):
+        breaker.record(success, breaker.allow())
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 10
+    trial = breaker.allow()
+    assert trial == CircuitBreaker.TRIAL
+    # The slow call allowed while closed finishes during the trial
+    breaker.record(True, slow)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(False, trial)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened == 2
+
+    # A late failure while open is not counted once the next trial closes the breaker
+    breaker.record(False, slow)
+    clock.now = 20
+    breaker.record(True, breaker.allow())
+    assert breaker.state == CircuitBreaker.CLOSED
+    for _ in range(3):
+        breaker.record(False, breaker.allow())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_retries_retryable_errors():
+    provider = FakeProvider(LLMError("busy", status=503, retryable=True), "The Crown")
+    client = LLMClient(provider, executor=BoundedLLMExecutor(timeout=5), backoff=0.001)
+    assert client.generate("prompt") == "The Crown"
+    assert (provider.calls, client.retried) == (2, 1)
+
+
+def test_client_short_circuits_while_the_breaker_is_open():
+    clock = FakeClock()
+    provider = FakeProvider(*[LLMError("bad request", status=400)] * 4)
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, cooldown=10, clock=clock)
+    client = LLMClient(provider, executor=BoundedLLMExecutor(timeout=5), breaker=breaker)
+    for _ in range(4):
+        with pytest.raises(LLMError):
+            client.generate("prompt")
+    with pytest.raises(CircuitOpen):
+        client.generate("prompt")
+    assert provider.calls == 4
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+
+from opening_hours import OpeningHours, UnparseableHours, next_arrival, parse_opening_hours, week_slot
+
+DAYS = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+
+
+def at(day, clock):
+    """A local datetime in the week of Monday 2026-10-12"""
+    hour, minute = map(int, clock.split(":"))
+    return datetime(2026, 10, 12 + DAYS.index(day), hour, minute)
+
+
+def is_open(value, day, clock):
+    return bool(parse_opening_hours(value)[week_slot(at(day, clock))])
+
+
+def test_week_slot_counts_quarter_hours_from_monday():
+    assert week_slot(at("Mo", "00:00")) == 0
+    assert week_slot(at("Mo", "00:14")) == 0
+    assert week_slot(at("Tu", "01:15")) == 96 + 5
+    assert week_slot(at("Su", "23:59")) == 7 * 96 - 1
+
+
+def test_always_open():
+    assert parse_opening_hours("24/7").all()
+
+
+@pytest.mark.parametrize("day, clock, expected", [
+    ("Fr", "23:30", True),
+    ("Sa", "00:45", True),   # Friday's hours run past midnight
+    ("Sa", "01:00", False),
+    ("Sa", "17:00", False),
+    ("Mo", "00:30", False),  # Sunday is not in the range, so nothing spills into Monday
+    ("Tu", "00:30", True),
+])
+def test_spans_past_midnight_spill_into_the_next_day(day, clock, expected):
+    assert is_open("Mo-Fr 16:00-01:00", day, clock) is expected
+
+
+def test_sunday_night_spills_into_monday_morning():
+    assert is_open("Su 20:00-02:00", "Mo", "01:30")
+    assert not is_open("Su 20:00-02:00", "Mo", "02:00")
+
+
+def test_hours_past_24_are_the_next_morning():
+    assert is_open("Fr 20:00-26:00", "Sa", "01:45")
+    assert not is_open("Fr 20:00-26:00", "Sa", "02:00")
+
+
+@pytest.mark.parametrize("day, expected", [
+    ("Fr", True), ("Sa", True), ("Su", True), ("Mo", True), ("Tu", False), ("Th", False),
+])
+def test_day_ranges_wrap_around_the_week(day, expected):
+    assert is_open("Fr-Mo 18:00-23:00", day, "19:00") is expected
+
+
+def test_later_rules_replace_the_hours_of_their_days():
+    value = "Mo-Su 10:00-22:00; We off; Sa 14:00-02:00"
+    assert is_open(value, "Tu", "11:00")
+    assert not is_open(value, "We", "11:00")
+    assert not is_open(value, "Sa", "11:00")
+    assert is_open(value, "Su", "01:00")
+
+
+def test_additional_rules_after_a_comma_add_hours():
+    value = "Mo-Fr 10:00-18:00, Sa 12:00-16:00"
+    assert is_open(value, "We", "17:00")
+    assert is_open(value, "Sa", "13:00")
+    assert not is_open(value, "Su", "13:00")
+
+
+def test_several_spans_open_ends_and_loose_spacing():
+    value = "Mo - Th 11:00 - 14:00 , 17:00 - 23:00; Fr 18:00+"
+    assert is_open(value, "Mo", "12:00")
+    assert not is_open(value, "Mo", "15:00")
+    assert is_open(value, "Fr", "23:45")
+    assert not is_open(value, "Sa", "00:15")
+
+
+def test_holiday_rules_are_skipped():
+    assert is_open("Mo-Su 10:00-20:00; PH off", "Mo", "12:00")
+
+
+@pytest.mark.parametrize("value", [
+    "sunrise-sunset", "Jan-Mar 10:00-12:00", "PH 10:00-12:00", "Mo-Fr", "10:00-25:61", "open daily",
+])
+def test_unsupported_values_are_rejected(value):
+    with pytest.raises(UnparseableHours):
+        parse_opening_hours(value)
+
+
+def test_opening_hours_table_treats_missing_and_unparseable_as_unknown():
+    hours = OpeningHours([
+        {"opening_hours": "Mo-Fr 16:00-01:00"},
+        {"opening_hours": "sunrise-sunset"},
+        {},
+        None,
+        {"opening_hours": "Mo-Fr 16:00-01:00"},
+    ])
+    friday_night, saturday_noon = at("Fr", "23:00"), at("Sa", "12:00")
+    assert hours.open_at([0, 1, 2, 3, 4], friday_night).tolist() == [True, True, True, True, True]
+    assert hours.open_at([0, 1, 2], saturday_noon).tolist() == [False, True, True]
+    assert hours.open_at([0, 1, 2], saturday_noon, include_unknown=False).tolist() == [False, False, False]
+    assert [hours.status(row, saturday_noon) for row in range(3)] == ["closed", "unknown", "unknown"]
+    assert hours.summary() == {
+        "pubs": 5, "parsed": 2, "unparseable": 1, "missing": 2, "unparseable_examples": ["sunrise-sunset"],
+    }
+
+
+def test_next_arrival_is_today_or_tomorrow():
+    now = at("Fr", "20:30")
+    assert next_arrival("21:00", now) == at("Fr", "21:00")
+    assert next_arrival("20:30", now) == now
+    assert next_arrival("9:15", now) == at("Sa", "09:15")
+    with pytest.raises(ValueError):
+        next_arrival("25:00", now)
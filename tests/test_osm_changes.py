@@ -0,0 +1,69 @@
+import math
+
+import pytest
+
+from osm_changes import parse_osm_change, route_changes
+from regions import DEFAULT_REGIONS, regions_covering
+
+DIFF = b"""<?xml version="1.0" encoding="UTF-8"?>
+<osmChange version="0.6">
+  <create>
+    <node id="1" lat="51.22" lon="4.40"><tag k="amenity" v="bar"/><tag k="name" v="New Bar"/></node>
+    <node id="2" lat="51.22" lon="4.40"><tag k="amenity" v="bench"/></node>
+  </create>
+  <modify>
+    <way id="3"><center lat="51.21" lon="4.41"/><tag k="amenity" v="pub"/></way>
+    <way id="4"><tag k="amenity" v="pub"/></way>
+  </modify>
+  <delete>
+    <node id="5" lat="51.22" lon="4.40"/>
+  </delete>
+</osmChange>
+"""
+
+
+def route(changes):
+    return route_changes(changes, lambda lat, lon: regions_covering(DEFAULT_REGIONS, lat, lon)
+                         if lat is not None else DEFAULT_REGIONS)
+
+
+def test_parse_keeps_document_order_and_element_types():
+    changes = parse_osm_change(DIFF)
+    assert [(c.action, c.type, c.id) for c in changes] == [
+        ("create", "node", 1), ("create", "node", 2), ("modify", "way", 3), ("modify", "way", 4),
+        ("delete", "node", 5),
+    ]
+    assert changes[0].tags == {"amenity": "bar", "name": "New Bar"}
+    assert (changes[0].lat, changes[0].lon) == (51.22, 4.40)
+
+
+def test_parse_takes_way_coordinates_from_center():
+    changes = parse_osm_change(DIFF)
+    assert (changes[2].lat, changes[2].lon) == (51.21, 4.41)
+    assert (changes[3].lat, changes[3].lon) == (None, None)
+
+
+@pytest.mark.parametrize("document", [b"<osmChange><create>", b"<osm version='0.6'/>"])
+def test_parse_rejects_documents_that_are_not_osmchange(document):
+    with pytest.raises(ValueError):
+        parse_osm_change(document)
+
+
+def test_route_removes_every_changed_element_and_adds_places_to_their_shard():
+    removed, additions = route(parse_osm_change(DIFF))
+    assert removed == {("node", 1), ("node", 2), ("way", 3), ("way", 4), ("node", 5)}
+    assert sorted(additions) == [("antwerp", "bar"), ("antwerp", "pub")]
+    assert [row["id"] for row in additions[("antwerp", "bar")]] == [1]
+    assert [row["id"] for row in additions[("antwerp", "pub")]] == [3, 4]
+    # A way without coordinates keeps its place in the table by (type, id)
+    way = additions[("antwerp", "pub")][1]
+    assert way["type"] == "way" and math.isnan(way["lat"])
+
+
+def test_route_adds_nothing_for_deletions_or_uncategorised_places():
+    removed, additions = route(parse_osm_change(
+        b'<osmChange><delete><node id="9"/></delete>'
+        b'<create><node id="10" lat="51.2" lon="4.4"><tag k="shop" v="bakery"/></node></create></osmChange>'
+    ))
+    assert removed == {("node", 9), ("node", 10)}
+    assert additions == {}
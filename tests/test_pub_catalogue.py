@@ -0,0 +1,166 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import pub_catalogue
+from osm_changes import parse_osm_change
+from pub_catalogue import ShardedCatalogue, build_view, load_shard, read_shard, shard_path
+from pub_record import PubRecord
+from pub_snapshot import META_FILE, write_snapshot
+from regions import DEFAULT_REGIONS
+
+
+def colliding_pubs():
+    # OSM ids are only unique per element type: node 42 and way 42 are different places
+    return pd.DataFrame({
+        "id": [42, 42, 7],
+        "type": ["node", "way", "node"],
+        "lat": [51.2200, 51.2201, 51.2300],
+        "lon": [4.4000, 4.4001, 4.4100],
+        "tags": [
+            {"amenity": "pub", "name": "Node Pub", "outdoor_seating": "yes"},
+            {"amenity": "pub", "name": "Way Pub", "live_music": "yes"},
+            {"amenity": "pub", "name": "Other"},
+        ],
+        "category": "pub",
+    })
+
+
+def records(view):
+    pub_df = view.pub_df
+    return [
+        PubRecord(pub_id, tags["name"], lat, lon, 0.0, "pub", tags, pub_type)
+        for pub_id, pub_type, lat, lon, tags in zip(
+            pub_df["id"], pub_df["type"], pub_df["lat"], pub_df["lon"], pub_df["tags"])
+    ]
+
+
+def test_view_keys_places_by_type_and_id():
+    view = build_view(colliding_pubs())
+    assert view.position_of("node", 42) == 0
+    assert view.position_of("way", 42) == 1
+    assert view.position_of("relation", 42) is None
+    assert view.positions_of_id("42") == [0, 1]
+    assert view.positions_of_id(7) == [2]
+
+
+def test_colliding_ids_resolve_to_their_own_profiles_markers_and_names():
+    view = build_view(colliding_pubs())
+    rows = view.positions_of(records(view))
+    assert rows == [0, 1, 2]
+
+    ranking = view.profiles.rank("live music", rows)
+    assert ranking["best"] == 1
+    assert "live_music" in view.markers.tags_popup(rows[1])
+    assert "live_music" not in view.markers.tags_popup(rows[0])
+    assert view.names.best_match("Way Pub", rows) == (1, 1.0)
+    assert view.names.best_match("Node Pub", rows) == (0, 1.0)
+
+
+def delete_diff(pub_type, pub_id):
+    return parse_osm_change(f'<osmChange><delete><{pub_type} id="{pub_id}"/></delete></osmChange>')
+
+
+def in_memory_catalogue(pub_df, **kwargs):
+    return ShardedCatalogue(regions=DEFAULT_REGIONS, snapshot_dir=None,
+                            loader=lambda region, category, snapshot_dir: pub_df.copy(), **kwargs)
+
+
+def test_diffs_at_or_below_the_current_revision_are_ignored():
+    catalogue = in_memory_catalogue(colliding_pubs())
+    catalogue.load()
+    assert catalogue.apply_changes(delete_diff("way", 42), 5)["applied"]
+    assert len(catalogue.get()) == 2
+
+    for stale in (5, 4):
+        result = catalogue.apply_changes(delete_diff("node", 42), stale)
+        assert (result["applied"], result["revision"]) == (False, 5)
+    assert len(catalogue.get()) == 2
+
+
+def test_implausible_revision_jumps_are_refused():
+    catalogue = in_memory_catalogue(colliding_pubs(), max_revision_jump=10)
+    catalogue.load()
+    catalogue.apply_changes(delete_diff("node", 7), 100)
+    with pytest.raises(ValueError):
+        catalogue.apply_changes(delete_diff("node", 42), 111)
+    assert catalogue.apply_changes(delete_diff("node", 42), 110)["applied"]
+
+
+def test_shards_loaded_after_a_diff_replay_it():
+    catalogue = in_memory_catalogue(colliding_pubs())
+    catalogue.apply_changes(delete_diff("node", 42), 3)
+    view = catalogue.view()
+    assert view.position_of("node", 42) is None
+    assert view.position_of("way", 42) is not None
+
+
+def test_revision_survives_a_restart_through_the_snapshots(tmp_path):
+    snapshot_dir = str(tmp_path)
+    builds = []
+
+    def loader(region, category, snapshot_dir):
+        pub_df = read_shard(snapshot_dir, region, category, "fingerprint")
+        if pub_df is None:
+            builds.append(category)
+            pub_df = colliding_pubs()
+            pub_df["category"] = category
+            write_snapshot(pub_df, shard_path(snapshot_dir, region, category), "fingerprint")
+        return pub_df
+
+    catalogue = ShardedCatalogue(regions=DEFAULT_REGIONS, snapshot_dir=snapshot_dir, loader=loader)
+    catalogue.load()
+    catalogue.apply_changes(delete_diff("node", 7), 7)
+
+    restarted = ShardedCatalogue(regions=DEFAULT_REGIONS, snapshot_dir=snapshot_dir, loader=loader)
+    assert restarted.revision == 7
+    assert not restarted.apply_changes(delete_diff("node", 42), 6)["applied"]
+    restarted.load()
+    assert len(restarted.get()) == 2 and builds == ["pub"]
+
+    # A refresh rebuilds from the dataset, which knows nothing of the diffs
+    restarted.refresh()
+    assert restarted.revision == 0 and len(restarted.get()) == 3
+    assert ShardedCatalogue(regions=DEFAULT_REGIONS, snapshot_dir=snapshot_dir, loader=loader).revision == 0
+
+
+def test_trusted_snapshot_loads_without_opening_the_dataset(tmp_path, monkeypatch):
+    snapshot_dir = str(tmp_path)
+    region = DEFAULT_REGIONS[0]
+    opened = []
+
+    def open_source(dataset_name, ingest_mode):
+        opened.append(dataset_name)
+        raise ConnectionError("hub unreachable")
+
+    monkeypatch.setattr(pub_catalogue, "open_source", open_source)
+    pub_df = colliding_pubs()
+    write_snapshot(pub_df, shard_path(snapshot_dir, region, "pub"), "old-fingerprint")
+
+    loaded = load_shard(region, "pub", snapshot_dir, trust_snapshot=True)
+    assert loaded[["id", "type"]].values.tolist() == pub_df[["id", "type"]].values.tolist()
+    assert loaded["tags"].tolist() == pub_df["tags"].tolist()
+    assert opened == []
+
+    # Without trust (or without a snapshot) the dataset is still opened
+    with pytest.raises(ConnectionError):
+        load_shard(region, "pub", snapshot_dir)
+    with pytest.raises(ConnectionError):
+        load_shard(region, "bar", snapshot_dir, trust_snapshot=True)
+    assert len(opened) == 2
+
+
+def test_snapshots_of_an_older_format_are_rebuilt(tmp_path):
+    path = shard_path(str(tmp_path), DEFAULT_REGIONS[0], "pub")
+    write_snapshot(colliding_pubs(), path, "fingerprint")
+    assert read_shard(str(tmp_path), DEFAULT_REGIONS[0], "pub", None) is not None
+
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["format_version"] -= 1
+    with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    assert read_shard(str(tmp_path), DEFAULT_REGIONS[0], "pub", None) is None
+    assert read_shard(str(tmp_path), DEFAULT_REGIONS[0], "pub", "fingerprint") is None
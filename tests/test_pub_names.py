@@ -0,0 +1,78 @@
+import pytest
+
+from pub_names import NameIndex, edit_distance, fold_name, name_similarity, unnamed_pub_id
+
+NAMES = ["Café Kulminator", "De Kroon", None, "Het Elfde Gebod", "Bar Kulminator Annex", "Oud Arsenaal"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return NameIndex(NAMES)
+
+
+def names_of(results):
+    return [NAMES[row] for row, _ in results]
+
+
+def test_fold_name_drops_accents_case_and_punctuation():
+    assert fold_name("Café 't Kulminator!") == "cafe t kulminator"
+    assert fold_name(None) == ""
+
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("kroon", "kroon", 0), ("kroon", "kron", 1), ("kroon", "croon", 1), ("", "abc", 3), ("elfde", "efde", 1),
+])
+def test_edit_distance(a, b, distance):
+    assert edit_distance(a, b) == distance == edit_distance(b, a)
+
+
+def test_edit_distance_stops_past_its_limit():
+    assert edit_distance("kulminator", "arsenaal", limit=2) == 3
+
+
+def test_name_similarity_prefers_exact_then_whole_words():
+    assert name_similarity("de kroon", "de kroon") == 1.0
+    assert name_similarity("kulminator", "cafe kulminator") == 0.9
+    assert 0.5 < name_similarity("de kron", "de kroon") < 0.9
+    assert name_similarity("", "de kroon") == 0.0
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("kulminator", "Café Kulminator"),
+    ("cafe kulminater", "Café Kulminator"),  # typo, no accent
+    ("elfde geb", "Het Elfde Gebod"),         # partly typed
+    ("arsenal", "Oud Arsenaal"),
+    ("KROON", "De Kroon"),
+])
+def test_search_finds_pubs_despite_typos_accents_and_partial_words(index, query, expected):
+    assert names_of(index.search(query, limit=1)) == [expected]
+
+
+def test_search_ranks_and_limits_results(index):
+    results = index.search("kulmi", limit=5)
+    assert set(names_of(results[:2])) == {"Café Kulminator", "Bar Kulminator Annex"}
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert len(index.search("kulmi", limit=1)) == 1
+    assert index.search("  ") == []
+
+
+def test_unnamed_pubs_are_never_returned(index):
+    assert 2 not in [row for row, _ in index.search("unnamed pub", limit=10)]
+
+
+def test_best_match_resolves_loose_llm_answers(index):
+    rows = [0, 1, 3]
+    assert index.best_match("**Cafe Kulminator**", rows)[0] == 0
+    assert index.best_match("Het Elfde Gebot", rows)[0] == 2
+    assert index.best_match("Oud Arsenaal", rows)[0] is None  # not a candidate
+    assert index.best_match("De Kroon", [None, 1])[0] == 1
+
+
+def test_best_match_resolves_unnamed_pubs_by_id(index):
+    rows, ids = [0, 2, 3], [101, 102, 103]
+    assert unnamed_pub_id("I pick Unnamed Pub (ID: 102).") == "102"
+    assert unnamed_pub_id("De Kroon") is None
+    assert index.best_match("Unnamed Pub (ID: 102)", rows, ids) == (1, 1.0)
+    assert index.best_match("unnamed pub (id 102)", rows, ids)[0] == 1
+    assert index.best_match("Unnamed Pub (ID: 999)", rows, ids)[0] is None
+    assert index.best_match("Unnamed Pub (ID: 102)", rows)[0] is None
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Call flight.do with the same key from several threads at once"""
+    outcomes = [None] * callers
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do(key, fn)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def test_concurrent_calls_with_the_same_key_share_one_computation():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "pub 42"
+
+    threads, outcomes = run_concurrently(flight, "cozy|1,2", fn, callers=5)
+    wait_for(lambda: flight.stats()["shared"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(outcomes, key=lambda outcome: outcome[1]) == [("pub 42", False)] + [("pub 42", True)] * 4
+    assert flight.stats() == {"leaders": 1, "shared": 4, "in_flight": 0}
+
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise RuntimeError("LLM down")
+
+    threads, outcomes = run_concurrently(flight, "k", fn, callers=3)
+    wait_for(lambda: flight.stats()["shared"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert flight.in_flight() == 0
+
+
+def test_follower_gives_up_after_wait_timeout():
+    flight = SingleFlight(wait_timeout=0.01)
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", lambda: release.wait(5)))
+    leader.start()
+    wait_for(lambda: flight.in_flight() == 1)
+    try:
+        with pytest.raises(TimeoutError):
+            flight.do("k", lambda: "never run")
+    finally:
+        release.set()
+        leader.join()
+
+
+def test_nothing_is_kept_after_a_call_finishes():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("a", lambda: 2) == (2, False)
+    assert flight.do("b", lambda: 3) == (3, False)
+    assert flight.stats() == {"leaders": 3, "shared": 0, "in_flight": 0}
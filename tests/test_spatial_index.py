@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from geo import haversine
+from spatial_index import SpatialIndex, km_to_chord, to_unit_xyz
+
+TOLERANCE_KM = 1e-9
+
+
+def brute_force(index, lat, lon):
+    """(distance, position) pairs for every indexed point, by scalar haversine, nearest first"""
+    missing = set(index.missing.tolist())
+    return sorted(
+        (haversine(lon, lat, index.lons[p], index.lats[p]), p)
+        for p in range(len(index.lats)) if p not in missing
+    )
+
+
+def assert_matches_brute_force(index, queries, k, radius_km):
+    for lat, lon in queries:
+        brute = brute_force(index, lat, lon)
+
+        positions, distances = index.k_nearest(lat, lon, k)
+        expected = [d for d, _ in brute[:k]]
+        assert len(distances) == len(expected)
+        np.testing.assert_allclose(distances, expected, rtol=0, atol=TOLERANCE_KM)
+        assert np.all(np.diff(distances) >= 0)
+        assert not set(positions.tolist()) & set(index.missing.tolist())
+
+        positions, distances = index.within_radius(lat, lon, radius_km)
+        got = set(positions.tolist())
+        required = {p for d, p in brute if d <= radius_km - TOLERANCE_KM}
+        allowed = {p for d, p in brute if d <= radius_km + TOLERANCE_KM}
+        assert required <= got <= allowed
+        assert np.all(np.diff(distances) >= 0)
+
+
+@pytest.fixture
+def antwerp():
+    # Random points around Antwerp, 1% of them without a latitude
+    rng = np.random.default_rng(0)
+    lats = 51.20 + rng.random(5000) * 0.05
+    lons = 4.38 + rng.random(5000) * 0.06
+    lats[rng.random(5000) < 0.01] = np.nan
+    queries = [(51.20 + rng.random() * 0.05, 4.38 + rng.random() * 0.06) for _ in range(20)]
+    return SpatialIndex(lats, lons), queries
+
+
+def test_k_nearest_and_radius_match_brute_force(antwerp):
+    index, queries = antwerp
+    assert_matches_brute_force(index, queries, k=10, radius_km=0.3)
+
+
+def test_pubs_without_coordinates_are_left_out(antwerp):
+    index, queries = antwerp
+    assert len(index.missing) > 0
+    assert len(index) + len(index.missing) == len(index.lats)
+
+    lat, lon = queries[0]
+    positions, distances = index.k_nearest(lat, lon, len(index.lats))
+    assert len(positions) == len(index)
+    assert np.all(np.isfinite(distances))
+
+
+def test_k_larger_than_index_returns_everything():
+    index = SpatialIndex([51.2, 51.21, np.nan], [4.4, 4.41, 4.42])
+    positions, distances = index.k_nearest(51.2, 4.4, 10)
+    assert positions.tolist() == [0, 1]
+    assert distances[0] == 0.0
+
+    empty = SpatialIndex([np.nan], [np.nan])
+    positions, distances = empty.k_nearest(51.2, 4.4, 3)
+    assert len(positions) == 0 and len(distances) == 0
+    positions, _ = empty.within_radius(51.2, 4.4, 1.0)
+    assert len(positions) == 0
+
+
+def test_ties_are_ordered_by_position():
+    lats = [51.2, 51.21, 51.2, 51.21, 51.2]
+    lons = [4.4, 4.41, 4.4, 4.41, 4.4]
+    index = SpatialIndex(lats, lons, leaf_size=1)
+    positions, _ = index.k_nearest(51.2, 4.4, 3)
+    assert positions.tolist() == [0, 2, 4]
+    positions, _ = index.within_radius(51.2, 4.4, 0.1)
+    assert positions.tolist() == [0, 2, 4]
+
+
+def test_antimeridian_neighbours_are_found_across_the_seam():
+    # Points on both sides of longitude +-180: close on the sphere, far apart in raw degrees
+    rng = np.random.default_rng(1)
+    lats = -17.0 + rng.random(2000) * 2
+    lons = np.where(rng.random(2000) < 0.5, 179.0 + rng.random(2000), -180.0 + rng.random(2000))
+    index = SpatialIndex(lats, lons)
+    queries = [(-16.0, 179.999), (-16.0, -179.999), (-17.0, 180.0), (-15.5, -180.0)]
+    assert_matches_brute_force(index, queries, k=15, radius_km=20)
+
+    positions, _ = index.k_nearest(-16.0, 179.999, 50)
+    assert (lons[positions] < 0).any() and (lons[positions] > 0).any()
+
+
+def test_unit_sphere_conversion():
+    lats = np.array([0.0, 90.0, -90.0, 0.0, 0.0, 51.2, -16.0])
+    lons = np.array([0.0, 0.0, 0.0, 180.0, -180.0, 4.4, 179.9])
+    xyz = to_unit_xyz(lats, lons)
+    np.testing.assert_allclose(np.linalg.norm(xyz, axis=1), 1.0)
+    np.testing.assert_allclose(xyz[0], [1, 0, 0], atol=1e-15)
+    np.testing.assert_allclose(xyz[1], [0, 0, 1], atol=1e-15)
+    np.testing.assert_allclose(xyz[3], xyz[4], atol=1e-15)
+
+    # The chord between two points matches km_to_chord of their haversine distance
+    for i in range(len(lats)):
+        for j in range(len(lats)):
+            km = haversine(lons[i], lats[i], lons[j], lats[j])
+            chord = np.linalg.norm(xyz[i] - xyz[j])
+            assert chord == pytest.approx(km_to_chord(km), abs=1e-12)
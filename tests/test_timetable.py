@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from timetable import LazyTimetable, TimetableFeed, TimetableStore, validate_entry
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TimetableStore(str(tmp_path / "timetable.sqlite3"))
+
+
+class CountingStore:
+    """Wraps a store and counts the feed's reads"""
+
+    def __init__(self, store):
+        self.store = store
+        self.reads = 0
+
+    def entries_since(self, after_id, limit=1000):
+        self.reads += 1
+        return self.store.entries_since(after_id, limit)
+
+    def last_id(self):
+        return self.store.last_id()
+
+
+def test_validate_entry_normalises_fields():
+    assert validate_entry(" 42 ", "  Ann   Lee ", "30", " 19:45 ") == ("42", "Ann Lee", 30, "19:45")
+
+
+@pytest.mark.parametrize("pub_id, name, age, arrival", [
+    ("", "Ann", 30, "19:45"),
+    ("42", " ", 30, "19:45"),
+    ("42", "Ann", "thirty", "19:45"),
+    ("42", "Ann", 0, "19:45"),
+    ("42", "Ann", 30, "24:00"),
+    ("42", "Ann", 30, "7pm"),
+    ("42", "Ann", 30, "12:3099"),
+    ("42", "Ann", 30, "21:00 tomorrow"),
+    ("42", "Ann", 30, "19:45:00"),
+])
+def test_validate_entry_rejects_invalid_fields(pub_id, name, age, arrival):
+    with pytest.raises(ValueError):
+        validate_entry(pub_id, name, age, arrival)
+
+
+def test_store_keeps_entries_per_pub_in_commit_order(store):
+    first = store.add("42", "Ann", 30, "19:45")
+    store.add("7", "Bob", 25, "20:00")
+    third = store.add("42", "Cid", 41, "20:15")
+
+    assert [entry["name"] for entry in store.entries("42")] == ["Ann", "Cid"]
+    assert [entry["name"] for entry in store.entries("42", after_id=first["id"])] == ["Cid"]
+    assert [entry["pub_id"] for entry in store.entries_since(0)] == ["42", "7", "42"]
+    assert store.last_id() == third["id"]
+
+
+def test_concurrent_adds_share_commits(store):
+    threads = [threading.Thread(target=store.add, args=("42", f"Guest {i}", 30, "20:00")) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.written == 20 and len(store.entries("42")) == 20
+    assert store.batches <= 20
+
+
+def test_feed_delivers_new_entries_to_the_pubs_subscribers(store):
+    feed = TimetableFeed(store, poll_interval=0.01)
+    store.on_commit = feed.notify
+    store.add("42", "Before", 30, "19:00")
+
+    subscription = feed.subscribe("42")
+    store.add("7", "Elsewhere", 30, "19:30")
+    store.add("42", "Ann", 30, "19:45")
+
+    delivered = subscription.get(timeout=5)
+    assert [entry["name"] for entry in delivered] == ["Ann"]
+    assert subscription.get(timeout=0.05) is None
+
+    feed.unsubscribe(subscription)
+    assert feed.subscriber_count() == 0
+
+
+def test_idle_feed_does_not_read_the_store(store):
+    counting = CountingStore(store)
+    feed = TimetableFeed(counting, poll_interval=0.01)
+    feed.unsubscribe(feed.subscribe("42"))
+    time.sleep(0.05)
+    reads = counting.reads
+
+    store.add("42", "Ann", 30, "19:45")
+    feed.notify()
+    time.sleep(0.1)
+    assert counting.reads == reads
+
+
+def test_lazy_timetable_creates_the_store_on_first_use(store):
+    created = []
+
+    def factory():
+        created.append(1)
+        return store, TimetableFeed(store)
+
+    timetables = LazyTimetable(factory)
+    assert not timetables.started and not created
+    assert timetables.store is store
+    assert timetables.feed.store is store
+    assert timetables.started and len(created) == 1
+
+
+def test_event_stream_sends_a_backlog_longer_than_one_page(store, monkeypatch):
+    monkeypatch.setenv("PUB_CATALOGUE_PRELOAD", "0")
+    import vibe_beer_finder
+
+    feed = TimetableFeed(store, poll_interval=0.01)
+    monkeypatch.setattr(vibe_beer_finder, "timetables", LazyTimetable(lambda: (store, feed)))
+    with sqlite3.connect(store.path) as conn:
+        conn.executemany(
+            "INSERT INTO timetable (pub_id, name, age, arrival, created_at) VALUES ('42', ?, 30, '20:00', 0)",
+            [(f"Guest {i}",) for i in range(1201)],
+        )
+
+    response = vibe_beer_finder.app.test_client().get("/api/timetable/42/events?after=100", buffered=False)
+    ids = []
+    try:
+        for chunk in response.response:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            ids.extend(int(line[4:]) for line in chunk.splitlines() if line.startswith("id: "))
+            if len(ids) >= 1101 or chunk.startswith(": keep-alive"):
+                break
+    finally:
+        response.close()
+    assert ids == list(range(101, 1202))
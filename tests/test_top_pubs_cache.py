@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from osm_changes import parse_osm_change
+from pub_catalogue import ShardedCatalogue, build_view, view_rows
+from regions import DEFAULT_REGIONS
+from top_pubs_cache import TopPubsCache, geohash_cell
+
+
+def pub_view(seed, count=1500):
+    """Dense pubs in the centre, sparse ones around it, a few stacked on one spot and a few without coordinates"""
+    rng = np.random.default_rng(seed)
+    lats = np.concatenate((51.215 + rng.random(count) * 0.01, 51.15 + rng.random(100) * 0.15, np.full(4, 51.22)))
+    lons = np.concatenate((4.395 + rng.random(count) * 0.015, 4.30 + rng.random(100) * 0.2, np.full(4, 4.40)))
+    lats[::97] = np.nan
+    return build_view(pd.DataFrame({
+        "id": np.arange(len(lats)), "type": "node", "lat": lats, "lon": lons,
+        "tags": [{"amenity": "pub", "name": f"Pub {i}"} for i in range(len(lats))], "category": "pub",
+    }))
+
+
+def edge_points(lat, lon, precision=7):
+    """The centre, corners and edge midpoints of a point's geohash cell, just inside it"""
+    _, (lat_lo, lat_hi, lon_lo, lon_hi) = geohash_cell(lat, lon, precision)
+    eps_lat, eps_lon = (lat_hi - lat_lo) * 1e-6, (lon_hi - lon_lo) * 1e-6
+    lat_mid, lon_mid = (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+    lat_values = (lat_lo + eps_lat, lat_mid, lat_hi - eps_lat)
+    lon_values = (lon_lo + eps_lon, lon_mid, lon_hi - eps_lon)
+    return [(a, b) for a in lat_values for b in lon_values]
+
+
+QUERY_POINTS = [
+    point
+    for lat, lon in [(51.22, 4.40), (51.2195, 4.4003), (51.18, 4.33), (51.29, 4.48), (51.215, 4.395)]
+    for point in edge_points(lat, lon)
+]
+
+
+def assert_same(result, expected, view):
+    positions, distances, rows = result
+    assert positions.tolist() == expected[0].tolist()
+    np.testing.assert_allclose(distances, expected[1], rtol=1e-12, atol=1e-12)
+    if rows is not None:
+        assert rows == view_rows(view, positions)
+
+
+@pytest.mark.parametrize("n", [1, 5, 20])
+def test_nearest_matches_the_index_near_cell_edges_and_corners(n):
+    view = pub_view(0)
+    cache = TopPubsCache(precision=7, extra=4)
+    for _ in range(2):  # second pass answers from the stored cells
+        for lat, lon in QUERY_POINTS:
+            assert_same(cache.nearest(view, lat, lon, n), view.index.k_nearest(lat, lon, n), view)
+    assert cache.hits > 0
+
+
+@pytest.mark.parametrize("radius_km", [0.05, 0.3, 2.0])
+def test_radius_queries_match_the_index(radius_km):
+    view = pub_view(1)
+    cache = TopPubsCache(precision=7, extra=8)
+    for _ in range(2):
+        for lat, lon in QUERY_POINTS:
+            positions, distances = view.index.within_radius(lat, lon, radius_km)
+            assert_same(cache.nearest(view, lat, lon, 10, radius_km), (positions[:10], distances[:10]), view)
+
+
+def test_ties_at_the_same_spot_match_the_index():
+    view = pub_view(2)
+    cache = TopPubsCache(precision=7, extra=0)
+    for _ in range(2):
+        for n in (1, 2, 3, 4, 6):
+            assert_same(cache.nearest(view, 51.22, 4.40, n), view.index.k_nearest(51.22, 4.40, n), view)
+
+
+def test_a_catalogue_swap_does_not_reuse_old_cells():
+    pub_df = pub_view(3).pub_df
+    catalogue = ShardedCatalogue(regions=DEFAULT_REGIONS, snapshot_dir=None,
+                                 loader=lambda region, category, snapshot_dir: pub_df.copy())
+    cache = TopPubsCache(precision=7)
+    old = catalogue.view()
+    nearest = int(cache.nearest(old, 51.22, 4.40, 1)[0][0])
+
+    # An OSM diff deletes the nearest pub and swaps in a new view
+    catalogue.apply_changes(parse_osm_change(
+        f'<osmChange><delete><node id="{pub_df["id"][nearest]}"/></delete></osmChange>'), 1)
+    new = catalogue.view()
+    assert new is not old
+    for lat, lon in QUERY_POINTS:
+        assert_same(cache.nearest(new, lat, lon, 5), new.index.k_nearest(lat, lon, 5), new)
+    positions = cache.nearest(new, 51.22, 4.40, 5)[0]
+    assert pub_df["id"][nearest] not in new.pub_df["id"].to_numpy()[positions]
+
+
+def test_small_catalogues_are_answered_in_full():
+    view = build_view(pd.DataFrame({
+        "id": [1, 2], "type": "node", "lat": [51.22, 51.23], "lon": [4.40, 4.41],
+        "tags": [{"amenity": "pub"}, {"amenity": "pub"}], "category": "pub",
+    }))
+    cache = TopPubsCache(precision=7)
+    for _ in range(2):
+        assert_same(cache.nearest(view, 51.3, 4.5, 5), view.index.k_nearest(51.3, 4.5, 5), view)
+    assert cache.stats()["uncertain"] == 0 and cache.stats()["hits"] == 1
+
+
+def test_disabled_cache_queries_the_index():
+    view = pub_view(5)
+    positions, distances, rows = TopPubsCache(precision=0).nearest(view, 51.22, 4.40, 3)
+    assert rows is None and positions.tolist() == view.index.k_nearest(51.22, 4.40, 3)[0].tolist()
@@ -0,0 +1,67 @@
+import time
+
+from vibe_cache import MemoryBackend, SQLiteBackend, VibeCache, normalise_vibe, vibe_cache_key
+
+
+def test_normalise_vibe_ignores_case_punctuation_and_spacing():
+    assert normalise_vibe("  Cozy!!  pub, ") == normalise_vibe("cozy pub")
+    assert normalise_vibe(None) == ""
+
+
+def test_cache_key_ignores_candidate_order():
+    assert (vibe_cache_key("Cozy", [("node", 3), ("node", 1), ("way", 2)])
+            == vibe_cache_key("cozy!", [("node", "1"), ("way", "2"), ("node", "3")]))
+    assert vibe_cache_key("cozy", [("node", 1), ("node", 2)]) != vibe_cache_key("cozy", [("node", 1), ("node", 3)])
+
+
+def test_cache_key_tells_element_types_apart():
+    # Node 1 and way 1 are different places
+    assert vibe_cache_key("cozy", [("node", 1), ("node", 2)]) != vibe_cache_key("cozy", [("way", 1), ("node", 2)])
+
+
+def test_memory_backend_expires_entries():
+    backend = MemoryBackend()
+    backend.set("a", {"pub_id": "1"}, expires_at=100.0)
+    assert backend.get("a", now=99.0) == {"pub_id": "1"}
+    assert backend.get("a", now=100.0) is None
+    assert len(backend) == 0
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", 1, expires_at=float("inf"))
+    backend.set("b", 2, expires_at=float("inf"))
+    assert backend.get("a", now=0) == 1  # a is now the most recently used
+    backend.set("c", 3, expires_at=float("inf"))
+    assert backend.get("b", now=0) is None
+    assert backend.get("a", now=0) == 1
+    assert backend.get("c", now=0) == 3
+
+
+def test_sqlite_backend_expires_and_evicts(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    now = time.time()
+    backend.set("a", {"pub_id": "1"}, expires_at=now + 60)
+    backend.set("b", {"pub_id": "2"}, expires_at=now + 60)
+    assert backend.get("a", now=now + 1) == {"pub_id": "1"}
+    backend.set("c", {"pub_id": "3"}, expires_at=now + 60)
+    assert backend.get("b", now=now + 2) is None
+    assert backend.get("a", now=now + 2) == {"pub_id": "1"}
+    assert backend.get("c", now=now + 61) is None
+    assert len(backend) == 1
+
+
+def test_vibe_cache_counts_hits_and_misses():
+    cache = VibeCache(ttl_seconds=60)
+    assert cache.get("k") is None
+    cache.set("k", {"pub_id": "1"})
+    assert cache.get("k") == {"pub_id": "1"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_vibe_cache_entries_expire_after_ttl():
+    cache = VibeCache(ttl_seconds=0)
+    cache.set("k", {"pub_id": "1"})
+    assert cache.get("k") is None
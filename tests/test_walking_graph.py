@@ -0,0 +1,151 @@
+import heapq
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geo import EARTH_RADIUS_KM
+from pub_catalogue import build_view
+from walking_graph import WalkingRanker, build_walking_graph, is_walkable
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * math.asin(math.sqrt(h)) * EARTH_RADIUS_KM
+
+
+def street_network(seed, size=5):
+    """
+    Random street grid: junctions on a jittered grid, streets between
+    neighbours with 0-3 shape nodes each, some streets missing, a few
+    parallel detours and a motorway that must not be walked along
+
+    Returns:
+        tuple: (ways, {node id: (lat, lon)})
+    """
+    rng = random.Random(seed)
+    coords = {}
+    next_id = [1]
+
+    def node(lat, lon):
+        node_id = next_id[0]
+        next_id[0] += 1
+        coords[node_id] = (lat, lon)
+        return node_id
+
+    grid = {(i, j): node(51.2 + 0.002 * i + rng.uniform(-3e-4, 3e-4), 4.4 + 0.003 * j + rng.uniform(-3e-4, 3e-4))
+            for i in range(size) for j in range(size)}
+
+    def street(a, b, shapes, bend=0.0):
+        (lat_a, lon_a), (lat_b, lon_b) = coords[a], coords[b]
+        refs = [a]
+        for k in range(1, shapes + 1):
+            f = k / (shapes + 1)
+            refs.append(node(lat_a + f * (lat_b - lat_a) + bend, lon_a + f * (lon_b - lon_a) + bend))
+        return refs + [b]
+
+    ways = []
+    for (i, j), a in grid.items():
+        for b in (grid.get((i + 1, j)), grid.get((i, j + 1))):
+            if b is None or rng.random() < 0.2:
+                continue
+            ways.append((street(a, b, rng.randint(0, 3)), {"highway": "residential"}))
+            if rng.random() < 0.15:
+                ways.append((street(a, b, 2, bend=rng.uniform(3e-4, 8e-4)), {"highway": "footway"}))
+    corners = [grid[(0, 0)], grid[(size - 1, size - 1)]]
+    ways.append((corners, {"highway": "motorway"}))
+    return ways, coords
+
+
+def plain_dijkstra(ways, coords, source):
+    """Walking distances over the raw node graph, without any contraction"""
+    adjacency = {}
+    for refs, tags in ways:
+        if not is_walkable(tags):
+            continue
+        for a, b in zip(refs, refs[1:]):
+            km = haversine_km(*coords[a], *coords[b])
+            adjacency.setdefault(a, []).append((b, km))
+            adjacency.setdefault(b, []).append((a, km))
+    settled = {}
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled[node] = d
+        for neighbour, km in adjacency.get(node, ()):
+            if neighbour not in settled:
+                heapq.heappush(heap, (d + km, neighbour))
+    return settled
+
+
+def build(ways, coords):
+    ids = list(coords)
+    return build_walking_graph(ways, ids, [coords[i][0] for i in ids], [coords[i][1] for i in ids])
+
+
+def test_is_walkable():
+    assert is_walkable({"highway": "footway"})
+    assert not is_walkable({"highway": "motorway"})
+    assert not is_walkable({"building": "yes"})
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_contracted_distances_match_plain_dijkstra(seed):
+    ways, coords = street_network(seed)
+    graph = build(ways, coords)
+    osm_ids = graph.arrays["osm_ids"].tolist()
+    assert graph.junctions < len(graph)
+
+    rng = random.Random(seed)
+    targets = [(node, 0.0) for node in range(len(graph))]
+    for source in rng.sample(range(len(graph)), 5):
+        walking, _, timed_out = graph.distances((source, 0.0), targets)
+        expected = plain_dijkstra(ways, coords, osm_ids[source])
+        assert not timed_out
+        for node in range(len(graph)):
+            assert walking[node] == pytest.approx(expected[osm_ids[node]], rel=1e-4, abs=1e-5)
+
+
+def test_search_stops_at_the_limit():
+    ways, coords = street_network(1)
+    graph = build(ways, coords)
+    targets = [(node, 0.0) for node in range(len(graph))]
+    full, _, _ = graph.distances((0, 0.0), targets)
+    limited, reached, _ = graph.distances((0, 0.0), targets, limit_km=0.3)
+    assert reached >= 0.3
+    within = np.isfinite(limited)
+    assert within.any() and not within.all()
+    assert np.allclose(limited[within], full[within])
+    assert (full[~within] > 0.3 - 1e-6).all()
+
+
+def test_unsnapped_targets_are_unknown():
+    ways, coords = street_network(2)
+    graph = build(ways, coords)
+    walking, _, _ = graph.distances((0, 0.0), [(-1, np.inf), (1, 0.0)])
+    assert walking[0] == np.inf and np.isfinite(walking[1])
+
+
+def test_ranker_estimates_pubs_off_the_network():
+    # One street running east; pub B is just off it, next to the user
+    lons = np.round(np.arange(4.40, 4.4301, 0.001), 4)
+    ids = np.arange(len(lons)) + 1
+    graph = build_walking_graph([(ids.tolist(), {"highway": "footway"})], ids, np.full(len(ids), 51.22), lons)
+    pub_df = pd.DataFrame({
+        "id": [1, 2, 3], "type": "node",
+        "lat": [51.22, 51.22054, 51.22], "lon": [4.42, 4.4001, 4.429],
+        "tags": [{"name": "A"}, {"name": "B"}, {"name": "C"}], "category": "pub",
+    })
+    view = build_view(pub_df)
+    ranker = WalkingRanker(graph, max_snap_km=0.03, fallback_detour=1.3)
+    positions, distances = view.index.k_nearest(51.22, 4.40, 3)
+
+    order, walking = ranker.rank(view, 51.22, 4.40, positions, distances, 3, True)
+    names = [pub_df["tags"][p]["name"] for p in positions[order]]
+    assert names == ["B", "A", "C"]
+    assert walking[order[0]] == np.inf
@@ -0,0 +1,389 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+MAX_NAME_LENGTH = 80
+MAX_PUB_ID_LENGTH = 64
+ARRIVAL_PATTERN = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+
+def validate_entry(pub_id, name, age, arrival):
+    """
+    Check and normalise one timetable entry
+
+    Args:
+        pub_id (str): Pub (or meetup) the timetable belongs to
+        name (str): Name of the person arriving
+        age (int or str): Their age
+        arrival (str): Arrival time as HH:MM
+
+    Returns:
+        tuple: (pub_id, name, age, arrival) cleaned up
+
+    Raises:
+        ValueError: If a field is missing or invalid
+    """
+    pub_id = str(pub_id or "").strip()
+    if not pub_id or len(pub_id) > MAX_PUB_ID_LENGTH:
+        raise ValueError("A pub id of at most 64 characters is required")
+    name = " ".join(str(name or "").split())
+    if not name or len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f"A name of 1 to {MAX_NAME_LENGTH} characters is required")
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        raise ValueError("Age must be a whole number") from None
+    if not 0 < age < 130:
+        raise ValueError("Age must be between 1 and 129")
+    arrival = str(arrival or "").strip()
+    if not ARRIVAL_PATTERN.fullmatch(arrival):
+        raise ValueError("Arrival time must be given as HH:MM")
+    return pub_id, name, age, arrival
+
+
+class _PendingWrite:
+    __slots__ = ("entry", "done", "error")
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.done = threading.Event()
+        self.error = None
+
+
+class TimetableStore:
+    """
+    Meetup timetables in SQLite, written in batches by one writer thread
+
+    add() queues the entry and waits until it is committed. The writer takes
+    everything that queued up while the previous commit was running (up to
+    max_batch) and writes it in one transaction, so under load many arrivals
+    share one fsync instead of each request committing on its own. With
+    flush_interval > 0 the writer also waits that long for more entries
+    before committing. Reads use per-thread connections; WAL mode lets them
+    run while a batch is being written, also from other worker processes.
+    """
+
+    def __init__(self, path, flush_interval=0.0, max_batch=256, on_commit=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.on_commit = on_commit
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.batches = 0
+        self.written = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS timetable ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " pub_id TEXT NOT NULL,"
+                " name TEXT NOT NULL,"
+                " age INTEGER NOT NULL,"
+                " arrival TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS timetable_pub ON timetable (pub_id, id)")
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def add(self, pub_id, name, age, arrival, timeout=5.0):
+        """
+        Add someone's arrival to a timetable
+
+        Returns:
+            dict: The stored entry (id, pub_id, name, age, time, created_at)
+
+        Raises:
+            ValueError: If the entry is invalid
+            TimeoutError: If the entry was not committed within timeout seconds
+            sqlite3.Error: If the batch it was in could not be written
+        """
+        pub_id, name, age, arrival = validate_entry(pub_id, name, age, arrival)
+        pending = _PendingWrite({
+            "id": None, "pub_id": pub_id, "name": name, "age": age, "time": arrival, "created_at": time.time(),
+        })
+        self._ensure_writer()
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Timetable write was not committed in time")
+        if pending.error is not None:
+            raise pending.error
+        return pending.entry
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="timetable-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(conn, batch)
+
+    def _write_batch(self, conn, batch):
+        try:
+            with conn:
+                for pending in batch:
+                    entry = pending.entry
+                    cursor = conn.execute(
+                        "INSERT INTO timetable (pub_id, name, age, arrival, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (entry["pub_id"], entry["name"], entry["age"], entry["time"], entry["created_at"]),
+                    )
+                    entry["id"] = cursor.lastrowid
+        except sqlite3.Error as e:
+            for pending in batch:
+                pending.error = e
+                pending.done.set()
+            return
+        self.batches += 1
+        self.written += len(batch)
+        for pending in batch:
+            pending.done.set()
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def entries(self, pub_id, after_id=0, limit=500):
+        """Entries of one timetable with an id above after_id, oldest first"""
+        rows = self._connect().execute(
+            "SELECT id, pub_id, name, age, arrival, created_at FROM timetable"
+            " WHERE pub_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (str(pub_id), int(after_id), int(limit)),
+        ).fetchall()
+        return [_entry(row) for row in rows]
+
+    def entries_since(self, after_id, limit=1000):
+        """Entries of every timetable with an id above after_id, oldest first"""
+        rows = self._connect().execute(
+            "SELECT id, pub_id, name, age, arrival, created_at FROM timetable WHERE id > ? ORDER BY id LIMIT ?",
+            (int(after_id), int(limit)),
+        ).fetchall()
+        return [_entry(row) for row in rows]
+
+    def last_id(self):
+        return self._connect().execute("SELECT COALESCE(MAX(id), 0) FROM timetable").fetchone()[0]
+
+    def stats(self):
+        return {"batches": self.batches, "written": self.written, "queued": self._queue.qsize()}
+
+
+def _entry(row):
+    return {
+        "id": row["id"], "pub_id": row["pub_id"], "name": row["name"], "age": row["age"],
+        "time": row["arrival"], "created_at": row["created_at"],
+    }
+
+
+class Subscription:
+    """One open timetable view: new entries for its pub arrive on a bounded queue"""
+
+    def __init__(self, pub_id, max_queue=256):
+        self.pub_id = pub_id
+        self._queue = queue.Queue(max_queue)
+        # Set when the viewer fell too far behind; it reconnects and catches up from the store
+        self.overflowed = False
+
+    def put(self, entries):
+        try:
+            self._queue.put_nowait(entries)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """The next list of new entries, or None if nothing arrived within timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class TimetableFeed:
+    """
+    Fans new timetable entries out to every open timetable in this process
+
+    One follower thread reads new rows from the store (by id, so in commit
+    order) and hands each pub's entries to that pub's subscribers. It runs
+    right after each local commit and every poll_interval seconds to pick
+    up entries written by other worker processes, and only while someone is
+    subscribed. Viewers never query the store themselves, so the read load
+    is one small query per batch, not one per open page. With nobody
+    subscribed the follower blocks until the next subscription and does not
+    touch the store at all.
+    """
+
+    def __init__(self, store, poll_interval=1.0, max_subscribers=1000, max_queue=256):
+        self.store = store
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._cursor = None
+        self._thread = None
+        self.delivered = 0
+
+    def subscribe(self, pub_id):
+        """
+        Start receiving new entries for a pub
+
+        Returns:
+            Subscription: The subscription, or None when this process already
+                serves max_subscribers open timetables
+        """
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(str(pub_id), self.max_queue)
+            if not self._count:
+                # First viewer after an idle spell: skip what was written while
+                # nobody watched (a viewer reads its backlog when it connects)
+                self._cursor = self.store.last_id()
+            self._subscribers.setdefault(subscription.pub_id, set()).add(subscription)
+            self._count += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._follow, name="timetable-feed", daemon=True)
+                self._thread.start()
+        # Wake an idle follower so it starts polling again
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.pub_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.pub_id]
+
+    def notify(self):
+        """Wake the follower: something was just committed"""
+        self._wake.set()
+
+    def _follow(self):
+        while True:
+            with self._lock:
+                idle = not self._count
+            # Idle: block until a subscription (or a local commit) wakes us, no polling
+            self._wake.wait(None if idle or self.poll_interval <= 0 else self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._count:
+                    continue
+            try:
+                self._deliver()
+            except Exception as e:
+                print(f"Warning: timetable feed could not read new entries: {e}")
+
+    def _deliver(self):
+        while True:
+            entries = self.store.entries_since(self._cursor)
+            if not entries:
+                return
+            self._cursor = entries[-1]["id"]
+            by_pub = {}
+            for entry in entries:
+                by_pub.setdefault(entry["pub_id"], []).append(entry)
+            with self._lock:
+                targets = [(list(self._subscribers.get(pub_id, ())), pub_entries)
+                           for pub_id, pub_entries in by_pub.items()]
+            for subscribers, pub_entries in targets:
+                for subscription in subscribers:
+                    subscription.put(pub_entries)
+                    self.delivered += len(pub_entries)
+
+    def subscriber_count(self):
+        with self._lock:
+            return self._count
+
+    def stats(self):
+        return {"subscribers": self.subscriber_count(), "timetables": len(self._subscribers), "delivered": self.delivered}
+
+
+def timetable_from_env():
+    """
+    Build the timetable store and its live feed from environment variables
+
+    TIMETABLE_DB: SQLite file for the timetables
+    TIMETABLE_FLUSH_MS: Extra time the writer waits to grow a batch (default 0)
+    TIMETABLE_POLL_SECONDS: How often to look for entries from other processes
+    TIMETABLE_MAX_STREAMS: Open timetable streams allowed per process
+
+    Returns:
+        tuple: (TimetableStore, TimetableFeed)
+    """
+    store = TimetableStore(
+        os.environ.get("TIMETABLE_DB", "data/timetable.sqlite3"),
+        flush_interval=float(os.environ.get("TIMETABLE_FLUSH_MS", 0)) / 1000,
+    )
+    feed = TimetableFeed(
+        store,
+        poll_interval=float(os.environ.get("TIMETABLE_POLL_SECONDS", 1.0)),
+        max_subscribers=int(os.environ.get("TIMETABLE_MAX_STREAMS", 1000)),
+    )
+    store.on_commit = feed.notify
+    return store, feed
+
+
+class LazyTimetable:
+    """
+    The timetable store and its feed, created the first time they are used
+
+    Creating the store opens (and creates) the SQLite file. Doing that when
+    the app is imported would touch the disk in every tool and benchmark
+    that imports it, and in a pre-forking server's master process.
+    """
+
+    def __init__(self, factory=timetable_from_env):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._pair = None
+
+    def _get(self):
+        if self._pair is None:
+            with self._lock:
+                if self._pair is None:
+                    self._pair = self._factory()
+        return self._pair
+
+    @property
+    def store(self):
+        return self._get()[0]
+
+    @property
+    def feed(self):
+        return self._get()[1]
+
+    @property
+    def started(self):
+        """True once the store exists (metrics report zeros before that)"""
+        return self._pair is not None
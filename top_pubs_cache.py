@@ -0,0 +1,230 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from geo import haversine, haversine_np
+from pub_catalogue import view_rows
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_cell(lat, lon, precision):
+    """
+    Geohash of a point and the bounds of its cell
+
+    Args:
+        lat, lon (float): Point in decimal degrees
+        precision (int): Number of geohash characters (7 is about 150 x 150 m)
+
+    Returns:
+        tuple: (geohash string, (lat_lo, lat_hi, lon_lo, lon_hi))
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value = value * 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value = value * 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars), (lat_lo, lat_hi, lon_lo, lon_hi)
+
+
+class _Cell:
+    __slots__ = ("lat", "lon", "positions", "lats", "lons", "rows", "bound", "complete")
+
+    def __init__(self, lat, lon, positions, lats, lons, rows, bound, complete):
+        self.lat = lat
+        self.lon = lon
+        self.positions = positions
+        self.lats = lats
+        self.lons = lons
+        # Table rows of the candidates, so a hit does not touch the DataFrame
+        self.rows = rows
+        # Every pub that is not stored is at least this far from the cell centre
+        self.bound = bound
+        # True when the stored candidates are every indexed pub
+        self.complete = complete
+
+
+class TopPubsCache:
+    """
+    Nearest-pub candidates per geohash cell, re-ranked exactly for each query
+
+    For each (cell, n) the n + extra pubs nearest to the cell centre are
+    stored, with their table rows. A query anywhere in the cell computes exact haversine distances
+    to those candidates only. The answer is used when it is provably the
+    same as the spatial index's: every pub that was not stored is at least
+    `bound` km from the centre, so at least bound - d(point, centre) km from
+    the point, and the n-th candidate must be closer than that. Otherwise
+    (a point near the edge of a sparse cell) the index is queried as before.
+
+    Entries are kept per catalogue view (by its spatial index, which is built
+    with the view). A new catalogue version (shard reload, refresh or an
+    applied OSM diff) builds a new view, so old entries are never consulted
+    again and are freed with the old index.
+    """
+
+    def __init__(self, precision=7, extra=16, max_cells=10000):
+        self.precision = precision
+        self.extra = extra
+        self.max_cells = max_cells
+        self._cells = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncertain = 0
+
+    def nearest(self, view, lat, lon, n, radius_km=None):
+        """
+        The n pubs nearest to a point, optionally within a radius
+
+        Same result as view.index.k_nearest(lat, lon, n), or
+        view.index.within_radius(lat, lon, radius_km) cut to n.
+
+        Args:
+            view (CatalogueView): Catalogue view to search
+            lat, lon (float): Query point in decimal degrees
+            n (int): Number of pubs
+            radius_km (float, optional): Only return pubs within this distance
+
+        Returns:
+            tuple: (positions, distances_km, rows) sorted by distance, where
+                rows are the view_rows of the positions, or None when the
+                answer came from the index instead of the cache
+        """
+        n = int(n)
+        index = view.index
+        if not self.precision or n <= 0 or lat != lat or lon != lon:
+            return self._query(index, lat, lon, n, radius_km)
+
+        cell_hash, bounds = geohash_cell(lat, lon, self.precision)
+        key = (cell_hash, n)
+        with self._lock:
+            cells = self._cells.get(index)
+            cell = cells.get(key) if cells is not None else None
+            if cell is not None:
+                cells.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if cell is None:
+            cell = self._store(view, key, bounds, n)
+
+        result = self._rerank(cell, lat, lon, n, radius_km)
+        if result is None:
+            with self._lock:
+                self.uncertain += 1
+            return self._query(index, lat, lon, n, radius_km)
+        return result
+
+    def _query(self, index, lat, lon, n, radius_km):
+        if radius_km is not None:
+            positions, distances = index.within_radius(lat, lon, radius_km)
+            return positions[:n], distances[:n], None
+        positions, distances = index.k_nearest(lat, lon, n)
+        return positions, distances, None
+
+    def _store(self, view, key, bounds, n):
+        index = view.index
+        lat_lo, lat_hi, lon_lo, lon_hi = bounds
+        lat, lon = (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+        want = n + self.extra
+        positions, distances = index.k_nearest(lat, lon, want)
+        complete = len(positions) < want or len(positions) == len(index)
+        bound = np.inf if complete else float(distances[-1])
+        if not complete:
+            # Drop candidates tied with the farthest one: a pub that was not
+            # stored may sit at exactly that distance too
+            keep = distances < bound
+            positions = positions[keep]
+        cell = _Cell(lat, lon, positions, index.lats[positions], index.lons[positions],
+                     view_rows(view, positions), bound, complete)
+
+        with self._lock:
+            cells = self._cells.get(index)
+            if cells is None:
+                cells = self._cells[index] = OrderedDict()
+            cells[key] = cell
+            while len(cells) > self.max_cells:
+                cells.popitem(last=False)
+        return cell
+
+    def _rerank(self, cell, lat, lon, n, radius_km):
+        distances = haversine_np(lon, lat, cell.lons, cell.lats)
+        # Same ordering as the spatial index: by distance, ties by position
+        order = np.lexsort((cell.positions, distances))
+        if radius_km is not None:
+            order = order[distances[order] <= radius_km]
+        order = order[:n]
+        positions, distances = cell.positions[order], distances[order]
+        rows = [cell.rows[i] for i in order.tolist()]
+
+        if cell.complete:
+            return positions, distances, rows
+        # Distance beyond which a pub that was not stored could be
+        # (less a nanometre of slack for floating point rounding)
+        safe = cell.bound - haversine(lon, lat, cell.lon, cell.lat) - 1e-12
+        if len(positions) == n and distances[-1] < safe:
+            return positions, distances, rows
+        if radius_km is not None and radius_km < safe:
+            return positions, distances, rows
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+
+    def stats(self):
+        with self._lock:
+            cells = sum(len(entries) for entries in self._cells.values())
+            hits, misses, uncertain = self.hits, self.misses, self.uncertain
+        lookups = hits + misses
+        return {
+            "cells": cells,
+            "hits": hits,
+            "misses": misses,
+            "uncertain": uncertain,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+def top_pubs_cache_from_env():
+    """
+    Build the nearest-pub cache from environment variables
+
+    TOP_PUBS_CACHE_PRECISION: Geohash length of a cell; 0 turns the cache off
+    TOP_PUBS_CACHE_EXTRA: Candidates stored beyond n per cell
+    TOP_PUBS_CACHE_SIZE: Maximum number of cells per catalogue view
+    """
+    return TopPubsCache(
+        precision=int(os.environ.get("TOP_PUBS_CACHE_PRECISION", 7)),
+        extra=int(os.environ.get("TOP_PUBS_CACHE_EXTRA", 16)),
+        max_cells=int(os.environ.get("TOP_PUBS_CACHE_SIZE", 10000)),
+    )
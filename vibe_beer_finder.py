@@ -1,256 +1,681 @@
-from flask import Flask, render_template, request, jsonify
-import folium
-from folium.plugins import MarkerCluster
-import json
-from datasets import load_dataset
-import pandas as pd
-from math import radians, cos, sin, asin, sqrt
+from flask import Flask, render_template, request, jsonify, url_for
+from flask.json.provider import DefaultJSONProvider
+from markupsafe import escape
+import hmac
+import numpy as np
 import os
+from functools import wraps
 from dotenv import load_dotenv
-import google.generativeai as genai
+import fast_json
+from crawl_planner import plan_crawl
+from geo import haversine_matrix, smallest_k
+from llm_client import CircuitOpen, client_from_env
+from llm_executor import LLMBusy, LLMTimeout
+from metrics import metrics
+from opening_hours import local_now, next_arrival
+from osm_changes import parse_osm_change
+from pub_catalogue import ShardedCatalogue, view_rows
+from pub_ingest import CATEGORIES, CATEGORY_NOUNS, parse_categories
+from pub_names import UNNAMED_FORMAT
+from pub_record import PubRecord, parse_fields, pubs_payload
+from single_flight import SingleFlight
+from timetable import LazyTimetable
+from top_pubs_cache import top_pubs_cache_from_env
+from vibe_cache import cache_from_env, vibe_cache_key
+from vibe_profiles import DEFAULT_CONFIDENCE_MARGIN
+from walking_graph import walking_ranker_from_env
+
+class PubJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serialises pub records as their dictionaries, with orjson when installed"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, PubRecord):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+    
+    def dumps(self, obj, **kwargs):
+        # Pretty-printed debug output keeps the standard encoder; compact responses take the fast path
+        if kwargs.get("indent"):
+            return super().dumps(obj, **kwargs)
+        return fast_json.dumps(obj, default=self.default, sort_keys=kwargs.get("sort_keys", self.sort_keys))
 
 # Load environment variables
 load_dotenv()
 
-# Configure Google AI API
-api_key = os.environ.get("GOOGLE_API_KEY")
-if not api_key:
-    print("Warning: GOOGLE_API_KEY environment variable not set. Vibe matching will not work.")
-else:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-2.0-flash")
+# Shared LLM client (Gemini by default, LLM_PROVIDER=openrouter for OpenRouter):
+# bounded pool, per-call deadline, jittered retries and a circuit breaker
+llm_client = client_from_env()
+if not llm_client.available:
+    print("Warning: no LLM API key set (GOOGLE_API_KEY, or OPENROUTER_API_KEY with LLM_PROVIDER=openrouter). "
+          "Vibe matching will use local vibe profiles only.")
 
 app = Flask(__name__)
+app.json = PubJSONProvider(app)
 
-def find_pubs(dataset_name="ns2agi/antwerp-osm-navigator"):
-    """Load and filter pub data from the dataset"""
-    # Load the dataset
-    dataset = load_dataset(dataset_name)["train"]
-    
-    # Function to parse tags and check for pubs
-    def is_pub(example):
-        try:
-            tags = json.loads(example["tags"]) if example["tags"] != '{}' else {}
-            return tags.get("amenity") == "pub"
-        except:
-            return False
-    
-    # Filter for pubs
-    pub_data = dataset.filter(is_pub)
-    print(f"Found {len(pub_data)} pubs in Antwerp")
-    
-    # Convert to pandas DataFrame
-    pub_df = pub_data.to_pandas()
-    
-    # Parse tags properly
-    pub_df["tags"] = pub_df["tags"].apply(lambda x: json.loads(x) if x != '{}' else {})
-    
-    return pub_df
+# When to ask the LLM: "fallback" (only for low-confidence local matches), "always" or "never"
+VIBE_LLM_MODE = os.environ.get("VIBE_LLM_MODE", "fallback").lower()
+VIBE_CONFIDENCE_MARGIN = float(os.environ.get("VIBE_CONFIDENCE_MARGIN", DEFAULT_CONFIDENCE_MARGIN))
+
+# Shared cache of vibe-match answers (None when VIBE_CACHE_BACKEND=none)
+vibe_cache = cache_from_env()
+
+# Nearest-pub candidates per geohash cell, invalidated with the catalogue view
+top_pubs_cache = top_pubs_cache_from_env()
+
+# Nearest pubs considered per result when only open pubs are wanted
+OPEN_FILTER_CANDIDATES = int(os.environ.get("OPEN_FILTER_CANDIDATES", 4))
+
+# Re-ranks nearest pubs by walking distance over the precomputed OSM street
+# graph (None when no graph was built: straight-line order as before)
+walking_ranker = walking_ranker_from_env()
+
+# Identical vibe matches that are in flight at the same time share one LLM call.
+# Followers never wait longer than a leader's LLM deadline (plus a margin).
+vibe_flights = SingleFlight(wait_timeout=llm_client.executor.timeout + 1)
+
+# Meetup timetables shared by everyone at a pub, with live updates for open pages.
+# Opened on first use, not at import (and so after a pre-forking server forks)
+timetables = LazyTimetable()
 
-def haversine(lon1, lat1, lon2, lat2):
+# Seconds between keep-alive comments on an idle timetable stream
+TIMETABLE_HEARTBEAT_SECONDS = float(os.environ.get("TIMETABLE_HEARTBEAT_SECONDS", 15))
+
+# Region/category-sharded place tables shared by every request; each shard is
+# built once, the first time a query needs it
+catalogue = ShardedCatalogue()
+
+# Under a WSGI server there is no __main__, so start warming the catalogue on import
+if os.environ.get("PUB_CATALOGUE_PRELOAD", "1") == "1":
+    catalogue.load_in_background()
+
+def locate_nearest_pubs(location, n=5, radius_km=None, view=None):
     """
-    Calculate the great circle distance between two points 
-    on the earth (specified in decimal degrees)
+    Find the positions of the n nearest pubs to the given location
+    
+    Args:
+        location (list): [latitude, longitude]
+        n (int): Number of pubs to return
+        radius_km (float, optional): Only return pubs within this distance
+        view (CatalogueView, optional): Catalogue view to search; defaults to
+            the shards covering the location for the default categories
+        
+    Returns:
+        tuple: (view, positions in view.pub_df, distances in km, rows), nearest
+            first; rows are the view_rows of the positions, or None when
+            they were not cached
     """
-    # Convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    # Get the pubs and their spatial index from the shards covering the location
+    if view is None:
+        with metrics.timer("catalogue_lookup"):
+            view = catalogue.view_for([location])
+    index = view.index
+    
+    # Query the spatial index instead of scanning every pub
+    user_lat, user_lon = location
+    with metrics.timer("nearest_search"):
+        # Served from the per-cell candidate cache when it is provably exact
+        positions, distances, rows = top_pubs_cache.nearest(view, user_lat, user_lon, n, radius_km)
+        if radius_km is None and len(positions) < n and len(index.missing):
+            # Pubs without coordinates are infinitely far away but still count
+            missing = index.missing[:n - len(positions)]
+            positions = np.concatenate((positions, missing))
+            distances = np.concatenate((distances, np.full(len(missing), np.inf)))
+            if rows is not None:
+                rows = rows + view_rows(view, missing)
     
-    # Haversine formula
-    dlon = lon2 - lon1 
-    dlat = lat2 - lat1 
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a)) 
-    r = 6371  # Radius of earth in kilometers
-    return c * r
+    return view, positions, distances, rows
 
-def find_nearest_pubs(location, n=5):
+def find_nearest_pubs(location, n=5, radius_km=None, view=None):
     """
     Find the n nearest pubs to the given location
     
     Args:
         location (list): [latitude, longitude]
         n (int): Number of pubs to return
+        radius_km (float, optional): Only return pubs within this distance
+        view (CatalogueView, optional): Catalogue view to search; defaults to
+            the shards covering the location for the default categories
         
     Returns:
         DataFrame: Top n nearest pubs
     """
-    # Get all pubs
-    pub_df = find_pubs()
-    
-    # Calculate distance for each pub
-    user_lat, user_lon = location
-    pub_df['distance'] = pub_df.apply(
-        lambda row: haversine(user_lon, user_lat, row['lon'], row['lat']) 
-        if pd.notnull(row['lat']) and pd.notnull(row['lon']) else float('inf'), 
-        axis=1
-    )
-    
-    # Sort by distance and get top n
-    nearest_pubs = pub_df.sort_values('distance').head(n)
-    
+    view, positions, distances, _ = locate_nearest_pubs(location, n, radius_km, view)
+    nearest_pubs = view.pub_df.iloc[positions].copy()
+    nearest_pubs['distance'] = distances
     return nearest_pubs
 
-def get_top_pubs(location, n=5):
+def get_top_pubs(location, n=5, radius_km=None, view=None, open_at=None):
     """
     Returns the top n nearest pubs to the given location as a list of dictionaries
     
     Args:
         location (list): [latitude, longitude]
         n (int): Number of pubs to return
+        radius_km (float, optional): Only return pubs within this distance
+        view (CatalogueView, optional): Catalogue view to search
+        open_at (datetime, optional): Only return pubs open at this local
+            time (pubs with unknown opening hours are kept); the search
+            widens until n of them are found
         
     Returns:
-        list: List of dictionaries, each containing pub details (including name and distance)
+        list: List of dictionaries, each containing pub details (including name
+            and distance, plus walking_distance in km when ranked on foot and
+            opening_status when filtered by open_at)
+    """
+    # Closed pubs are dropped from a larger candidate set
+    fetch = n * OPEN_FILTER_CANDIDATES if open_at is not None else n
+    # With a walking graph, fetch extra straight-line candidates and keep the
+    # n nearest on foot (a pub across the river may be far to walk to)
+    if walking_ranker is not None:
+        fetch = max(fetch, walking_ranker.candidate_count(n))
+    while True:
+        view, positions, distances, rows = locate_nearest_pubs(location, fetch, radius_km, view)
+        complete = len(positions) < fetch
+        if open_at is None or not len(positions):
+            break
+        with metrics.timer("open_filter"):
+            # A bit test per candidate against the bitmaps built with the catalogue
+            keep = view.hours.open_at(positions, open_at)
+        # At night most nearby pubs are closed: look further out until n open
+        # ones are found or there are no more pubs (in the radius) to look at
+        if int(keep.sum()) >= n or complete:
+            positions, distances = positions[keep], distances[keep]
+            if rows is not None:
+                rows = [row for row, kept in zip(rows, keep.tolist()) if kept]
+            break
+        fetch *= max(OPEN_FILTER_CANDIDATES, 2)
+    
+    walking = None
+    if walking_ranker is not None and len(positions):
+        with metrics.timer("walking_rank"):
+            ranked = walking_ranker.rank(view, location[0], location[1], positions, distances, n, complete)
+        if ranked is not None:
+            order, walking = ranked
+            positions, distances, walking = positions[order], distances[order], walking[order].tolist()
+            if rows is not None:
+                rows = [rows[i] for i in order.tolist()]
+    positions, distances = positions[:n], distances[:n]
+    if rows is not None:
+        rows = rows[:n]
+    
+    with metrics.timer("pub_dicts"):
+        # Cache hits carry their rows already; no DataFrame copy either way
+        if rows is None:
+            rows = view_rows(view, positions)
+        pub_list = make_pub_records(rows, distances.tolist())
+        if walking is not None:
+            for pub, km in zip(pub_list, walking):
+                if km != float('inf'):
+                    pub["walking_distance"] = round(km, 3)
+        if open_at is not None:
+            known = view.hours.known[positions].tolist()
+            for pub, is_known in zip(pub_list, known):
+                pub["opening_status"] = "open" if is_known else "unknown"
+        return pub_list
+
+def parse_open_at(open_now=None, arrival=None):
     """
-    nearest_pubs = find_nearest_pubs(location, n)
+    The local time results have to be open at, from request parameters
     
-    # Create a list of pub information
+    Args:
+        open_now: Truthy ("1", "true", "yes", True) to ask for pubs open now
+        arrival (str, optional): HH:MM arrival time; the next time the clock
+            shows it (today, or tomorrow if it has passed)
+        
+    Returns:
+        datetime: The moment to filter on, or None for no filter
+        
+    Raises:
+        ValueError: If arrival is not HH:MM
+    """
+    if arrival:
+        return next_arrival(arrival)
+    if str(open_now or "").lower() in ("1", "true", "yes", "on"):
+        return local_now()
+    return None
+
+def build_pub_list(nearest_pubs):
+    """
+    Turn a DataFrame of pubs with a distance column into a list of pub records
+    
+    Args:
+        nearest_pubs (DataFrame): Pubs with id, lat, lon, tags and distance columns
+        
+    Returns:
+        list: PubRecord per pub (name, distance, coordinates, id, category and
+            its tags, which are shared with the catalogue rather than copied)
+    """
+    categories = (nearest_pubs['category'] if 'category' in nearest_pubs
+                  else ['pub'] * len(nearest_pubs))
+    
+    types = nearest_pubs['type'] if 'type' in nearest_pubs else ['node'] * len(nearest_pubs)
+    
+    # Read the columns once instead of materialising a Series per row
+    rows = zip(
+        nearest_pubs['id'].tolist(),
+        nearest_pubs['lat'].to_numpy(dtype=float, na_value=float('nan')).tolist(),
+        nearest_pubs['lon'].to_numpy(dtype=float, na_value=float('nan')).tolist(),
+        nearest_pubs['tags'],
+        categories,
+        types,
+    )
+    return make_pub_records(rows, nearest_pubs['distance'].to_numpy(dtype=float).tolist())
+
+def make_pub_records(rows, distances):
+    """
+    Build PubRecords from table rows and their distances
+    
+    Args:
+        rows (iterable): (id, lat, lon, tags, category, type) tuples, as from view_rows
+        distances (list): Distance in km of each row
+        
+    Returns:
+        list: PubRecord per row
+    """
     pub_list = []
-    for idx, pub in nearest_pubs.iterrows():
+    for (pub_id, lat, lon, tags, category, pub_type), distance in zip(rows, distances):
+        tags = tags or {}
         # Get the pub name if available, otherwise use the ID
-        pub_name = pub["tags"].get("name", f"Unnamed Pub (ID: {pub['id']})")
+        pub_name = tags.get("name", UNNAMED_FORMAT.format(pub_id))
+        pub_list.append(PubRecord(pub_id, pub_name, lat, lon, distance, category, tags, pub_type))
+    
+    return pub_list
+
+def find_nearest_pubs_batch(locations, ns, views=None):
+    """
+    Find the nearest pubs for many locations with one distance matrix per catalogue view
+    
+    Args:
+        locations (list): List of [latitude, longitude] pairs
+        ns (list): Number of pubs to return for each location
+        views (list, optional): Catalogue view for each location; defaults to
+            the shards covering each location
         
-        # Create dictionary with pub details
-        pub_details = {
-            "name": pub_name,
-            "distance": f"{pub['distance']:.2f} km",
-            "distance_value": pub['distance'],
-            "coordinates": [pub['lat'], pub['lon']],
-            "id": pub['id']
-        }
+    Returns:
+        list: One list of pub dictionaries per location, in the same order
+    """
+    if views is None:
+        views = [catalogue.view_for([loc]) for loc in locations]
+    
+    # Locations served by the same view share one distance matrix
+    groups = {}
+    for i, view in enumerate(views):
+        groups.setdefault(id(view), (view, []))[1].append(i)
+    
+    results = [None] * len(locations)
+    for view, members in groups.values():
+        pub_df = view.pub_df
+        lats = np.array([locations[i][0] for i in members], dtype=float)
+        lons = np.array([locations[i][1] for i in members], dtype=float)
         
-        # Add additional info from tags if available
-        if pub["tags"]:
-            for k, v in pub["tags"].items():
-                if k != "name":  # Skip name as we already included it above
-                    pub_details[k] = v
+        # All location-to-pub distances in a single vectorized computation
+        distances = haversine_matrix(
+            lons, lats,
+            pub_df['lon'].to_numpy(dtype=float, na_value=float('nan')),
+            pub_df['lat'].to_numpy(dtype=float, na_value=float('nan')),
+        )
         
-        pub_list.append(pub_details)
+        for i, row in zip(members, distances):
+            top = smallest_k(row, ns[i])
+            nearest_pubs = pub_df.iloc[top].copy()
+            nearest_pubs['distance'] = row[top]
+            results[i] = build_pub_list(nearest_pubs)
+    return results
+
+def find_central_pubs(locations, n=5, objective="total", view=None):
+    """
+    Find the pubs that are the fairest meeting point for a group
     
+    Args:
+        locations (list): List of [latitude, longitude] pairs, one per participant
+        n (int): Number of pubs to return
+        objective (str): "total" minimises the summed distance of everyone,
+            "max" minimises the distance of the participant who is furthest away
+        view (CatalogueView, optional): Catalogue view to search; defaults to
+            the shards covering any participant
+        
+    Returns:
+        list: Pub dictionaries, best first, each with the per-participant
+            distances and the total and max distance added
+    """
+    if objective not in ("total", "max"):
+        raise ValueError(f"Unknown objective '{objective}', expected 'total' or 'max'")
+    
+    if view is None:
+        view = catalogue.view_for(locations)
+    pub_df = view.pub_df
+    distances = haversine_matrix(
+        [loc[1] for loc in locations], [loc[0] for loc in locations],
+        pub_df['lon'].to_numpy(dtype=float, na_value=float('nan')),
+        pub_df['lat'].to_numpy(dtype=float, na_value=float('nan')),
+    )
+    total = distances.sum(axis=0)
+    furthest = distances.max(axis=0)
+    
+    top = smallest_k(total if objective == "total" else furthest, n)
+    central_pubs = pub_df.iloc[top].copy()
+    # Report the distance of the furthest participant as the pub's distance
+    central_pubs['distance'] = furthest[top]
+    
+    pub_list = build_pub_list(central_pubs)
+    for pub, column in zip(pub_list, top):
+        pub["participant_distances"] = [round(float(d), 3) for d in distances[:, column]]
+        pub["total_distance"] = float(total[column])
+        pub["max_distance"] = float(furthest[column])
     return pub_list
 
-def generate_vibe_match(vibe, pub_list):
+def plan_pub_crawl(location, stops=4, vibe=None, radius_km=None, view=None, round_trip=False, open_at=None):
+    """
+    Pick pubs for a crawl and the order to visit them in
+    
+    The nearest CRAWL_CANDIDATES x stops pubs are scored against the vibe with
+    the local vibe profiles (no LLM call, so a crawl costs no more than a
+    search); the best `stops` of them are visited in the shortest order
+    crawl_planner finds within its time budget.
+    
+    Args:
+        location (list): Start [latitude, longitude]
+        stops (int): Number of pubs to visit
+        vibe (str, optional): Vibe to pick the pubs by; nearest pubs without one
+        radius_km (float, optional): Only consider pubs within this distance
+        view (CatalogueView, optional): Catalogue view to search
+        round_trip (bool): End the crawl back at the start
+        open_at (datetime, optional): Only visit pubs open at this local time
+        
+    Returns:
+        dict: "stops" (pubs in visiting order, each with its stop number and
+            leg_distance), "legs" (km per leg), "total_distance",
+            "method" and "geometry" (GeoJSON LineString from the start)
+    """
+    pool = get_top_pubs(location, n=max(stops * CRAWL_CANDIDATES, stops), radius_km=radius_km, view=view,
+                        open_at=open_at)
+    pool = [pub for pub in pool if np.isfinite(pub.distance_value)]
+    
+    if vibe and pool:
+        view = view or catalogue.view()
+        profiles = view.profiles
+        rows = view.positions_of(pool)
+        scores = profiles.rank(vibe, rows)["scores"]
+        # Best vibe first; on equal scores the closer pub wins
+        ranked = sorted(range(len(pool)), key=lambda i: (-scores[i], i))
+        chosen = [pool[i] for i in ranked[:stops]]
+        for i in ranked[:stops]:
+            pool[i]["explanation"] = profiles.explain(vibe, rows[i])
+    else:
+        chosen = pool[:stops]
+    
+    with metrics.timer("crawl_route"):
+        lats = [location[0]] + [pub.lat for pub in chosen]
+        lons = [location[1]] + [pub.lon for pub in chosen]
+        matrix = haversine_matrix(lons, lats, lons, lats)
+        order, method = plan_crawl(matrix, round_trip)
+    
+    path = [0] + order + ([0] if round_trip else [])
+    legs = [float(matrix[a, b]) for a, b in zip(path, path[1:])]
+    route = []
+    for number, (stop, leg) in enumerate(zip(order, legs), start=1):
+        pub = chosen[stop - 1]
+        pub["stop"] = number
+        pub["leg_distance"] = round(leg, 3)
+        route.append(pub)
+    
+    return {
+        "stops": route,
+        "legs": [round(leg, 3) for leg in legs],
+        "total_distance": round(sum(legs), 3),
+        "round_trip": round_trip,
+        "method": method,
+        "geometry": {"type": "LineString", "coordinates": [[lons[i], lats[i]] for i in path]},
+    }
+
+def local_vibe_match(vibe, pub_list, view=None):
     """
-    Use Google's Gemini model to find the pub that best matches the desired vibe
+    Rank the candidate pubs against the vibe using only the local vibe profiles
+    
+    Works without network access or an API key. The pub dictionaries are not
+    modified.
     
     Args:
         vibe (str): The vibe the user is looking for
         pub_list (list): List of pub dictionaries
+        view (CatalogueView, optional): The view the pubs came from
+        
+    Returns:
+        tuple: (best matching pub, explanation, confidence)
+    """
+    view = view or catalogue.view()
+    candidates = pub_list[:5]
+    rows = view.positions_of(candidates)
+    ranking = view.profiles.rank(vibe, rows)
+    
+    selected = candidates[ranking["best"]]
+    return selected, view.profiles.explain(vibe, rows[ranking["best"]]), round(ranking["confidence"], 3)
+
+def describe_places(view, pub_list):
+    """Plural noun and place name for the prompt, e.g. ("pubs", "Antwerp")"""
+    categories = {pub.get("category", "pub") for pub in pub_list}
+    noun = CATEGORY_NOUNS[categories.pop()] if len(categories) == 1 else "places"
+    place = " and ".join(region.label for region in view.regions) if view.regions else "Antwerp"
+    return noun, place
+
+def generate_vibe_match(vibe, pub_list, view=None):
+    """
+    Find the pub that best matches the desired vibe
+    
+    The candidates are ranked locally first. The LLM (Gemini by default) is only
+    asked when the local ranking is not confident (VIBE_LLM_MODE=fallback,
+    the default), on every request (VIBE_LLM_MODE=always) or never
+    (VIBE_LLM_MODE=never, or when no API key is set). When the LLM fails,
+    times out or its circuit breaker is open, the local match is returned.
+    
+    Args:
+        vibe (str): The vibe the user is looking for
+        pub_list (list): List of pub dictionaries
+        view (CatalogueView, optional): The view the pubs came from
         
     Returns:
         dict: The pub that best matches the vibe, with an added explanation
     """
-    if not api_key:
-        # If no API key, just return the first pub with a placeholder message
-        pub_list[0]["explanation"] = "API key not set. Unable to match vibe."
-        return pub_list[0]
+    view = view or catalogue.view()
+    
+    # Rank the candidates locally from their precomputed vibe profiles first
+    local_pub, local_explanation, confidence = local_vibe_match(vibe, pub_list, view)
+    
+    # Without the LLM, or with a confident local answer, the local ranking is the answer
+    if (not llm_client.available or VIBE_LLM_MODE == "never"
+            or (VIBE_LLM_MODE == "fallback" and confidence >= VIBE_CONFIDENCE_MARGIN)):
+        local_pub["explanation"] = local_explanation
+        local_pub["vibe_confidence"] = confidence
+        metrics.inc("vibe_match", source="local")
+        return local_pub
+    
+    # Same vibe and same candidate pubs give the same answer, so skip the LLM on a hit
+    cache_key = vibe_cache_key(vibe, [(pub.osm_type, pub.id) for pub in pub_list[:5]])
+    cached = vibe_cache.get(cache_key) if vibe_cache else None
+    selected = apply_cached_vibe_match(pub_list, cached) if cached else None
+    if selected is not None:
+        metrics.inc("vibe_match", source="cache")
+        return selected
+    
+    try:
+        # Concurrent requests with the same vibe and candidates share one LLM call
+        result, shared = vibe_flights.do(cache_key, lambda: ask_llm_vibe_match(vibe, pub_list, view, cache_key))
+        if shared:
+            metrics.inc("vibe_match", source="coalesced")
+        selected = apply_cached_vibe_match(pub_list, result)
+        if selected is not None:
+            return selected
+        
+    except Exception as e:
+        metrics.inc("llm_error", reason=(
+            "timeout" if isinstance(e, (LLMTimeout, TimeoutError)) else "busy" if isinstance(e, LLMBusy)
+            else "circuit_open" if isinstance(e, CircuitOpen) else "error"))
+        metrics.inc("vibe_match", source="fallback")
+        # In case of any error, fall back to the local match with error info
+        local_pub["explanation"] = local_explanation
+        local_pub["note"] = f"Error matching vibe: {str(e)}"
+        return local_pub
+    
+    # The answer names none of these pubs: keep the local match
+    local_pub["explanation"] = local_explanation
+    local_pub["vibe_confidence"] = confidence
+    return local_pub
+
+def ask_llm_vibe_match(vibe, pub_list, view, cache_key=None):
+    """
+    Ask the LLM which candidate pub matches the vibe
     
+    Args:
+        vibe (str): The vibe the user is looking for
+        pub_list (list): List of pub dictionaries; the first 5 are candidates
+        view (CatalogueView): The view the pubs came from
+        cache_key (str, optional): Vibe cache key to store the answer under
+        
+    Returns:
+        dict: pub_id, pub_type, explanation and (when the answer could not be
+            matched to a candidate) note, as stored in the vibe cache
+    """
     pub_names = [pub["name"] for pub in pub_list[:5]]
+    noun, place = describe_places(view, pub_list[:5])
     
-    prompt = f"""Given the vibe: '{vibe}'. With these 5 pubs located in Antwerp: {pub_names} that are closest to me.
+    prompt = f"""Given the vibe: '{vibe}'. With these {len(pub_names)} {noun} located in {place}: {pub_names} that are closest to me.
     
-    1. Which ONE pub best matches the '{vibe}' vibe? Just give me the name.
-    2. Also provide a brief explanation for why this pub matches the vibe.
+    1. Which ONE of them best matches the '{vibe}' vibe? Just give me the name.
+    2. Also provide a brief explanation for why this place matches the vibe.
     
     Format your response as:
-    PUB NAME: [name of the selected pub]
+    PUB NAME: [name of the selected place]
     EXPLANATION: [your explanation]
     """
     
-    try:
-        response = model.generate_content(prompt)
-        response_text = response.text
-        
-        # Parse the response to extract the pub name and explanation
-        lines = response_text.strip().split("\n")
-        selected_pub_name = None
-        explanation = ""
-        
-        for line in lines:
-            if line.startswith("PUB NAME:"):
-                selected_pub_name = line.replace("PUB NAME:", "").strip()
-            elif line.startswith("EXPLANATION:"):
-                explanation = line.replace("EXPLANATION:", "").strip()
-            # Collect additional explanation lines
-            elif selected_pub_name and not line.startswith("PUB NAME:"):
-                explanation += " " + line.strip()
-                
-        # Find the matching pub from our list
-        for pub in pub_list:
-            if selected_pub_name and selected_pub_name in pub["name"]:
-                pub["explanation"] = explanation
-                return pub
-        
-        # If we couldn't find a match, return the first pub with the explanation
-        pub_list[0]["explanation"] = explanation if explanation else "No explanation provided by AI"
-        pub_list[0]["note"] = f"AI suggested '{selected_pub_name}' but it couldn't be matched to our data"
-        return pub_list[0]
+    # Bounded pool + deadline + breaker: a slow or failing LLM cannot hold this worker
+    with metrics.timer("llm_call"):
+        response_text = llm_client.generate(prompt)
+    
+    # Parse the response to extract the pub name and explanation
+    lines = response_text.strip().split("\n")
+    selected_pub_name = None
+    explanation = ""
+    
+    for line in lines:
+        if line.startswith("PUB NAME:"):
+            selected_pub_name = line.replace("PUB NAME:", "").strip()
+        elif line.startswith("EXPLANATION:"):
+            explanation = line.replace("EXPLANATION:", "").strip()
+        # Collect additional explanation lines
+        elif selected_pub_name and not line.startswith("PUB NAME:"):
+            explanation += " " + line.strip()
+    
+    # Resolve the name against the candidates it was given: accents, case,
+    # punctuation, extra words ("Café ...") and small typos do not matter
+    candidates = pub_list[:5]
+    match, _ = view.names.best_match(selected_pub_name, view.positions_of(candidates),
+                                     [pub.id for pub in candidates])
+    if match is not None:
+        result = {"pub_id": str(candidates[match].id), "pub_type": candidates[match].osm_type,
+                  "explanation": explanation}
+        metrics.inc("vibe_match", source="llm")
+    else:
+        # Not one of the candidates: keep the local ranking's pick rather than
+        # whichever pub happens to be first, and say so
+        local_pub, local_explanation, _ = local_vibe_match(vibe, pub_list, view)
+        result = {
+            "pub_id": str(local_pub.id),
+            "pub_type": local_pub.osm_type,
+            "explanation": local_explanation,
+            "note": f"AI suggested '{selected_pub_name}' but it couldn't be matched to our data",
+        }
+        metrics.inc("vibe_match", source="llm_unmatched")
+    
+    if vibe_cache and cache_key:
+        vibe_cache.set(cache_key, result)
+    return result
+
+def apply_cached_vibe_match(pub_list, cached):
+    """
+    Apply a cached vibe-match result to the current list of pub dictionaries
+    
+    Args:
+        pub_list (list): List of pub dictionaries
+        cached (dict): Cached result with pub_id, pub_type, explanation and optional note
         
-    except Exception as e:
-        # In case of any error, return the first pub with error info
-        pub_list[0]["explanation"] = f"Error matching vibe: {str(e)}"
-        return pub_list[0]
+    Returns:
+        dict: The matching pub from pub_list, with the explanation added, or
+            None if the result names none of them (treat it as a cache miss)
+    """
+    selected = next((pub for pub in pub_list if str(pub.id) == cached["pub_id"]
+                     and pub.osm_type == cached["pub_type"]), None)
+    if selected is None:
+        return None
+    selected["explanation"] = cached["explanation"]
+    if cached.get("note"):
+        selected["note"] = cached["note"]
+    return selected
 
-def create_pub_map(pub_list, user_location, selected_pub=None):
+def create_pub_map(pub_list, user_location, selected_pub=None, view=None):
     """
-    Create an interactive map with pubs and highlight the selected one
+    Describe an interactive map with pubs and highlight the selected one
+    
+    The base layer with every pub's marker is pre-rendered once per catalogue
+    load and fetched (and cached) by the browser from /api/map/markers; this
+    only describes what is specific to the request: the user marker and the
+    nearby pubs with their distance, highlighting the selected one.
     
     Args:
         pub_list (list): List of pub dictionaries
         user_location (list): [latitude, longitude] of the user
         selected_pub (dict, optional): The pub selected for the user's vibe
+        view (CatalogueView, optional): The view the pubs came from
         
     Returns:
-        str: Filename of saved HTML map
+        dict: JSON-serialisable map data (center, zoom, user marker, nearby pubs, base layer URL)
     """
-    # Create map centered on user location
-    m = folium.Map(location=user_location, zoom_start=15)
-    
-    # Add user location marker
-    folium.Marker(
-        location=user_location,
-        popup="Your Location",
-        icon=folium.Icon(color="red", icon="user", prefix="fa")
-    ).add_to(m)
+    view = view or catalogue.view()
+    markers = view.markers
     
-    # Create marker cluster for better performance with many markers
-    marker_cluster = MarkerCluster().add_to(m)
-    
-    # Add each pub to the map
+    nearby = []
     for pub in pub_list:
-        # Extract coordinates
+        # Extract coordinates; pubs without a location cannot be drawn
         lat, lon = pub["coordinates"]
+        if lat != lat or lon != lon:  # NaN check
+            continue
         
         # Determine if this is the selected pub
-        is_selected = selected_pub and pub["id"] == selected_pub["id"]
+        is_selected = bool(selected_pub) and pub["id"] == selected_pub["id"]
         
-        # Create popup with pub info
-        popup_text = f"<b>Name:</b> {pub['name']}<br>"
-        popup_text += f"<b>Distance:</b> {pub['distance']}<br>"
+        # Only name, distance and explanation are per request; OSM values are escaped
+        popup_text = f"<b>Name:</b> {escape(pub['name'])}<br>"
+        popup_text += f"<b>Distance:</b> {escape(pub['distance'])}<br>"
         
         # Add explanation if this is the selected pub
         if is_selected and "explanation" in pub:
-            popup_text += f"<b>Matches Your Vibe:</b> {pub['explanation']}<br>"
-        
-        # Add other available info
-        for k, v in pub.items():
-            if k not in ["name", "distance", "distance_value", "coordinates", "id", "explanation", "note"]:
-                popup_text += f"<b>{k}:</b> {v}<br>"
+            popup_text += f"<b>Matches Your Vibe:</b> {escape(pub['explanation'])}<br>"
         
-        # Use different icon for selected pub
-        icon_color = "blue" if is_selected else "green"
+        # Tag lines were rendered once when the catalogue loaded
+        tags_popup = markers.tags_popup(view.position_of(pub.osm_type, pub.id))
+        if tags_popup is None:
+            tags_popup = "".join(
+                f"<b>{escape(k)}:</b> {escape(v)}<br>" for k, v in pub.tags.items() if k != "name"
+            )
+        popup_text += tags_popup
         
-        folium.Marker(
-            location=[lat, lon],
-            popup=popup_text,
-            icon=folium.Icon(color=icon_color, icon="beer", prefix="fa")
-        ).add_to(marker_cluster)
-    
-    # Save map to static folder
-    map_file = "static/pub_map.html"
-    os.makedirs(os.path.dirname(map_file), exist_ok=True)
-    m.save(map_file)
+        nearby.append({
+            "id": str(pub["id"]),
+            "coordinates": [float(lat), float(lon)],
+            "popup": popup_text,
+            "selected": is_selected,
+        })
     
-    return "pub_map.html"
+    return {
+        "center": [float(c) for c in user_location],
+        "zoom": 15,
+        "user": {"coordinates": [float(c) for c in user_location], "popup": "Your Location"},
+        "pubs": nearby,
+        "markers_url": url_for('get_map_markers', v=markers.etag[:12],
+                               regions=",".join(region.name for region in view.regions) or None,
+                               categories=",".join(view.categories) or None),
+    }
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -260,64 +685,478 @@ def index():
             latitude = float(request.form.get('latitude'))
             longitude = float(request.form.get('longitude'))
             vibe = request.form.get('vibe')
+            categories = parse_categories(request.form.getlist('categories'), catalogue.default_categories)
+            open_at = parse_open_at(request.form.get('open_now'))
             
-            # Get nearby pubs
-            location = [latitude, longitude]
-            pub_list = get_top_pubs(location)
-            
-            if not pub_list:
-                return render_template('error.html', 
-                                    message="No pubs found in this area.")
-            
-            # Find the pub that matches the vibe
-            vibe_match = generate_vibe_match(vibe, pub_list)
-            
-            # Create the map
-            map_file = create_pub_map(pub_list, location, vibe_match)
-            
-            return render_template('results.html', 
-                                latitude=latitude, 
-                                longitude=longitude, 
-                                vibe=vibe,
-                                pub_list=pub_list,
-                                vibe_match=vibe_match,
-                                map_file=map_file)
+            with metrics.request_timer("index"):
+                # Get nearby pubs from the shards covering the location
+                location = [latitude, longitude]
+                with metrics.timer("catalogue_lookup"):
+                    view = catalogue.view_for([location], categories)
+                pub_list = get_top_pubs(location, view=view, open_at=open_at)
+                
+                if not pub_list:
+                    return render_template('error.html', 
+                                        message="No open pubs found in this area." if open_at else "No pubs found in this area.")
+                
+                # Find the pub that matches the vibe
+                with metrics.timer("vibe_match"):
+                    vibe_match = generate_vibe_match(vibe, pub_list, view)
+                
+                # Describe the map; the page draws it client-side
+                with metrics.timer("create_pub_map"):
+                    map_data = create_pub_map(pub_list, location, vibe_match, view)
+                
+                with metrics.timer("render_template"):
+                    return render_template('results.html', 
+                                        latitude=latitude, 
+                                        longitude=longitude, 
+                                        vibe=vibe,
+                                        pub_list=pub_list,
+                                        vibe_match=vibe_match,
+                                        map_data=map_data)
         except Exception as e:
             return render_template('error.html', message=f"Error: {str(e)}")
             
-    return render_template('index.html')
+    return render_template('index.html', categories=CATEGORIES, default_categories=catalogue.default_categories)
 
 # Add a route to handle the case when the user wants to use their current location
 @app.route('/api/pubs', methods=['POST'])
 def get_pubs_api():
+    """
+    Nearest pubs and the vibe match as JSON
+    
+    Besides latitude, longitude, vibe, radius_km and categories, the body (or
+    the query string) may hold:
+        open_now: true to only return pubs that are open now
+        arrival: "HH:MM" to only return pubs that are open at that time
+        fields: keys to return per pub, e.g. "id,name,coordinates,distance_value"
+        format: "objects" (default) or "compact" (a "fields" header plus one
+            array of values per pub)
+        dedupe: true to return the vibe match as a reference to its pub (id,
+            index) plus the explanation instead of repeating the pub; always
+            on in the compact format
+    """
     try:
         data = request.json
         latitude = float(data.get('latitude'))
         longitude = float(data.get('longitude'))
         vibe = data.get('vibe')
+        radius_km = data.get('radius_km')
+        radius_km = float(radius_km) if radius_km is not None else None
+        categories = parse_categories(data.get('categories'), catalogue.default_categories)
+        fields = parse_fields(data.get('fields') or request.args.get('fields'))
+        response_format = data.get('format') or request.args.get('format') or "objects"
+        dedupe = str(data.get('dedupe') or request.args.get('dedupe') or "").lower() in ("1", "true", "yes")
+        open_at = parse_open_at(data.get('open_now') or request.args.get('open_now'),
+                                data.get('arrival') or request.args.get('arrival'))
         
-        location = [latitude, longitude]
-        pub_list = get_top_pubs(location)
+        with metrics.request_timer("api_pubs"):
+            location = [latitude, longitude]
+            with metrics.timer("catalogue_lookup"):
+                view = catalogue.view_for([location], categories)
+            pub_list = get_top_pubs(location, radius_km=radius_km, view=view, open_at=open_at)
+            
+            if not pub_list:
+                return jsonify({"error": "No open pubs found in this area." if open_at else "No pubs found in this area."})
+            
+            with metrics.timer("vibe_match"):
+                vibe_match = generate_vibe_match(vibe, pub_list, view)
+            
+            with metrics.timer("serialize"):
+                return jsonify(pubs_payload(pub_list, vibe_match, fields, response_format, dedupe))
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+# Upper bound on locations per batch call; keeps the distance matrix small
+MAX_BATCH_LOCATIONS = 100
+
+@app.route('/api/pubs/batch', methods=['POST'])
+def get_pubs_batch_api():
+    """
+    Nearest pubs for many locations in one call
+    
+    Expects JSON like:
+        {
+            "locations": [{"latitude": 51.22, "longitude": 4.40, "n": 5, "vibe": "cozy"}, ...],
+            "central": {"n": 5, "objective": "total", "vibe": "lively"},   (optional)
+            "categories": ["pub", "bar"]                                    (optional)
+        }
+    A vibe is only matched for locations (or the central result) that ask for one.
+    """
+    try:
+        data = request.json
+        entries = data.get('locations') or []
+        if not entries:
+            return jsonify({"error": "No locations given."})
+        if len(entries) > MAX_BATCH_LOCATIONS:
+            return jsonify({"error": f"At most {MAX_BATCH_LOCATIONS} locations per batch."})
         
-        if not pub_list:
-            return jsonify({"error": "No pubs found in this area."})
+        locations = [[float(e.get('latitude')), float(e.get('longitude'))] for e in entries]
+        ns = [int(e.get('n', 5)) for e in entries]
+        categories = parse_categories(data.get('categories'), catalogue.default_categories)
+        views = [catalogue.view_for([location], categories) for location in locations]
         
-        vibe_match = generate_vibe_match(vibe, pub_list)
+        results = []
+        batch = find_nearest_pubs_batch(locations, ns, views)
+        for entry, location, view, pub_list in zip(entries, locations, views, batch):
+            result = {"location": location, "pubs": pub_list}
+            if entry.get('vibe') and pub_list:
+                result["vibe_match"] = generate_vibe_match(entry['vibe'], pub_list, view)
+            results.append(result)
         
-        return jsonify({
-            "pubs": pub_list,
-            "vibe_match": vibe_match
-        })
+        response = {"results": results}
+        
+        central = data.get('central')
+        if central:
+            central_view = catalogue.view_for(locations, categories)
+            central_pubs = find_central_pubs(
+                locations,
+                n=int(central.get('n', 5)),
+                objective=central.get('objective', 'total'),
+                view=central_view,
+            )
+            response["central"] = {
+                "objective": central.get('objective', 'total'),
+                "pubs": central_pubs,
+            }
+            if central.get('vibe') and central_pubs:
+                response["central"]["vibe_match"] = generate_vibe_match(central['vibe'], central_pubs, central_view)
+        
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+# Upper bound on name search results per call
+MAX_SEARCH_RESULTS = 20
+
+@app.route('/api/pubs/search')
+def search_pubs_api():
+    """
+    Pubs whose name matches what was typed so far, for autocomplete
+    
+    Query string:
+        q: The (partial, possibly misspelled or unaccented) name
+        limit: Number of results (default 8, at most 20)
+        categories: Categories to search, e.g. "pub,bar"
+        regions: Regions to search (default: the default region), or
+        latitude, longitude: search the regions covering that location and
+            add each pub's distance from it
+    """
+    query = (request.args.get('q') or "").strip()
+    if not query:
+        return jsonify({"error": "A search text (q) is required."}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 8)), 1), MAX_SEARCH_RESULTS)
+        categories = parse_categories(request.args.get('categories'), catalogue.default_categories)
+        location = None
+        if request.args.get('latitude') is not None:
+            location = [float(request.args.get('latitude')), float(request.args.get('longitude'))]
+            view = catalogue.view_for([location], categories)
+        else:
+            regions = request.args.get('regions')
+            view = catalogue.view_of(regions.split(",") if regions else [catalogue.default_region.name], categories)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    
+    with metrics.request_timer("api_search"):
+        names = view.names
+        matches = names.search(query, limit)
+        rows = view_rows(view, np.array([row for row, _ in matches], dtype=np.intp))
+        if location is not None:
+            distances = haversine_matrix([location[1]], [location[0]],
+                                         [row[2] for row in rows], [row[1] for row in rows])[0]
+        pubs = []
+        for i, ((row, score), (pub_id, lat, lon, _, category, _)) in enumerate(zip(matches, rows)):
+            # Same id type as /api/pubs and /api/crawl
+            pub = {"id": pub_id, "name": names.names[row], "category": category,
+                   "coordinates": [lat, lon], "score": round(score, 3)}
+            if location is not None:
+                # Pubs without coordinates have no distance
+                pub["distance_value"] = round(float(distances[i]), 3) if np.isfinite(distances[i]) else None
+            pubs.append(pub)
+        return jsonify({"query": query, "pubs": pubs})
+
+# Upper bound on pubs per crawl; longer crawls fall back to the 2-opt heuristic
+MAX_CRAWL_STOPS = 12
+# Nearest pubs considered per crawl stop when picking pubs for the vibe
+CRAWL_CANDIDATES = int(os.environ.get("CRAWL_CANDIDATES", 3))
+
+@app.route('/api/crawl', methods=['POST'])
+def crawl_api():
+    """
+    Plan a pub crawl from a start location
+    
+    Expects JSON like:
+        {"latitude": 51.22, "longitude": 4.40, "stops": 5, "vibe": "cozy",
+         "radius_km": 1.5, "categories": ["pub", "bar"], "round_trip": false,
+         "open_now": true}   (or "arrival": "HH:MM": only pubs open when the crawl starts)
+    Returns the pubs in visiting order with the leg distances (km, straight
+    line) and a GeoJSON LineString of the route for the map.
+    """
+    try:
+        data = request.json or {}
+        latitude = float(data.get('latitude'))
+        longitude = float(data.get('longitude'))
+        stops = int(data.get('stops', 4))
+        if not 1 <= stops <= MAX_CRAWL_STOPS:
+            return jsonify({"error": f"A crawl has 1 to {MAX_CRAWL_STOPS} stops."}), 400
+        radius_km = data.get('radius_km')
+        radius_km = float(radius_km) if radius_km is not None else None
+        categories = parse_categories(data.get('categories'), catalogue.default_categories)
+        round_trip = str(data.get('round_trip') or "").lower() in ("1", "true", "yes")
+        open_at = parse_open_at(data.get('open_now'), data.get('arrival'))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        with metrics.request_timer("api_crawl"):
+            location = [latitude, longitude]
+            with metrics.timer("catalogue_lookup"):
+                view = catalogue.view_for([location], categories)
+            crawl = plan_pub_crawl(location, stops, data.get('vibe'), radius_km, view, round_trip, open_at)
+            if not crawl["stops"]:
+                return jsonify({"error": "No pubs found in this area."})
+            crawl["start"] = location
+            return jsonify(crawl)
     except Exception as e:
         return jsonify({"error": str(e)})
 
+@app.route('/api/map/markers')
+def get_map_markers():
+    # Pre-rendered marker layer for every pub of the requested shards; only changes when they do
+    regions = request.args.get('regions')
+    try:
+        view = catalogue.view_of(
+            regions.split(",") if regions else [catalogue.default_region.name],
+            parse_categories(request.args.get('categories'), catalogue.default_categories),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    markers = view.markers
+    if request.if_none_match.contains(markers.etag):
+        return '', 304
+    response = app.response_class(markers.json, mimetype='application/json')
+    response.set_etag(markers.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response
+
+def _collect_cache_metrics():
+    if not vibe_cache:
+        return []
+    stats = vibe_cache.stats()
+    return [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]
+
+def _collect_llm_metrics():
+    stats = llm_client.stats()
+    return [({"outcome": name}, stats[name])
+            for name in ("calls", "timeouts", "rejected", "errors", "retries", "short_circuited")]
+
+metrics.collected("vibe_cache_lookups_total", "Vibe cache lookups by result", "counter", _collect_cache_metrics)
+metrics.collected("llm_calls_total", "LLM calls started, timed out, rejected by the limiter, failed, retried "
+                  "or refused by the circuit breaker", "counter",
+                  _collect_llm_metrics)
+metrics.collected("top_pubs_cache_lookups_total", "Nearest-pub cache lookups by result", "counter",
+                  lambda: [({"result": name}, top_pubs_cache.stats()[name]) for name in ("hits", "misses", "uncertain")])
+metrics.collected("walking_rank_total", "Nearest-pub searches re-ranked by walking distance, by outcome", "counter",
+                  lambda: [({"outcome": name}, count) for name, count in walking_ranker.stats().items()]
+                  if walking_ranker is not None else [])
+metrics.collected("vibe_flights_total", "Vibe-match LLM computations started and requests that joined one", "counter",
+                  lambda: [({"role": "leader"}, vibe_flights.leaders), ({"role": "shared"}, vibe_flights.shared)])
+metrics.collected("llm_in_flight", "LLM calls running or queued", "gauge",
+                  lambda: [({}, llm_client.executor.in_flight())])
+metrics.collected("llm_circuit_state", "LLM circuit breaker state (1 for the current one)", "gauge",
+                  lambda: [({"state": state}, int(llm_client.breaker.state == state)) for state in ("closed", "half_open", "open")])
+metrics.collected("timetable_streams", "Open timetable event streams in this process", "gauge",
+                  lambda: [({}, timetables.feed.subscriber_count() if timetables.started else 0)])
+metrics.collected("timetable_write_batches_total", "Timetable write transactions and the entries they wrote", "counter",
+                  lambda: [({"count": count}, timetables.store.stats()[key] if timetables.started else 0)
+                           for count, key in (("batches", "batches"), ("entries", "written"))])
+metrics.collected("catalogue_revision", "Last OSM diff applied to the catalogue", "gauge",
+                  lambda: [({}, catalogue.revision)])
+metrics.collected("catalogue_pubs", "Places in each loaded catalogue shard", "gauge",
+                  lambda: [({"shard": shard}, status["pubs"]) for shard, status in catalogue.status()["shards"].items()])
+
+@app.route('/metrics')
+def get_metrics():
+    # Prometheus scrape endpoint (per worker process)
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/ready')
+def ready():
+    # Readiness probe: only route traffic here once the catalogue is built
+    status = catalogue.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+# Shared secret for the routes that change the live catalogue (sent as the
+# X-Admin-Token header); without it those routes are disabled
+CATALOGUE_ADMIN_TOKEN = os.environ.get("CATALOGUE_ADMIN_TOKEN", "")
+
+def admin_only(route):
+    """Refuse a catalogue admin route unless the request carries CATALOGUE_ADMIN_TOKEN"""
+    @wraps(route)
+    def guarded(*args, **kwargs):
+        if not CATALOGUE_ADMIN_TOKEN:
+            return jsonify({"error": "Catalogue administration is disabled (CATALOGUE_ADMIN_TOKEN is not set)."}), 403
+        token = request.headers.get("X-Admin-Token", "")
+        # Constant-time comparison, so the token cannot be guessed byte by byte
+        if not hmac.compare_digest(token.encode("utf-8"), CATALOGUE_ADMIN_TOKEN.encode("utf-8")):
+            return jsonify({"error": "A valid X-Admin-Token header is required."}), 403
+        return route(*args, **kwargs)
+    return guarded
+
+@app.route('/api/catalogue/refresh', methods=['POST'])
+@admin_only
+def refresh_catalogue():
+    # A full dataset reload is the most expensive thing a worker does: admin only
+    try:
+        catalogue.refresh()
+        return jsonify(catalogue.status())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/catalogue/changes', methods=['POST'])
+@admin_only
+def apply_catalogue_changes():
+    """
+    Apply an OSM diff to the live catalogue without rebuilding it
+    
+    The body is an osmChange document (as published in the OSM minutely and
+    hourly diffs) and ?revision= its sequence number. Diffs at or below the
+    current revision are ignored, so re-sending one is safe; one that jumps
+    implausibly far ahead is refused. Each worker process holds its own
+    catalogue, so send the diff to every worker. Requires the X-Admin-Token
+    header.
+    """
+    try:
+        revision = int(request.args.get('revision', ''))
+    except ValueError:
+        return jsonify({"error": "A numeric revision is required."}), 400
+    try:
+        changes = parse_osm_change(request.get_data())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        result = catalogue.apply_changes(changes, revision)
+    except ValueError as e:
+        metrics.inc("catalogue_changes", outcome="refused")
+        return jsonify({"error": str(e)}), 400
+    metrics.inc("catalogue_changes", outcome="applied" if result["applied"] else "stale")
+    return jsonify(result), (200 if result["applied"] else 409)
+
+@app.route('/api/timetable/<pub_id>', methods=['GET', 'POST'])
+def timetable_api(pub_id):
+    """
+    Read a pub's meetup timetable, or add an arrival to it
+    
+    POST takes JSON {"name", "age", "time": "HH:MM"} and returns the stored
+    entry; everyone with the timetable open gets it pushed over
+    /api/timetable/<pub_id>/events. The response also says whether the pub
+    is "open", "closed" or "unknown" at that arrival time (pub_status).
+    """
+    if request.method == 'GET':
+        try:
+            after = int(request.args.get('after', 0))
+        except ValueError:
+            return jsonify({"error": "after must be an entry id."}), 400
+        return jsonify({"pub_id": pub_id, "entries": timetables.store.entries(pub_id, after)})
+    
+    data = request.get_json(silent=True) or request.form
+    try:
+        entry = timetables.store.add(pub_id, data.get('name'), data.get('age'), data.get('time'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 503
+    metrics.inc("timetable_entries")
+    return jsonify(dict(entry, pub_status=pub_status_at(pub_id, entry["time"]))), 201
+
+def pub_status_at(pub_id, arrival):
+    """Opening status of a pub of the default catalogue at the next HH:MM arrival, "unknown" if not found"""
+    if not catalogue.is_ready():
+        return "unknown"
+    view = catalogue.view()
+    # Timetables are keyed by the bare id; a node and a way sharing it cannot be told apart
+    positions = view.positions_of_id(pub_id)
+    if len(positions) != 1:
+        return "unknown"
+    return view.hours.status(positions[0], next_arrival(arrival))
+
+@app.route('/api/timetable/<pub_id>/events')
+def timetable_events(pub_id):
+    """
+    Server-Sent Events stream of new arrivals in a pub's timetable
+    
+    Sends the entries after Last-Event-ID (or ?after=) first, then each new
+    entry as it is committed. The stream waits on the process-wide timetable
+    feed, so an open page costs no queries of its own; the browser's
+    EventSource reconnects by itself and resumes from the last entry it saw.
+    """
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+    except ValueError:
+        return jsonify({"error": "after must be an entry id."}), 400
+    
+    feed = timetables.feed
+    if feed.subscriber_count() >= feed.max_subscribers:
+        response = jsonify({"error": "Too many open timetables, try again shortly."})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+    
+    def sse(entry):
+        return f"id: {entry['id']}\nevent: entry\ndata: {fast_json.dumps(entry)}\n\n"
+    
+    def stream():
+        # Subscribe before catching up, so nothing committed in between is missed
+        subscription = feed.subscribe(pub_id)
+        if subscription is None:
+            return
+        last = after
+        try:
+            # Tell the browser how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+            # Catch up page by page: the feed only brings what is committed from now on
+            while True:
+                backlog = timetables.store.entries(pub_id, last)
+                if not backlog:
+                    break
+                for entry in backlog:
+                    last = entry["id"]
+                    yield sse(entry)
+            while not subscription.overflowed:
+                entries = subscription.get(TIMETABLE_HEARTBEAT_SECONDS)
+                if entries is None:
+                    # Comment line: keeps proxies from closing the stream and
+                    # notices viewers that went away
+                    yield ": keep-alive\n\n"
+                    continue
+                for entry in entries:
+                    if entry["id"] > last:
+                        last = entry["id"]
+                        yield sse(entry)
+        finally:
+            feed.unsubscribe(subscription)
+    
+    response = app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/table')
 def hello_world():
-    return render_template('table.html')
+    # One shared timetable per pub; the page without a pub uses a general one
+    pub_id = request.args.get('pub_id', '').strip() or 'general'
+    return render_template('table.html', pub_id=pub_id, entries=timetables.store.entries(pub_id))
 
 if __name__ == '__main__':
     # Create necessary directories
     os.makedirs('static', exist_ok=True)
     os.makedirs('templates', exist_ok=True)
+
+    # Build the pub catalogue before serving so no request pays for it
+    catalogue.load()
     
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalise_vibe(vibe):
+    """Lower-case a vibe and collapse punctuation/whitespace so 'Cozy!' == ' cozy '"""
+    vibe = (vibe or "").lower()
+    vibe = re.sub(r"[^\w\s]", " ", vibe)
+    return " ".join(vibe.split())
+
+
+def vibe_cache_key(vibe, places):
+    """
+    Cache key for a vibe match: the normalised vibe plus the candidate set
+
+    Candidates are (type, id) pairs, since OSM ids are only unique per element
+    type. They are sorted, so the same five pubs give the same key no matter
+    which of them is closest to the user.
+    """
+    ids = ",".join(sorted(f"{pub_type}/{pub_id}" for pub_type, pub_id in places))
+    return f"{normalise_vibe(vibe)}|{ids}"
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """
+    SQLite file store, so every worker process shares the same cache
+
+    Entries carry an expiry time and a last-access time; when the table grows
+    past max_entries the least recently used rows are deleted.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vibe_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS vibe_cache_accessed ON vibe_cache (accessed_at)")
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, now):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM vibe_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        with conn:
+            if expires_at <= now:
+                conn.execute("DELETE FROM vibe_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE vibe_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value, expires_at):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO vibe_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            conn.execute("DELETE FROM vibe_cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM vibe_cache WHERE key IN ("
+                " SELECT key FROM vibe_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM vibe_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM vibe_cache").fetchone()[0]
+
+
+class VibeCache:
+    """
+    TTL + LRU cache for vibe-match results
+
+    Values are small dicts ({"pub_id", "explanation", "note"}) rather than the
+    pub dicts themselves, so a hit is re-applied to the caller's own pub list.
+    """
+
+    def __init__(self, backend=None, ttl_seconds=24 * 3600):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.backend.get(key, time.time())
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, time.time() + self.ttl_seconds)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def cache_from_env():
+    """
+    Build the vibe cache from environment variables
+
+    VIBE_CACHE_BACKEND: "memory" (default), "sqlite" or "none"
+    VIBE_CACHE_PATH: SQLite file for the sqlite backend
+    VIBE_CACHE_TTL: Entry lifetime in seconds
+    VIBE_CACHE_SIZE: Maximum number of entries
+    """
+    backend_name = os.environ.get("VIBE_CACHE_BACKEND", "memory").lower()
+    if backend_name == "none":
+        return None
+
+    ttl = float(os.environ.get("VIBE_CACHE_TTL", 24 * 3600))
+    size = int(os.environ.get("VIBE_CACHE_SIZE", 10000))
+    if backend_name == "sqlite":
+        path = os.environ.get("VIBE_CACHE_PATH", "data/vibe_cache.sqlite3")
+        backend = SQLiteBackend(path, max_entries=size)
+    elif backend_name == "memory":
+        backend = MemoryBackend(max_entries=size)
+    else:
+        raise ValueError(f"Unknown VIBE_CACHE_BACKEND '{backend_name}'")
+    return VibeCache(backend, ttl_seconds=ttl)
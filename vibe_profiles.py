@@ -0,0 +1,234 @@
+import re
+
+import numpy as np
+
+from vibe_cache import normalise_vibe
+
+# Dimensions of the vibe space. Each pub gets a score per feature from its OSM
+# tags, each vibe word maps to weights over the same features.
+FEATURES = [
+    "cozy",
+    "lively",
+    "historic",
+    "outdoor",
+    "food",
+    "craft_beer",
+    "sports",
+    "music",
+    "late_night",
+    "local",
+    "upscale",
+    "accessible",
+]
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}
+
+# Human-readable reasons used to explain a local match
+FEATURE_LABELS = {
+    "cozy": "a small, cozy setting",
+    "lively": "a lively atmosphere",
+    "historic": "historic character",
+    "outdoor": "outdoor seating",
+    "food": "food on the menu",
+    "craft_beer": "craft or house-brewed beer",
+    "sports": "sports on screen",
+    "music": "live music",
+    "late_night": "late opening hours",
+    "local": "a local, neighbourhood feel",
+    "upscale": "a more upscale offer",
+    "accessible": "wheelchair access",
+}
+
+# Vibe words (after normalise_vibe) and the features they ask for
+VIBE_LEXICON = {
+    "cozy": {"cozy": 1.0, "local": 0.4, "historic": 0.3},
+    "cosy": {"cozy": 1.0, "local": 0.4, "historic": 0.3},
+    "gezellig": {"cozy": 1.0, "local": 0.5},
+    "quiet": {"cozy": 0.8, "local": 0.4, "lively": -0.6},
+    "chill": {"cozy": 0.7, "outdoor": 0.3, "lively": -0.3},
+    "relaxed": {"cozy": 0.7, "outdoor": 0.3},
+    "romantic": {"cozy": 0.8, "upscale": 0.6, "sports": -0.6},
+    "date": {"cozy": 0.7, "upscale": 0.5, "sports": -0.5},
+    "lively": {"lively": 1.0, "music": 0.5, "late_night": 0.4},
+    "party": {"lively": 1.0, "music": 0.7, "late_night": 0.8},
+    "busy": {"lively": 0.8},
+    "fun": {"lively": 0.7, "music": 0.4},
+    "dance": {"music": 0.8, "lively": 0.7, "late_night": 0.5},
+    "music": {"music": 1.0, "lively": 0.4},
+    "live": {"music": 0.8, "lively": 0.4},
+    "late": {"late_night": 1.0},
+    "night": {"late_night": 0.8, "lively": 0.4},
+    "historic": {"historic": 1.0, "local": 0.3},
+    "old": {"historic": 0.8, "local": 0.3},
+    "traditional": {"historic": 0.8, "local": 0.5},
+    "authentic": {"historic": 0.5, "local": 0.8},
+    "local": {"local": 1.0},
+    "locals": {"local": 1.0},
+    "hipster": {"craft_beer": 0.9, "upscale": 0.3, "historic": -0.3},
+    "trendy": {"craft_beer": 0.6, "upscale": 0.6, "lively": 0.3},
+    "modern": {"craft_beer": 0.5, "upscale": 0.4, "historic": -0.5},
+    "craft": {"craft_beer": 1.0},
+    "beer": {"craft_beer": 0.6},
+    "brewery": {"craft_beer": 1.0},
+    "belgian": {"craft_beer": 0.5, "local": 0.5, "historic": 0.3},
+    "fancy": {"upscale": 1.0},
+    "classy": {"upscale": 1.0, "cozy": 0.3},
+    "cheap": {"local": 0.6, "upscale": -0.8},
+    "student": {"lively": 0.6, "late_night": 0.5, "upscale": -0.6},
+    "sports": {"sports": 1.0, "lively": 0.4},
+    "football": {"sports": 1.0, "lively": 0.4},
+    "soccer": {"sports": 1.0, "lively": 0.4},
+    "match": {"sports": 0.8},
+    "terrace": {"outdoor": 1.0},
+    "outdoor": {"outdoor": 1.0},
+    "outside": {"outdoor": 1.0},
+    "sunny": {"outdoor": 0.9},
+    "garden": {"outdoor": 1.0},
+    "food": {"food": 1.0},
+    "eat": {"food": 1.0},
+    "dinner": {"food": 1.0, "upscale": 0.3},
+    "lunch": {"food": 1.0},
+    "hungry": {"food": 1.0},
+    "accessible": {"accessible": 1.0},
+    "wheelchair": {"accessible": 1.0},
+}
+
+# A local answer is trusted when the best pub beats the runner-up by this much
+DEFAULT_CONFIDENCE_MARGIN = 0.15
+
+_LATE_CLOSE = re.compile(r"-\s*(0[0-5]|2[4-9]):\d\d")
+
+
+def _is_yes(value):
+    return str(value).strip().lower() in ("yes", "true", "1", "only")
+
+
+def tags_to_profile(tags):
+    """
+    Score a pub on every vibe feature from its OSM tags
+
+    Args:
+        tags (dict): Parsed OSM tags of the pub
+
+    Returns:
+        ndarray: Unit-length feature vector (all zeros if nothing is known)
+    """
+    vector = np.zeros(len(FEATURES))
+
+    def add(feature, weight):
+        vector[FEATURE_INDEX[feature]] += weight
+
+    if _is_yes(tags.get("outdoor_seating", "")) or tags.get("beer_garden") or tags.get("terrace"):
+        add("outdoor", 1.0)
+    if tags.get("cuisine") or _is_yes(tags.get("food", "")) or tags.get("diet:vegetarian"):
+        add("food", 1.0)
+    if tags.get("brewery") or _is_yes(tags.get("microbrewery", "")) or tags.get("craft"):
+        add("craft_beer", 1.0)
+    if tags.get("brewery", "").count(";") >= 4:
+        add("craft_beer", 0.5)  # long tap list
+    if tags.get("sport") or _is_yes(tags.get("television", "")) or _is_yes(tags.get("tv", "")):
+        add("sports", 1.0)
+        add("lively", 0.3)
+    if _is_yes(tags.get("live_music", "")) or tags.get("music"):
+        add("music", 1.0)
+        add("lively", 0.5)
+    if _LATE_CLOSE.search(tags.get("opening_hours", "")) or tags.get("opening_hours") == "24/7":
+        add("late_night", 1.0)
+        add("lively", 0.3)
+    if tags.get("historic") or tags.get("heritage") or tags.get("start_date", "")[:2] in ("15", "16", "17", "18"):
+        add("historic", 1.0)
+    if tags.get("wikipedia") or tags.get("wikidata"):
+        add("historic", 0.3)
+    if _is_yes(tags.get("real_fire", "")) or _is_yes(tags.get("fireplace", "")):
+        add("cozy", 1.0)
+    if not tags.get("brand") and not tags.get("website") and not tags.get("sport"):
+        add("local", 0.6)
+        add("cozy", 0.3)
+    if tags.get("brand") or tags.get("operator"):
+        add("upscale", 0.3)
+    if tags.get("website") and (tags.get("reservation") or tags.get("payment:credit_cards")):
+        add("upscale", 0.5)
+    if _is_yes(tags.get("wheelchair", "")):
+        add("accessible", 1.0)
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def vibe_to_vector(vibe):
+    """
+    Map free-text vibe onto the feature space using the local lexicon
+
+    Args:
+        vibe (str): What the user typed, e.g. "cozy with a terrace"
+
+    Returns:
+        tuple: (unit-length vector, list of words that were recognised)
+    """
+    vector = np.zeros(len(FEATURES))
+    known = []
+    for word in normalise_vibe(vibe).split():
+        weights = VIBE_LEXICON.get(word)
+        if weights is None and word.endswith("s"):
+            weights = VIBE_LEXICON.get(word[:-1])
+        if weights is None:
+            continue
+        known.append(word)
+        for feature, weight in weights.items():
+            vector[FEATURE_INDEX[feature]] += weight
+
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector), known
+
+
+class VibeProfiles:
+    """
+    Precomputed vibe vectors for every pub in the catalogue
+
+    Built once alongside the pub table, so ranking candidates for a vibe is a
+    handful of dot products with no network call. Row i is the pub at
+    position i of the table (CatalogueView.position_of finds it).
+    """
+
+    def __init__(self, tag_dicts):
+        self.vectors = np.array([tags_to_profile(tags or {}) for tags in tag_dicts]).reshape(-1, len(FEATURES))
+
+    def rank(self, vibe, rows):
+        """
+        Score candidate pubs against a vibe
+
+        Args:
+            vibe (str): The vibe the user is looking for
+            rows (list): Positions of the candidate pubs in the table (None
+                for a pub that is not in it; it scores 0)
+
+        Returns:
+            dict: "scores" (one per row, same order), "best" (index into
+                rows), "confidence" (margin of best over runner-up, 0 when
+                the vibe had no known words) and "known_words"
+        """
+        vibe_vector, known = vibe_to_vector(vibe)
+        scores = np.array([
+            float(self.vectors[row] @ vibe_vector) if row is not None else 0.0
+            for row in rows
+        ])
+
+        if len(scores) == 0:
+            return {"scores": [], "best": None, "confidence": 0.0, "known_words": known}
+
+        # Stable: on equal scores the closer pub (earlier in the list) wins
+        best = int(np.argmax(scores))
+        runner_up = np.max(np.delete(scores, best)) if len(scores) > 1 else 0.0
+        confidence = float(scores[best] - runner_up) if known else 0.0
+        return {"scores": scores.tolist(), "best": best, "confidence": confidence, "known_words": known}
+
+    def explain(self, vibe, row):
+        """Short sentence naming the features of the pub at a table position that fit the vibe"""
+        vibe_vector, known = vibe_to_vector(vibe)
+        if row is None or not known:
+            return "Closest pub; no vibe details known locally."
+
+        contribution = self.vectors[row] * vibe_vector
+        reasons = [FEATURE_LABELS[FEATURES[i]] for i in np.argsort(-contribution) if contribution[i] > 0][:3]
+        if not reasons:
+            return f"Closest pub; none of its listed features stand out for '{vibe}'."
+        return f"Matched locally for '{vibe}': " + ", ".join(reasons) + "."
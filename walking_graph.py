@@ -0,0 +1,640 @@
+import argparse
+import heapq
+import json
+import os
+import threading
+import time
+import weakref
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM
+from spatial_index import SpatialIndex
+
+GRAPH_FORMAT_VERSION = 1
+DEFAULT_GRAPH_PATH = os.path.join(os.path.dirname(os.environ.get("PUB_SNAPSHOT_DIR", "data/pub_snapshot")) or ".",
+                                  "walking_graph.npz")
+
+# highway=* values people can walk along (motorways, trunk roads and
+# construction sites are left out)
+WALKABLE_HIGHWAYS = frozenset({
+    "footway", "pedestrian", "path", "steps", "living_street", "residential", "service", "unclassified",
+    "tertiary", "tertiary_link", "secondary", "secondary_link", "primary", "primary_link", "track",
+    "cycleway", "bridleway", "corridor", "road",
+})
+# Columns that may hold a way's node ids in a dataset split
+NODE_REF_COLUMNS = ("nodes", "refs", "node_ids")
+
+
+def is_walkable(tags):
+    """Whether a way with these tags can be walked along"""
+    if tags.get("highway") not in WALKABLE_HIGHWAYS:
+        return False
+    foot = tags.get("foot")
+    if foot in ("no", "private", "use_sidepath"):
+        return False
+    if tags.get("access") in ("no", "private") and foot not in ("yes", "designated", "permissive"):
+        return False
+    return True
+
+
+class WalkingGraph:
+    """
+    Walkable street network, with chains of shape nodes contracted
+
+    Most OSM nodes only shape a street between two junctions. Routing runs
+    on the junctions (nodes with a degree other than 2), connected by the
+    length of the chain between them, which keeps the Dijkstra search a few
+    times smaller than the raw node graph. Every node (junctions and shape
+    nodes) can still be snapped to: a shape node knows the two junctions at
+    the ends of its chain and how far along the chain it is.
+
+    Arrays per node (V of them): lats, lons, end_a, end_b (junction numbers
+    of the chain ends), offset_a, offset_b (km to each end) and chain (chain
+    number, -1 for junctions). Junction graph (J junctions) in CSR form:
+    indptr, indices and weights (km).
+    """
+
+    def __init__(self, arrays, meta=None):
+        self.arrays = arrays
+        self.meta = meta or {}
+        self.lats = arrays["lats"]
+        self.lons = arrays["lons"]
+        self.end_a = arrays["end_a"]
+        self.end_b = arrays["end_b"]
+        self.offset_a = arrays["offset_a"]
+        self.offset_b = arrays["offset_b"]
+        self.chain = arrays["chain"]
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.weights = arrays["weights"]
+        # Snapping: nearest graph node to a point
+        self.index = SpatialIndex(self.lats, self.lons)
+        # Python lists make the inner Dijkstra loop several times faster than
+        # indexing NumPy arrays element by element
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._weights = self.weights.tolist()
+
+    def __len__(self):
+        return len(self.lats)
+
+    @property
+    def junctions(self):
+        return len(self.indptr) - 1
+
+    def snap(self, lat, lon):
+        """
+        Nearest graph node to a point
+
+        Returns:
+            tuple: (node, distance in km), or (-1, inf) for an empty graph
+        """
+        positions, distances = self.index.k_nearest(lat, lon, 1)
+        if not len(positions):
+            return -1, np.inf
+        return int(positions[0]), float(distances[0])
+
+    def distances(self, source, targets, limit_km=np.inf, deadline=None):
+        """
+        Walking distances from one snapped point to a few others
+
+        Dijkstra over the junction graph from the two ends of the source's
+        chain. A target is final once both ends of its chain are settled, or
+        once the search radius has passed its best distance so far. The search
+        stops when every target is final, past limit_km, or at the deadline;
+        targets that were not final by then are reported as inf, and all of
+        them are at least `reached` km away.
+
+        Args:
+            source (tuple): (node, km from the point to the node)
+            targets (list): (node, km) per target; node -1 for points that
+                could not be snapped
+            limit_km (float): Do not search further than this
+            deadline (float, optional): time.monotonic() value to stop at
+
+        Returns:
+            tuple: (distances in km as an array, km the search reached, True
+                if it stopped at the deadline)
+        """
+        source_node, source_km = source
+        end_a, end_b = self.end_a, self.end_b
+        offset_a, offset_b, chain = self.offset_a, self.offset_b, self.chain
+
+        best = np.full(len(targets), np.inf)
+        final = np.zeros(len(targets), dtype=bool)
+        # Junction -> [(target, km from the junction to the target)]
+        waiting = {}
+        # Chain ends of each target that are not settled yet
+        pending_ends = []
+        for t, (node, km) in enumerate(targets):
+            if node < 0:
+                final[t] = True
+                pending_ends.append(0)
+                continue
+            if node == source_node:
+                best[t] = source_km + km
+            elif chain[node] >= 0 and chain[node] == chain[source_node]:
+                # On the same chain the direct way along it may be shortest
+                best[t] = source_km + abs(offset_a[node] - offset_a[source_node]) + km
+            ends = {int(end_a[node]): offset_a[node] + km}
+            b = int(end_b[node])
+            ends[b] = min(ends.get(b, np.inf), offset_b[node] + km)
+            for junction, extra in ends.items():
+                waiting.setdefault(junction, []).append((t, float(extra)))
+            pending_ends.append(len(ends))
+        open_targets = int((~final).sum())
+
+        indptr, indices, weights = self._indptr, self._indices, self._weights
+        settled = {}
+        heap = [(source_km + float(offset_a[source_node]), int(end_a[source_node])),
+                (source_km + float(offset_b[source_node]), int(end_b[source_node]))]
+        heapq.heapify(heap)
+        reached = 0.0
+        timed_out = False
+        pops = 0
+        while heap and open_targets:
+            d, junction = heapq.heappop(heap)
+            if junction in settled:
+                continue
+            if d > limit_km:
+                # Everything still unsettled is at least this far
+                reached = d
+                break
+            pops += 1
+            if deadline is not None and not pops & 63 and time.monotonic() > deadline:
+                timed_out = True
+                break
+            settled[junction] = d
+            reached = d
+
+            for t, extra in waiting.get(junction, ()):
+                if final[t]:
+                    continue
+                if d + extra < best[t]:
+                    best[t] = d + extra
+                pending_ends[t] -= 1
+                if not pending_ends[t]:
+                    final[t] = True
+                    open_targets -= 1
+
+            for e in range(indptr[junction], indptr[junction + 1]):
+                neighbour = indices[e]
+                if neighbour not in settled:
+                    heapq.heappush(heap, (d + weights[e], neighbour))
+        else:
+            # The search ran out of graph: nothing further is reachable
+            if not heap:
+                reached = np.inf
+
+        # Any unsettled end is at least `reached` away, so a best distance
+        # within that (plus the target's own snap distance) cannot improve
+        for t, (node, km) in enumerate(targets):
+            if not final[t] and best[t] <= reached + km:
+                final[t] = True
+        best[~final] = np.inf
+        return best, reached, timed_out
+
+
+class WalkingRanker:
+    """
+    Re-ranks haversine candidates by walking distance within a time budget
+
+    Walking distance is never shorter than the straight line, so once the
+    n-th best walking distance is below the straight-line distance of the
+    nearest pub that was not a candidate, the ranking is the same as if
+    every pub had been routed to ("exact"). Pubs that could not be routed
+    (off the network, or not reached within the budget) are ranked among the
+    routed ones by an estimate: their straight-line distance times
+    fallback_detour, so a pub 50 m away just off the street graph is not
+    pushed behind pubs kilometres away on foot.
+    """
+
+    def __init__(self, graph, candidates=3, max_snap_km=0.25, max_detour=2.0, budget_ms=20.0, fallback_detour=1.3):
+        self.graph = graph
+        self.candidates = candidates
+        self.max_snap_km = max_snap_km
+        self.max_detour = max_detour
+        self.budget_ms = budget_ms
+        # Typical walking/straight-line ratio in a city, for pubs that were not routed
+        self.fallback_detour = fallback_detour
+        # Snapped node of every pub, per catalogue view (by its spatial index)
+        self._snaps = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        # Counted under _lock: rank() runs on every request thread
+        self.outcomes = {"exact": 0, "partial": 0, "timeout": 0, "unsnapped": 0}
+
+    def candidate_count(self, n):
+        """Haversine candidates to fetch for n results"""
+        return max(int(n) * self.candidates, int(n) + 8)
+
+    def _pub_snaps(self, index, positions):
+        with self._lock:
+            snaps = self._snaps.get(index)
+            if snaps is None:
+                snaps = self._snaps[index] = {}
+        targets = []
+        for position in positions.tolist():
+            snap = snaps.get(position)
+            if snap is None:
+                lat, lon = index.lats[position], index.lons[position]
+                snap = self.graph.snap(lat, lon) if lat == lat and lon == lon else (-1, np.inf)
+                if snap[1] > self.max_snap_km:
+                    snap = (-1, np.inf)
+                snaps[position] = snap
+            targets.append(snap)
+        return targets
+
+    def rank(self, view, lat, lon, positions, distances, n, complete):
+        """
+        Order haversine candidates by walking distance
+
+        Args:
+            view (CatalogueView): View the candidates belong to
+            lat, lon (float): User location
+            positions (ndarray): Candidate positions, nearest (haversine) first
+            distances (ndarray): Their haversine distances in km
+            n (int): Number of results wanted
+            complete (bool): True when the candidates are every pub that
+                qualifies (e.g. all pubs within the radius)
+
+        Returns:
+            tuple: (order into the candidates, first n; walking km per
+                candidate, inf where unknown), or None when the user is too
+                far from the walkable network
+        """
+        graph = self.graph
+        source = graph.snap(lat, lon)
+        if source[1] > self.max_snap_km:
+            self._count("unsnapped")
+            return None
+
+        finite = distances[np.isfinite(distances)]
+        limit = self.max_detour * float(finite[-1]) + source[1] if len(finite) else 0.0
+        deadline = time.monotonic() + self.budget_ms / 1000
+        targets = self._pub_snaps(view.index, positions)
+        walking, _, timed_out = graph.distances(source, targets, limit, deadline)
+
+        # Pubs without a walking distance are ranked by an estimate. One that was
+        # snapped to the network but not reached by a search that ran to the
+        # end is at least the search limit away on foot.
+        routed = np.isfinite(walking)
+        estimate = distances * self.fallback_detour
+        if not timed_out:
+            snapped = np.array([node >= 0 for node, _ in targets], dtype=bool)
+            estimate = np.where(snapped, np.maximum(estimate, limit), estimate)
+        candidate = np.arange(len(positions))
+        order = np.lexsort((candidate, np.where(routed, walking, estimate)))[:n]
+
+        # Unfetched pubs are at least the last candidate's straight-line distance away
+        bound = np.inf if complete or not len(distances) else float(distances[-1])
+        exact = len(order) and routed[order].all() and walking[order[-1]] <= bound
+        self._count("timeout" if timed_out else "exact" if exact else "partial")
+        return order, walking
+
+    def _count(self, outcome):
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.outcomes)
+
+
+def build_walking_graph(ways, node_ids, node_lats, node_lons):
+    """
+    Precompute the walking graph from OSM ways and node coordinates
+
+    Args:
+        ways (iterable): (node id list, tags dict) per way; only walkable ways are used
+        node_ids (array-like): OSM ids of the nodes with coordinates
+        node_lats, node_lons (array-like): Their coordinates
+
+    Returns:
+        WalkingGraph: The largest connected part of the walkable network
+    """
+    node_ids = np.asarray(node_ids, dtype=np.int64)
+    order = np.argsort(node_ids, kind="stable")
+    sorted_ids = node_ids[order]
+    node_lats = np.asarray(node_lats, dtype=np.float64)[order]
+    node_lons = np.asarray(node_lons, dtype=np.float64)[order]
+
+    # Consecutive node pairs of every walkable way
+    starts, ends = [], []
+    for refs, tags in ways:
+        if len(refs) < 2 or not is_walkable(tags):
+            continue
+        refs = np.asarray(refs, dtype=np.int64)
+        starts.append(refs[:-1])
+        ends.append(refs[1:])
+    if not starts:
+        raise ValueError("No walkable ways found")
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+
+    # Drop segments whose nodes have no coordinates
+    a = np.searchsorted(sorted_ids, starts).clip(0, max(len(sorted_ids) - 1, 0))
+    b = np.searchsorted(sorted_ids, ends).clip(0, max(len(sorted_ids) - 1, 0))
+    known = (sorted_ids[a] == starts) & (sorted_ids[b] == ends) & (a != b)
+    a, b = a[known], b[known]
+    known = ~(np.isnan(node_lats[a]) | np.isnan(node_lons[a]) | np.isnan(node_lats[b]) | np.isnan(node_lons[b]))
+    a, b = a[known], b[known]
+
+    # Renumber the nodes that are used, and keep each undirected segment once
+    used, inverse = np.unique(np.concatenate((a, b)), return_inverse=True)
+    a, b = inverse[:len(a)], inverse[len(a):]
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    pairs = np.unique(np.column_stack((a, b)), axis=0)
+    a, b = pairs[:, 0], pairs[:, 1]
+    lats, lons = node_lats[used], node_lons[used]
+    lengths = _segment_lengths(lats, lons, a, b)
+
+    # Keep the largest connected part: a point snapped onto a small island
+    # (a lone footway in a park) could not reach anything
+    keep = _largest_component(len(used), a, b)
+    renumber = np.full(len(used), -1, dtype=np.int64)
+    renumber[keep] = np.arange(len(keep))
+    inside = (renumber[a] >= 0) & (renumber[b] >= 0)
+    a, b, lengths = renumber[a[inside]], renumber[b[inside]], lengths[inside]
+    lats, lons, used = lats[keep], lons[keep], used[keep]
+
+    arrays = _contract(len(keep), a, b, lengths)
+    arrays["lats"] = lats
+    arrays["lons"] = lons
+    arrays["osm_ids"] = sorted_ids[used]
+    meta = {"nodes": int(len(keep)), "junctions": int(len(arrays["indptr"]) - 1), "segments": int(len(a))}
+    return WalkingGraph(arrays, meta)
+
+
+def _segment_lengths(lats, lons, a, b):
+    lat1, lon1 = np.radians(lats[a]), np.radians(lons[a])
+    lat2, lon2 = np.radians(lats[b]), np.radians(lons[b])
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0))) * EARTH_RADIUS_KM
+
+
+def _csr(n, a, b, values):
+    # Both directions of every undirected edge, grouped by source
+    sources = np.concatenate((a, b))
+    targets = np.concatenate((b, a))
+    values = np.concatenate((values, values))
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return indptr, targets[order], values[order]
+
+
+def _largest_component(n, a, b):
+    indptr, indices, _ = _csr(n, a, b, np.zeros(len(a)))
+    indptr, indices = indptr.tolist(), indices.tolist()
+    label = [-1] * n
+    sizes = []
+    for start in range(n):
+        if label[start] >= 0:
+            continue
+        component = len(sizes)
+        label[start] = component
+        stack = [start]
+        size = 0
+        while stack:
+            node = stack.pop()
+            size += 1
+            for e in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[e]
+                if label[neighbour] < 0:
+                    label[neighbour] = component
+                    stack.append(neighbour)
+        sizes.append(size)
+    if not sizes:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.asarray(label) == int(np.argmax(sizes)))
+
+
+def _contract(n, a, b, lengths):
+    # Walk every chain of degree-2 nodes between two junctions once
+    indptr, indices, weights = _csr(n, a, b, lengths)
+    edge_ids = np.concatenate((np.arange(len(a)), np.arange(len(a))))[np.argsort(np.concatenate((a, b)), kind="stable")]
+    degree = np.diff(indptr)
+    indptr, indices, weights, edge_ids = indptr.tolist(), indices.tolist(), weights.tolist(), edge_ids.tolist()
+
+    junction = [-1] * n
+    for node in np.flatnonzero(degree != 2).tolist():
+        junction[node] = 0
+    end_a = [0] * n
+    end_b = [0] * n
+    offset_a = [0.0] * n
+    offset_b = [0.0] * n
+    chain_of = [-1] * n
+    used_edge = [False] * len(a)
+    chains = 0
+    j_from, j_to, j_len = [], [], []
+
+    def walk_from(start):
+        nonlocal chains
+        for e in range(indptr[start], indptr[start + 1]):
+            if used_edge[edge_ids[e]]:
+                continue
+            used_edge[edge_ids[e]] = True
+            interior = []
+            length = weights[e]
+            node = indices[e]
+            while junction[node] < 0:
+                interior.append((node, length))
+                for f in range(indptr[node], indptr[node + 1]):
+                    if not used_edge[edge_ids[f]]:
+                        break
+                else:
+                    # Closed loop back onto itself; cannot happen after dedupe, but stay safe
+                    break
+                used_edge[edge_ids[f]] = True
+                node = indices[f]
+                length += weights[f]
+            if junction[node] < 0:
+                continue
+            for shape, offset in interior:
+                end_a[shape], end_b[shape] = start, node
+                offset_a[shape], offset_b[shape] = offset, length - offset
+                chain_of[shape] = chains
+            chains += 1
+            if node != start:
+                j_from.append(start)
+                j_to.append(node)
+                j_len.append(length)
+
+    for node in range(n):
+        if junction[node] >= 0:
+            walk_from(node)
+    # Rings of degree-2 nodes with no junction at all: promote one node of each
+    for node in range(n):
+        if junction[node] < 0 and chain_of[node] < 0:
+            junction[node] = 0
+            walk_from(node)
+
+    # Number the junctions and point every node at its chain ends
+    numbers = np.full(n, -1, dtype=np.int64)
+    is_junction = np.asarray(junction) >= 0
+    numbers[is_junction] = np.arange(int(is_junction.sum()))
+    end_a = np.where(is_junction, np.arange(n), np.asarray(end_a, dtype=np.int64))
+    end_b = np.where(is_junction, np.arange(n), np.asarray(end_b, dtype=np.int64))
+    offset_a = np.where(is_junction, 0.0, np.asarray(offset_a))
+    offset_b = np.where(is_junction, 0.0, np.asarray(offset_b))
+
+    # Parallel chains between the same two junctions: keep the shortest
+    j_from = numbers[np.asarray(j_from, dtype=np.int64)]
+    j_to = numbers[np.asarray(j_to, dtype=np.int64)]
+    j_len = np.asarray(j_len, dtype=np.float64)
+    lo, hi = np.minimum(j_from, j_to), np.maximum(j_from, j_to)
+    order = np.lexsort((j_len, hi, lo))
+    lo, hi, j_len = lo[order], hi[order], j_len[order]
+    first = np.ones(len(lo), dtype=bool)
+    first[1:] = (lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1])
+    j_indptr, j_indices, j_weights = _csr(int(is_junction.sum()), lo[first], hi[first], j_len[first])
+
+    return {
+        "end_a": numbers[end_a].astype(np.int32),
+        "end_b": numbers[end_b].astype(np.int32),
+        "offset_a": offset_a.astype(np.float32),
+        "offset_b": offset_b.astype(np.float32),
+        "chain": np.asarray(chain_of, dtype=np.int32),
+        "indptr": j_indptr,
+        "indices": j_indices.astype(np.int32),
+        "weights": j_weights.astype(np.float32),
+    }
+
+
+def save_graph(graph, path, source=None):
+    """Write a walking graph to an .npz file (atomically, like the pub snapshots)"""
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    meta = dict(graph.meta, format_version=GRAPH_FORMAT_VERSION, source=source, created_at=time.time())
+    tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez(tmp_path, meta=np.asarray(json.dumps(meta)), **graph.arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_graph(path):
+    """
+    Read a walking graph written by save_graph
+
+    Raises:
+        FileNotFoundError: If there is no graph at path
+        ValueError: If it was written by an incompatible version
+    """
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("format_version") != GRAPH_FORMAT_VERSION:
+            raise ValueError(f"Walking graph {path} has format {meta.get('format_version')}, "
+                             f"expected {GRAPH_FORMAT_VERSION}")
+        arrays = {name: data[name] for name in data.files if name != "meta"}
+    return WalkingGraph(arrays, meta)
+
+
+def graph_from_dataset(dataset, batch_size=10000):
+    """
+    Build the walking graph from a dataset split with the ways' node ids
+
+    Node coordinates come from the node rows, the way geometry from a
+    `nodes`/`refs`/`node_ids` column on the way rows.
+
+    Raises:
+        ValueError: If the split has no column with way node ids
+    """
+    column = next((c for c in NODE_REF_COLUMNS if c in (dataset.column_names or ())), None)
+    if column is None:
+        raise ValueError(f"The dataset has no way node ids (none of the columns {', '.join(NODE_REF_COLUMNS)}); "
+                         f"build the graph from an OSM extract with --osm instead")
+    ids, lats, lons, ways = [], [], [], []
+    for batch in dataset.iter(batch_size=batch_size):
+        types = np.asarray(batch["type"])
+        nodes = types == "node"
+        ids.append(np.asarray(batch["id"], dtype=np.int64)[nodes])
+        lats.append(np.asarray(batch["lat"], dtype=np.float64)[nodes])
+        lons.append(np.asarray(batch["lon"], dtype=np.float64)[nodes])
+        for i in np.flatnonzero(types == "way").tolist():
+            raw_tags = batch["tags"][i]
+            if '"highway"' not in (raw_tags or ""):
+                continue
+            ways.append((batch[column][i] or [], json.loads(raw_tags)))
+    return build_walking_graph(ways, np.concatenate(ids), np.concatenate(lats), np.concatenate(lons))
+
+
+def graph_from_osm_xml(source):
+    """Build the walking graph from an OSM XML extract (.osm file or open file)"""
+    ids, lats, lons, ways = [], [], [], []
+    for _, element in ET.iterparse(source, events=("end",)):
+        if element.tag == "node":
+            ids.append(int(element.get("id")))
+            lats.append(float(element.get("lat")))
+            lons.append(float(element.get("lon")))
+            element.clear()
+        elif element.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in element.findall("tag")}
+            if is_walkable(tags):
+                ways.append(([int(nd.get("ref")) for nd in element.findall("nd")], tags))
+            element.clear()
+    return build_walking_graph(ways, ids, lats, lons)
+
+
+def walking_ranker_from_env():
+    """
+    Load the walking graph and build its ranker from environment variables
+
+    WALKING_GRAPH: Path of the precomputed graph (.npz); "none" turns walking
+        ranking off. Without a graph results stay in straight-line order.
+    WALKING_CANDIDATES: Haversine candidates fetched per result (default 3)
+    WALKING_MAX_SNAP_KM: Farthest a point may be from the network (default 0.25)
+    WALKING_MAX_DETOUR: Search radius as a multiple of the farthest candidate (default 2)
+    WALKING_BUDGET_MS: Time budget of one walking search (default 20)
+    WALKING_FALLBACK_DETOUR: Straight-line multiple used for pubs that could
+        not be routed (default 1.3)
+
+    Returns:
+        WalkingRanker: The ranker, or None when there is no graph
+    """
+    path = os.environ.get("WALKING_GRAPH", DEFAULT_GRAPH_PATH)
+    if path.lower() == "none":
+        return None
+    if not os.path.exists(path):
+        return None
+    try:
+        graph = load_graph(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: could not load walking graph {path}, ranking by straight-line distance: {e}")
+        return None
+    return WalkingRanker(
+        graph,
+        candidates=int(os.environ.get("WALKING_CANDIDATES", 3)),
+        max_snap_km=float(os.environ.get("WALKING_MAX_SNAP_KM", 0.25)),
+        max_detour=float(os.environ.get("WALKING_MAX_DETOUR", 2.0)),
+        budget_ms=float(os.environ.get("WALKING_BUDGET_MS", 20.0)),
+        fallback_detour=float(os.environ.get("WALKING_FALLBACK_DETOUR", 1.3)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the pedestrian graph used to re-rank pubs by walking distance",
+        epilog="Reads the way node refs of the dataset, or the ways of an OSM XML extract with --osm, "
+               "and saves compact CSR arrays next to the pub snapshots.",
+    )
+    parser.add_argument("--dataset", default="ns2agi/antwerp-osm-navigator", help="Hugging Face dataset to read")
+    parser.add_argument("--osm", help="Build from this OSM XML extract instead of the dataset")
+    parser.add_argument("--output", default=os.environ.get("WALKING_GRAPH", DEFAULT_GRAPH_PATH))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.osm:
+        graph = graph_from_osm_xml(args.osm)
+        source = os.path.abspath(args.osm)
+    else:
+        from datasets import load_dataset
+        graph = graph_from_dataset(load_dataset(args.dataset, split="train"))
+        source = args.dataset
+    path = save_graph(graph, args.output, source)
+    print(f"Walking graph with {graph.meta['nodes']:,} nodes and {graph.meta['junctions']:,} junctions "
+          f"written to {path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()